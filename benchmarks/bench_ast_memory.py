@@ -0,0 +1,124 @@
+"""Memory benchmark for the AST of generated programs.
+
+Parses a corpus of programs and keeps every tree alive, then measures the
+memory the trees hold: once as the interned, slotted nodes ``ast.py``
+builds, and once copied into plain mutable dataclasses with a ``__dict__``
+and no sharing, the way nodes used to be built. Reports the nodes of the
+trees, how many distinct nodes there are, and both sizes.
+
+    python benchmarks/bench_ast_memory.py [--programs N] [--seed S]
+"""
+
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+from dataclasses import fields, is_dataclass, make_dataclass
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from type_project import ast  # noqa: E402
+from type_project.ast import Node  # noqa: E402
+from type_project.parser import parser_expr  # noqa: E402
+
+# the node classes, copied without slots, freezing or interning
+_PLAIN = {
+    cls: make_dataclass(cls.__name__, [f.name for f in fields(cls)])
+    for cls in vars(ast).values()
+    if isinstance(cls, type) and issubclass(cls, Node) and cls is not Node
+}
+
+
+def generate(rng: random.Random, depth: int, names: list[str]) -> str:
+    if depth == 0 or rng.random() < 0.2:
+        if names and rng.random() < 0.5:
+            return rng.choice(names)
+        return rng.choice(["true", "false", str(rng.randint(0, 9))])
+    k = rng.randint(0, 6)
+    sub = depth - 1
+    if k == 0:
+        n = rng.choice("abcxyz")
+        bound = generate(rng, sub, names)
+        return f"let {n} = {bound} in {generate(rng, sub, names + [n])}"
+    if k == 1:
+        f, x = rng.choice("fgh"), rng.choice("xyz")
+        body = generate(rng, sub, names + [x])
+        return f"let {f} = fun {x} -> {body} in {f} ({generate(rng, sub, names)})"
+    if k == 2:
+        c, t, e = (generate(rng, sub, names) for _ in range(3))
+        return f"if {c} then {t} else {e}"
+    op = rng.choice("+-*<")
+    return f"({generate(rng, sub, names)}) {op} ({generate(rng, sub, names)})"
+
+
+def corpora(programs: int, seed: int) -> dict[str, list[str]]:
+    rng = random.Random(seed)
+    return {
+        "random": [generate(rng, 6, []) for _ in range(programs)],
+        "let chains": [
+            "let x0 = 1 in "
+            + "".join(f"let x{i} = x{i - 1} + {i % 10} in " for i in range(1, 40))
+            + "x39"
+            for _ in range(programs // 10)
+        ],
+        "arithmetic": [
+            " + ".join(f"{rng.randint(0, 9)} * (x - {i % 5}) < y" for i in range(30))
+            for _ in range(programs // 10)
+        ],
+    }
+
+
+def plain(e):
+    """A copy of ``e`` in the plain classes, one object per occurrence."""
+    if not is_dataclass(e):
+        return e
+    return _PLAIN[type(e)](*(plain(getattr(e, f.name)) for f in fields(e)))
+
+
+def count_nodes(e) -> int:
+    if not is_dataclass(e):
+        return 0
+    return 1 + sum(count_nodes(getattr(e, f.name)) for f in fields(e))
+
+
+def retained(build) -> tuple[object, int]:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        return result, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--programs", type=int, default=2000)
+    argparser.add_argument("--seed", type=int, default=0)
+    args = argparser.parse_args()
+
+    print(
+        f"{'corpus':<12} {'nodes':>8} {'distinct':>9} "
+        f"{'plain KiB':>10} {'interned KiB':>13} {'saved':>6}"
+    )
+    for name, programs in corpora(args.programs, args.seed).items():
+        trees, interned = retained(
+            lambda: [parser_expr(p).return_value for p in programs]
+        )
+        distinct = ast.live_nodes()
+        copies, plain_bytes = retained(lambda: [plain(e) for e in trees])
+        nodes = sum(count_nodes(e) for e in trees)
+        saved = 1 - interned / plain_bytes
+        print(
+            f"{name:<12} {nodes:>8} {distinct:>9} {plain_bytes / 1024:>10.0f} "
+            f"{interned / 1024:>13.0f} {saved:>6.1%}"
+        )
+        del trees, copies
+
+
+if __name__ == "__main__":
+    main()
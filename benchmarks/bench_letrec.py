@@ -0,0 +1,76 @@
+"""Scaling benchmark for recursive closures.
+
+Runs ``sum n`` (one call per level, so depth grows with ``n``) and
+``fib n`` (depth ``n``, calls growing exponentially) through
+``infer_iterative``. For each size it reports the ``E-AppRec`` calls, the
+wall time, and the peak memory traced while the derivation is built.
+
+    python benchmarks/bench_letrec.py [--sum N ...] [--fib N ...]
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from type_project.ast import Env  # noqa: E402
+from type_project.evaluator import Derivation  # noqa: E402
+from type_project.iterative import infer_iterative  # noqa: E402
+from type_project.parser import parser_expr  # noqa: E402
+
+PROGRAMS = {
+    "sum": "let rec sum = fun n -> if n < 1 then 0 else n + sum (n - 1) in sum {}",
+    "fib": "let rec fib = fun n -> if n < 3 then 1 "
+    "else fib (n - 1) + fib (n - 2) in fib {}",
+}
+
+
+def count_calls(d: Derivation) -> int:
+    calls = 0
+    stack = [d]
+    while stack:
+        d = stack.pop()
+        if d.rule == "E-AppRec":
+            calls += 1
+        stack.extend(p for p in d.premises if isinstance(p, Derivation))
+    return calls
+
+
+def measure(program: str, n: int) -> tuple[int, float, int]:
+    e = parser_expr(program.format(n)).return_value
+    start = time.perf_counter()
+    d = infer_iterative(Env([]), e)
+    seconds = time.perf_counter() - start
+    calls = count_calls(d)
+    del d
+
+    tracemalloc.start()
+    try:
+        infer_iterative(Env([]), e)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return calls, seconds, peak
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument(
+        "--sum", type=int, nargs="*", default=[1000, 2500, 5000, 10000]
+    )
+    argparser.add_argument("--fib", type=int, nargs="*", default=[10, 15, 20])
+    args = argparser.parse_args()
+
+    print(f"{'program':<10} {'calls':>8} {'seconds':>8} {'peak MiB':>9}")
+    for name, sizes in (("sum", args.sum), ("fib", args.fib)):
+        for n in sizes:
+            calls, seconds, peak = measure(PROGRAMS[name], n)
+            label = f"{name} {n}"
+            print(f"{label:<10} {calls:>8} {seconds:>8.2f} {peak / 2**20:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
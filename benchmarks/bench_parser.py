@@ -0,0 +1,87 @@
+"""Micro-benchmark for ``parser_expr``.
+
+Compares the grammar as it used to be driven (every ``parser_expr`` entry
+rebuilding the alternatives), the compiled ``Grammar`` and the Pratt
+backend. For each it reports the combinators allocated and the wall time
+per parse.
+
+    python benchmarks/bench_parser.py [--repeat N]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from type_project import parser, parser_core  # noqa: E402
+from type_project.parser_core import alt  # noqa: E402
+
+INPUTS = {
+    "let chain": "let x0 = 1 in "
+    + "".join(f"let x{i} = x{i - 1} + {i} in " for i in range(1, 40))
+    + "x39",
+    "arithmetic": " + ".join(f"{i} * (x - {i}) < y" for i in range(40)),
+    "closures": "let max = fun x -> fun y -> if x < y then y else x in "
+    "let sq = fun x -> x * x in max (sq 3) (sq 4)",
+}
+
+
+def _parse_expr_rebuilding(buf, pos):
+    return alt(
+        [
+            parser.parser_let(),
+            parser.parser_letrec(),
+            parser.parser_fun(),
+            parser.parser_if(),
+            parser.parser_lt(),
+        ]
+    ).parse(buf, pos)
+
+
+def count_allocations(s: str) -> int:
+    created = 0
+    init = parser_core.Parser.__init__
+
+    def counting_init(self, *args, **kwargs):
+        nonlocal created
+        created += 1
+        init(self, *args, **kwargs)
+
+    parser_core.Parser.__init__ = counting_init
+    try:
+        parser.parser_expr(s)
+    finally:
+        parser_core.Parser.__init__ = init
+    return created
+
+
+def time_per_parse(s: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parser.parser_expr(s)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--repeat", type=int, default=50)
+    args = argparser.parse_args()
+
+    parser.PARSER_BACKENDS["rebuilding"] = _parse_expr_rebuilding
+    parser.grammar()
+    print(f"{'input':<12} {'backend':<12} {'combinators':>12} {'us/parse':>10}")
+    for name, s in INPUTS.items():
+        for backend in ("rebuilding", "combinator", "pratt"):
+            previous = parser.set_parser_backend(backend)
+            try:
+                allocations = count_allocations(s)
+                seconds = time_per_parse(s, args.repeat)
+            finally:
+                parser.set_parser_backend(previous)
+            print(f"{name:<12} {backend:<12} {allocations:>12} {seconds * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark for rendering derivations of closure-heavy programs.
+
+Every judgement prints its whole environment, and a closure prints the
+environment it captured, so environments nest inside one another. Each
+program is evaluated afresh and written out with ``write_derivation``,
+once with the strings of ``ast.py`` objects rendered on every use, as
+they used to be, and once with them cached. Reports the output size and
+the time to write it.
+
+    python benchmarks/bench_render.py [--repeat N]
+"""
+
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from type_project import ast  # noqa: E402
+from type_project.ast import Env  # noqa: E402
+from type_project.iterative import infer_iterative  # noqa: E402
+from type_project.parser import parser_expr  # noqa: E402
+from type_project.printer import write_derivation  # noqa: E402
+
+PROGRAMS = {
+    "compose": "let f0 = fun x -> x + 1 in "
+    + "".join(f"let f{i} = fun x -> f{i - 1} (f{i - 1} x) in " for i in range(1, 7))
+    + "f6 0",
+    "curried": "let add = fun a -> fun b -> fun c -> fun d -> a + b + c + d in "
+    + " + ".join(f"add {i} 1 2 3" for i in range(40)),
+    "loop": "let rec loop = fun n -> if n < 1 then 0 else "
+    "(let g = fun y -> y + n in g 1) + loop (n - 1) in loop 150",
+}
+
+
+def _uncached_env_str(env: Env) -> str:
+    return ",".join([f"{k}={v}" for k, v in env])
+
+
+def uncached():
+    """Swap the cached ``__str__`` methods for the plain renderers."""
+    saved = {}
+    for cls in vars(ast).values():
+        render = getattr(cls, "__str__", None)
+        if isinstance(cls, type) and hasattr(render, "__wrapped__"):
+            saved[cls] = render
+            cls.__str__ = render.__wrapped__
+    saved[Env] = Env.__str__
+    Env.__str__ = _uncached_env_str
+    return saved
+
+
+def time_render(program: str, repeat: int) -> tuple[int, float]:
+    elapsed = 0.0
+    for _ in range(repeat):
+        e = parser_expr(program).return_value
+        d = infer_iterative(Env([]), e)
+        out = io.StringIO()
+        start = time.perf_counter()
+        write_derivation(d, out)
+        elapsed += time.perf_counter() - start
+    return len(out.getvalue()), elapsed / repeat
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--repeat", type=int, default=3)
+    args = argparser.parse_args()
+
+    print(f"{'program':<10} {'strings':<8} {'output KiB':>10} {'ms':>9}")
+    for name, program in PROGRAMS.items():
+        saved = uncached()
+        try:
+            size, seconds = time_render(program, args.repeat)
+        finally:
+            for cls, render in saved.items():
+                cls.__str__ = render
+        print(f"{name:<10} {'rebuilt':<8} {size / 1024:>10.0f} {seconds * 1e3:>9.1f}")
+        size, seconds = time_render(program, args.repeat)
+        print(f"{name:<10} {'cached':<8} {size / 1024:>10.0f} {seconds * 1e3:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
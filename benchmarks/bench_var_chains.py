@@ -0,0 +1,104 @@
+"""Micro-benchmark for variable lookups in ``infer``.
+
+The program is a chain of 1,000 ``let`` bindings whose body reads the
+outermost binding over and over (``x0 + x0 + ...``). Compares the
+``E-Var1``/``E-Var2`` chains as they used to be built (eagerly, once per
+read) with the shared, lazily built ones. For each it reports the
+derivation nodes allocated and the time to infer and then to walk every
+premise, as ``pp`` does (printing itself is dominated by writing out the
+1,000-binding environment of every judgement).
+
+    python benchmarks/bench_var_chains.py [--bindings N] [--reads N]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from type_project import evaluator  # noqa: E402
+from type_project.ast import Env, Judgement, Let, Plus, Var  # noqa: E402
+from type_project.evaluator import Derivation, VarDerivation, infer  # noqa: E402
+
+
+def let_chain(bindings: int, reads: int):
+    body = Var("x0")
+    for _ in range(reads - 1):
+        body = Plus(body, Var("x0"))
+    for i in reversed(range(bindings)):
+        body = Let(f"x{i}", i, body)
+    return body
+
+
+def _eager_var_derivation(env: Env, e: Var, depth=None) -> Derivation:
+    k, v = env.top()
+    if e.key == k:
+        return Derivation(Judgement(env, e, v), "E-Var1", [])
+    d = _eager_var_derivation(env.pop(), e)
+    return Derivation(Judgement(env, e, d.val()), "E-Var2", [d])
+
+
+def walk(d: Derivation) -> int:
+    visited = 0
+    stack = [d]
+    while stack:
+        d = stack.pop()
+        visited += 1
+        stack.extend(p for p in d.premises if isinstance(p, Derivation))
+    return visited
+
+
+def count_nodes(f) -> tuple[int, object]:
+    created = 0
+    inits = {cls: cls.__init__ for cls in (Derivation, VarDerivation)}
+
+    def counting(init):
+        def counting_init(self, *args, **kwargs):
+            nonlocal created
+            created += 1
+            init(self, *args, **kwargs)
+
+        return counting_init
+
+    for cls, init in inits.items():
+        cls.__init__ = counting(init)
+    try:
+        result = f()
+    finally:
+        for cls, init in inits.items():
+            cls.__init__ = init
+    return created, result
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--bindings", type=int, default=1000)
+    argparser.add_argument("--reads", type=int, default=200)
+    args = argparser.parse_args()
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 8 * args.bindings))
+
+    e = let_chain(args.bindings, args.reads)
+    shared = evaluator.var_derivation
+    print(f"{'chains':<8} {'nodes':>8} {'infer ms':>10} {'walk ms':>10}")
+    variants = (("eager", _eager_var_derivation), ("shared", shared))
+    for name, var_derivation in variants:
+        evaluator.var_derivation = var_derivation
+        try:
+            start = time.perf_counter()
+            nodes, d = count_nodes(lambda: infer(Env([]), e))
+            inferred = time.perf_counter() - start
+            start = time.perf_counter()
+            walked, _ = count_nodes(lambda: walk(d))
+            walking = time.perf_counter() - start
+        finally:
+            evaluator.var_derivation = shared
+        print(
+            f"{name:<8} {nodes + walked:>8} "
+            f"{inferred * 1e3:>10.1f} {walking * 1e3:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
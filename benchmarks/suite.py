@@ -0,0 +1,370 @@
+"""Benchmark suite with seeded workloads and a regression gate.
+
+Each workload generates a program of a given size from a seeded random
+generator, so a run is reproducible: long arithmetic chains, deeply
+nested ``if`` expressions, long ``let`` chains, curried closures applied
+to many arguments, Church numerals, and polymorphic functions used at
+several types. For every workload and size, ``run`` measures the time to
+parse the program, to derive it with ``infer``, to print the derivation
+with ``pp`` and to infer its type with ``infer_type`` (each the fastest
+of ``--repeat`` runs), the peak memory traced over the first three, and
+the nodes of the derivation, and writes them as JSON.
+
+Derivations, and above all their printed form, grow much faster than the
+programs they derive, so the workloads that bind long chains of names are
+also measured at sizes in the thousands for ``infer_type`` alone: the
+time to parse and to infer the type, which stay linear in the program
+only while looking a name up does not grow with the bindings in scope.
+
+    python benchmarks/suite.py run [--workloads W ...] [--sizes N ...]
+        [--repeat N] [--seed S] [--output results.json]
+    python benchmarks/suite.py compare BASELINE.json CURRENT.json
+
+``compare`` prints the change of every measurement in both files and
+exits with status 1 when one grew by more than its threshold: by default
+25% for timings, 10% for peak memory, and any growth of the node count.
+``--threshold METRIC=FRACTION`` overrides one of them. Timings that grew
+by less than ``--min-seconds`` (1 ms) are taken as noise.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from type_project.ast import Env  # noqa: E402
+from type_project.evaluator import Derivation, infer, pp  # noqa: E402
+from type_project.parser import parser_expr  # noqa: E402
+from type_project.type_infer import infer_type  # noqa: E402
+
+FORMAT_VERSION = 2
+
+# how much each measurement may grow before ``compare`` fails
+THRESHOLDS = {
+    "parse_seconds": 0.25,
+    "infer_seconds": 0.25,
+    "pp_seconds": 0.25,
+    "type_seconds": 0.25,
+    "peak_bytes": 0.10,
+    "nodes": 0.0,
+}
+
+
+def arithmetic(rng: random.Random, n: int) -> str:
+    """``n`` operands joined by ``+``, ``-`` and ``*``."""
+    terms = [str(rng.randint(0, 9))]
+    for _ in range(n - 1):
+        terms.append(f"{rng.choice('+-*')} {rng.randint(0, 9)}")
+    return " ".join(terms)
+
+
+def nested_if(rng: random.Random, n: int) -> str:
+    """``n`` conditionals, each taking the branch the next one is in."""
+    e = str(rng.randint(0, 9))
+    for _ in range(n):
+        a, b, other = rng.randint(0, 9), rng.randint(0, 9), rng.randint(0, 9)
+        if a < b:
+            e = f"if {a} < {b} then {e} else {other}"
+        else:
+            e = f"if {a} < {b} then {other} else {e}"
+    return e
+
+
+def let_chain(rng: random.Random, n: int) -> str:
+    """``n`` bindings, each using one bound earlier."""
+    lets = ["let x0 = 1 in"]
+    for i in range(1, n):
+        lets.append(f"let x{i} = x{rng.randrange(i)} + {rng.randint(0, 9)} in")
+    return " ".join(lets) + f" x{n - 1}"
+
+
+def curried(rng: random.Random, n: int) -> str:
+    """A function of ``n`` arguments, one ``fun`` each, applied to all of
+    them."""
+    params = " ".join(f"fun a{i} ->" for i in range(n))
+    body = " + ".join(f"a{i}" for i in range(n))
+    args = " ".join(str(rng.randint(0, 9)) for _ in range(n))
+    return f"let f = {params} {body} in f {args}"
+
+
+def church(rng: random.Random, n: int) -> str:
+    """The Church numeral ``n`` built by ``succ``, added to a smaller one
+    and converted back to an integer."""
+    m = rng.randint(1, n)
+    return (
+        "let zero = fun f -> fun x -> x in "
+        "let succ = fun n -> fun f -> fun x -> f (n f x) in "
+        "let add = fun m -> fun n -> fun f -> fun x -> m f (n f x) in "
+        "let c0 = zero in "
+        + "".join(f"let c{i} = succ c{i - 1} in " for i in range(1, n + 1))
+        + "let inc = fun k -> k + 1 in "
+        "let toint = fun n -> n inc 0 in "
+        f"toint (add c{n} c{m})"
+    )
+
+
+def poly_let(rng: random.Random, n: int) -> str:
+    """``n`` bindings, each of a value computed with a polymorphic function
+    of its own, used at ``bool`` and at ``int``."""
+    lets = ["let x0 = 1 in"]
+    for i in range(1, n):
+        j, k = rng.randrange(i), rng.randint(0, 9)
+        lets.append(
+            f"let x{i} = let id = fun y -> y in "
+            f"if id (x{j} < {k}) then id x{j} else {k} in"
+        )
+    return " ".join(lets) + f" x{n - 1}"
+
+
+WORKLOADS: dict[str, Callable[[random.Random, int], str]] = {
+    "arithmetic": arithmetic,
+    "nested-if": nested_if,
+    "let-chain": let_chain,
+    "curried": curried,
+    "church": church,
+    "poly-let": poly_let,
+}
+
+# default sizes; printed environments grow with the closures they hold, so
+# the output of the closure workloads grows much faster than their input
+SIZES = {
+    "arithmetic": [50, 100, 200],
+    "nested-if": [25, 50, 100],
+    "let-chain": [25, 50, 100],
+    "curried": [10, 20, 40],
+    "church": [4, 8, 16],
+    "poly-let": [25, 50, 100],
+}
+
+# sizes at which only parsing and type inference are measured
+TYPE_SIZES = {
+    "let-chain": [1000, 2000, 4000],
+    "poly-let": [1000, 2000, 4000],
+}
+
+
+def count_nodes(d: Derivation) -> int:
+    """Nodes of ``d``, the ``B-`` side conditions included."""
+    nodes = 0
+    stack = [d]
+    while stack:
+        d = stack.pop()
+        nodes += 1
+        if isinstance(d, Derivation):
+            stack.extend(d.premises)
+    return nodes
+
+
+def parse(program: str):
+    r = parser_expr(program)
+    if r.error is not None or r.remain.strip():
+        raise ValueError(f"generated program does not parse: {program[:60]}...")
+    return r.return_value
+
+
+def measure(program: str, repeat: int) -> dict:
+    parse_seconds = infer_seconds = pp_seconds = type_seconds = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        # like timeit, so a collection does not land in one run and not another
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            e = parse(program)
+            parsed = time.perf_counter()
+            d = infer(Env([]), e)
+            derived = time.perf_counter()
+            pp(d)
+            printed = time.perf_counter()
+            infer_type(Env([]), e)
+            typed = time.perf_counter()
+        finally:
+            gc.enable()
+        parse_seconds = min(parse_seconds, parsed - start)
+        infer_seconds = min(infer_seconds, derived - parsed)
+        pp_seconds = min(pp_seconds, printed - derived)
+        type_seconds = min(type_seconds, typed - printed)
+        # interned nodes of this tree would make the next parse cheaper
+        del e, d
+    gc.collect()
+    tracemalloc.start()
+    try:
+        d = infer(Env([]), parse(program))
+        pp(d)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "parse_seconds": parse_seconds,
+        "infer_seconds": infer_seconds,
+        "pp_seconds": pp_seconds,
+        "type_seconds": type_seconds,
+        "peak_bytes": peak,
+        "nodes": count_nodes(d),
+    }
+
+
+def measure_type(program: str, repeat: int) -> dict:
+    """The timings of ``measure`` that do not derive the program."""
+    parse_seconds = type_seconds = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            e = parse(program)
+            parsed = time.perf_counter()
+            infer_type(Env([]), e)
+            typed = time.perf_counter()
+        finally:
+            gc.enable()
+        parse_seconds = min(parse_seconds, parsed - start)
+        type_seconds = min(type_seconds, typed - parsed)
+        del e
+    return {"parse_seconds": parse_seconds, "type_seconds": type_seconds}
+
+
+def run(workloads: list[str], sizes: list[int] | None, repeat: int, seed: int) -> dict:
+    """Measure every workload at ``sizes``, or at its default sizes and its
+    ``TYPE_SIZES``."""
+    results = []
+    for name in workloads:
+        cases = [(size, measure) for size in sizes or SIZES[name]]
+        if not sizes:
+            cases += [(size, measure_type) for size in TYPE_SIZES.get(name, [])]
+        for size, measure_case in cases:
+            # seeded by case, so a case is the same whichever others run
+            program = WORKLOADS[name](random.Random(f"{seed}:{name}:{size}"), size)
+            results.append(
+                {"workload": name, "size": size} | measure_case(program, repeat)
+            )
+    return {
+        "version": FORMAT_VERSION,
+        "python": platform.python_version(),
+        "seed": seed,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(
+    baseline: dict,
+    current: dict,
+    thresholds: dict[str, float],
+    min_seconds: float = 0.001,
+) -> tuple[list[str], list[str]]:
+    """A line per measurement of the cases in both runs, and a line per
+    regression. A case measured by ``measure_type`` has only its timings,
+    so only those are compared. A timing that grew by less than
+    ``min_seconds`` is noise, whatever its ratio."""
+    before = {(r["workload"], r["size"]): r for r in baseline["results"]}
+    lines, regressions = [], []
+    for r in current["results"]:
+        case = (r["workload"], r["size"])
+        if case not in before:
+            continue
+        for metric, threshold in thresholds.items():
+            if metric not in r or metric not in before[case]:
+                continue
+            old, new = before[case][metric], r[metric]
+            change = new / old - 1 if old else 0.0 if new == old else float("inf")
+            line = (
+                f"{case[0]:<11} {case[1]:>5} {metric:<14} "
+                f"{_show(old)} {_show(new)} {change:>+8.1%}"
+            )
+            noise = metric.endswith("_seconds") and new - old < min_seconds
+            if change > threshold and not noise:
+                line += f"  regression (threshold {threshold:.0%})"
+                regressions.append(line)
+            lines.append(line)
+    return lines, regressions
+
+
+def _show(measurement: float | int) -> str:
+    if isinstance(measurement, int):
+        return f"{measurement:>12}"
+    return f"{measurement:>12.6f}"
+
+
+def _threshold(text: str) -> tuple[str, float]:
+    metric, _, fraction = text.partition("=")
+    if metric not in THRESHOLDS:
+        raise argparse.ArgumentTypeError(f"unknown metric {metric!r}")
+    return metric, float(fraction)
+
+
+def main(argv: list[str] | None = None) -> int:
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = argparser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="measure and write JSON")
+    run_parser.add_argument(
+        "--workloads", nargs="*", choices=list(WORKLOADS), default=list(WORKLOADS)
+    )
+    run_parser.add_argument(
+        "--sizes", type=int, nargs="*", help="sizes for every workload"
+    )
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", type=argparse.FileType("w"), default=sys.stdout)
+
+    compare_parser = commands.add_parser("compare", help="gate on regressions")
+    compare_parser.add_argument("baseline", type=argparse.FileType("r"))
+    compare_parser.add_argument("current", type=argparse.FileType("r"))
+    compare_parser.add_argument(
+        "--threshold",
+        type=_threshold,
+        action="append",
+        default=[],
+        metavar="METRIC=FRACTION",
+    )
+    compare_parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=0.001,
+        help="ignore timings that grew by less than this",
+    )
+    args = argparser.parse_args(argv)
+
+    if args.command == "run":
+        tables = (SIZES, TYPE_SIZES)
+        largest = max(
+            args.sizes or [n for t in tables for sizes in t.values() for n in sizes]
+        )
+        # the combinator parser and ``infer`` recurse for every level of
+        # nesting, several frames at a time
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 20 * largest))
+        results = run(args.workloads, args.sizes, args.repeat, args.seed)
+        json.dump(results, args.output, indent=2)
+        args.output.write("\n")
+        return 0
+
+    baseline, current = json.load(args.baseline), json.load(args.current)
+    for data in (baseline, current):
+        if data.get("version") != FORMAT_VERSION:
+            print(f"unsupported results version {data.get('version')}", file=sys.stderr)
+            return 2
+    thresholds = THRESHOLDS | dict(args.threshold)
+    lines, regressions = compare(baseline, current, thresholds, args.min_seconds)
+    print(
+        f"{'workload':<11} {'size':>5} {'metric':<14} {'baseline':>12} "
+        f"{'current':>12} {'change':>8}"
+    )
+    print("\n".join(lines))
+    if regressions:
+        print(f"{len(regressions)} regressions:", file=sys.stderr)
+        print("\n".join(regressions), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
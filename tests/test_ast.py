@@ -0,0 +1,48 @@
+import dataclasses
+import gc
+import pickle
+
+import pytest
+
+from type_project import ast
+from type_project.ast import Env, FunctionEval, FunctionValue, Let, Plus, Var
+from type_project.parser import parser_expr
+
+
+def test_nodes_interned():
+    e = parser_expr("let x = 1 + 2 in (1 + 2) * x").return_value
+
+    assert e.e1 is e.e2.e1
+    assert Plus(1, 2) is Plus(1, 2)
+    assert hash(Plus(1, 2)) == hash(Plus(1, 2))
+    assert Let(key="x", e1=1, e2=Var("x")) is Let("x", 1, Var("x"))
+    # 1 == True, but they are different terms
+    assert Plus(1, 2) is not Plus(True, 2)
+    assert Plus(1, 2) != Plus(True, 2)
+    assert str(Plus(True, 2)) == "(True + 2)"
+
+
+def test_nodes_immutable():
+    e = Plus(1, Var("x"))
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        e.e1 = 2
+    assert dataclasses.replace(e, e1=2) is Plus(2, Var("x"))
+    assert pickle.loads(pickle.dumps(e)) is e
+    assert not hasattr(e, "__dict__")
+
+    closure = FunctionValue(Env([("y", 1)]), FunctionEval("x", e))
+    assert closure == FunctionValue(Env([("y", 1)]), FunctionEval("x", e))
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        closure.env = Env([])
+
+
+def test_nodes_freed():
+    gc.collect()
+    before = ast.live_nodes()
+    e = parser_expr("let unusedname = 41 in unusedname + 41").return_value
+    assert ast.live_nodes() == before + 3
+
+    del e
+    gc.collect()
+    assert ast.live_nodes() == before
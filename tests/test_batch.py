@@ -0,0 +1,69 @@
+import pytest
+
+from type_project.ast import Error, Plus
+from type_project.batch import (
+    BatchSummary,
+    ParseError,
+    check,
+    check_batch,
+    parse_judgement,
+)
+
+LINES = [
+    "|- let a = 3 in let f = fun y -> y * a in let a = 5 in f 4 evalto 12\n",
+    "|- 1 + 2 evalto 4\n",
+    "\n",
+    "|- 1 + true + 2 evalto error\n",
+    "|- 1 + evalto 3\n",
+    "|- 1 < 2 evalto 1\n",
+    "x = 3 |- x + y evalto 3\n",
+]
+
+
+def test_parse_judgement():
+    j = parse_judgement("|- 1 + true evalto error")
+    assert (j.e, j.v) == (Plus(1, True), Error())
+    with pytest.raises(ParseError):
+        parse_judgement("|- 1 + true evalto nothing")
+
+
+def test_check():
+    assert check(1, "x = 2 |- x * x evalto 4").status == "ok"
+    r = check(1, "|- 1 + 2 evalto 4")
+    assert (r.status, r.value, r.message) == ("wrong", "3", "evaluates to 3, not 4")
+    r = check(1, "|- 1 < 2 evalto 1")
+    assert (r.status, r.value) == ("wrong", "true")
+    r = check(1, "|- 1 + 2 evalto 3 junk")
+    assert r.status == "error"
+    assert r.message == "parse error: unexpected text at offset 18"
+    r = check(2, "x = 1 |- x + y evalto 3")
+    assert str(r) == "2: error: unbound variable y"
+    r = check(3, "|- 1 + evalto 3")
+    assert str(r) == "3: error: parse error: expected 'evalto' at offset 5"
+
+    r = check(1, "|- 1 + 2 evalto 3", derivation=True)
+    assert r.derivation.startswith("|- (1 + 2) evalto 3 by E-Plus {")
+
+
+def test_check_batch_in_order():
+    expected = [
+        (1, "ok"),
+        (2, "wrong"),
+        (4, "ok"),
+        (5, "error"),
+        (6, "wrong"),
+        (7, "error"),
+    ]
+    inline = list(check_batch(LINES, workers=0, chunk_size=2))
+    pooled = list(check_batch(LINES * 20, workers=2, chunk_size=3))
+
+    assert [(r.line, r.status) for r in inline] == expected
+    assert [(r.line, r.status) for r in pooled[:6]] == expected
+    assert [r.line for r in pooled] == sorted(r.line for r in pooled)
+    assert pooled[:6] == inline
+    assert inline[-1].message == "unbound variable y"
+
+    summary = BatchSummary()
+    for r in pooled:
+        summary.add(r)
+    assert (summary.ok, summary.wrong, summary.errors) == (40, 40, 40)
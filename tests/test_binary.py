@@ -0,0 +1,101 @@
+import pytest
+
+from type_project.ast import Env, Judgement, Let, Plus, Var
+from type_project.binary import (
+    BinaryReader,
+    FormatError,
+    StoredDerivation,
+    dump,
+    dumps,
+    load,
+    loads,
+)
+from type_project.batch import parse_judgement
+from type_project.evaluator import infer, pp
+from type_project.parser import parser_expr
+
+FIB = "let rec fib = fun n -> if n < 3 then 1 else fib (n - 1) + fib (n - 2) in fib 8"
+
+
+def derive(src: str):
+    return infer(Env([]), parser_expr(src).return_value)
+
+
+@pytest.mark.parametrize(
+    "src",
+    [
+        FIB,
+        "let f = fun x -> fun y -> x * y in let g = f 3 in g true",
+        "if 1 < 2 then 3 - 40000000000 else 5",
+        "let x = 1 in let x = x + 1 in x",
+    ],
+)
+def test_round_trip(src):
+    d = derive(src)
+    d2 = loads(dumps(d))
+
+    assert isinstance(d2, StoredDerivation)
+    assert d2 == d
+    assert pp(d2) == pp(d)
+
+
+def test_values_and_judgements():
+    j = parse_judgement("x = 3, y = true |- x + y evalto error")
+    values = (j, j.env, j.e, -5, 0, 2**70, True, None, "1 plus 2 is 3 by B-Plus{}")
+
+    assert loads(dumps(values)) == values
+    # expression nodes are interned, so they come back as the same node
+    assert loads(dumps(j.e)) is j.e
+    with pytest.raises(TypeError):
+        dumps(1.5)
+
+
+def test_shared_subtrees_written_once():
+    e = Plus(Let("x", 1, Var("x")), Let("x", 1, Var("x")))
+    data = dumps(e)
+    reader = BinaryReader(data)
+
+    # 1, the variable, the let and the sum, and one string
+    assert (reader.records, reader.strings) == (4, 1)
+    # an environment is written once, not in every node it appears in
+    assert len(dumps(derive(FIB))) < len(pp(derive(FIB))) // 20
+
+
+def test_read_through_mmap_on_demand(tmp_path):
+    d = derive(FIB)
+    path = tmp_path / "fib.tpd"
+    dump(d, path)
+    reader = BinaryReader.open(path)
+
+    root = reader.load()
+    assert root.rule == "E-LetRec"
+    assert root.val() == 21
+    # only the root's conclusion has been decoded, not its premises
+    assert len(reader._objects) < reader.records // 5
+    assert load(path) == d
+
+
+def test_reader_close(tmp_path):
+    path = tmp_path / "fib.tpd"
+    dump(derive(FIB), path)
+    with BinaryReader.open(path) as reader:
+        root = reader.load()
+        assert root.val() == 21
+
+    assert reader.buffer.closed
+    with pytest.raises(ValueError):
+        root.premises
+    reader.close()
+    # a reader over bytes has nothing to unmap
+    reader = BinaryReader(dumps(derive(FIB)))
+    reader.close()
+    assert reader.load().val() == 21
+
+
+def test_bad_data():
+    with pytest.raises(FormatError):
+        loads(b"TPDB")
+    with pytest.raises(FormatError):
+        loads(b"XXXX" + dumps(1)[4:])
+    with pytest.raises(FormatError):
+        loads(dumps(Judgement(Env([]), 1, 1))[:-3])
@@ -0,0 +1,46 @@
+from type_project.ast import Env, FunctionValue
+from type_project.dag import DerivationStore
+from type_project.evaluator import infer, pp
+from type_project.nameless import derive
+from type_project.parser import parser_expr
+
+
+def test_pp_expands_dag():
+    e = parser_expr(
+        "let rec fib = fun n -> if n < 3 then 1 else fib (n - 1) + fib (n - 2) in fib 8"
+    ).return_value
+    d = infer(Env([]), e)
+    store = DerivationStore()
+    root = store.add(d)
+
+    assert store.pp(root) == pp(d)
+    assert store.expand(root) == d
+    assert store.stats.stored == len(store.nodes) < store.stats.added
+    assert store.add(d) == root
+
+
+def test_equal_subderivations_are_shared():
+    e = parser_expr("let sq = fun x -> x * x in sq 3 + sq 3").return_value
+    store = DerivationStore()
+    root = store.add(infer(Env([]), e))
+    plus = store.node(store.node(root).premises[1])
+
+    # both calls are the same node, although each built its own x=3
+    assert plus.premises[0] == plus.premises[1]
+    assert str(store.node(plus.premises[0]).conclusion).endswith("sq (3) evalto 9")
+    assert str(store.stats).startswith("12 nodes, 8 stored (33.3% reused)")
+
+
+def test_terms():
+    store = DerivationStore()
+    fun = parser_expr("fun x -> x").return_value
+
+    assert store.term(Env([("x", 1)])) == store.term(Env([("x", 1)]))
+    assert store.term(Env([("x", 1)])) != store.term(Env([("x", True)]))
+    assert store.term(1) != store.term(True)
+    assert store.term(FunctionValue(Env([]), fun)) == store.term(
+        FunctionValue(Env([]), parser_expr("fun x -> x").return_value)
+    )
+
+    d = derive(Env([]), parser_expr("let f = fun x -> x in f 1").return_value, True)
+    assert store.pp(store.add(d)) == pp(d)
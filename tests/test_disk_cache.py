@@ -0,0 +1,76 @@
+import os
+
+from type_project.batch import check, check_batch
+from type_project.disk_cache import DiskCache
+from type_project.evaluator import pp
+
+JUDGEMENT = "|- let f = fun x -> x * 2 in f 21 evalto 42"
+
+
+def test_derive_reads_back(tmp_path):
+    cache = DiskCache(tmp_path)
+    j, d = cache.derive(JUDGEMENT)
+    j2, d2 = cache.derive("|-  let f = fun x ->\tx * 2 in f 21   evalto 42 ")
+
+    assert (cache.stats.misses, cache.stats.hits, cache.stats.writes) == (1, 1, 1)
+    assert str(j2) == str(j)
+    assert pp(d2) == pp(d)
+    # a new cache on the same directory, as in a later run
+    assert DiskCache(tmp_path).get(JUDGEMENT) is not None
+    assert DiskCache(tmp_path).get("|- 1 evalto 1") is None
+
+
+def test_entry_not_held_open(tmp_path):
+    cache = DiskCache(tmp_path)
+    expected = pp(cache.derive(JUDGEMENT)[1])
+    _, d = cache.get(JUDGEMENT)
+    # removed before anything but the root's conclusion was decoded
+    cache.clear()
+
+    assert pp(d) == expected
+    assert isinstance(d._reader.buffer, bytes)
+
+
+def test_damaged_entry_is_derived_again(tmp_path):
+    cache = DiskCache(tmp_path)
+    cache.derive(JUDGEMENT)
+    cache.path(cache.key(JUDGEMENT)).write_bytes(b"")
+
+    assert cache.get(JUDGEMENT) is None
+    assert cache.derive(JUDGEMENT)[1].val() == 42
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path)
+    texts = [f"|- {n} + 1 evalto {n + 1}" for n in range(2, 6)]
+    for age, text in enumerate(texts):
+        cache.derive(text)
+        os.utime(cache.path(cache.key(text)), (age, age))
+    size = cache.path(cache.key(texts[0])).stat().st_size
+
+    # reading the oldest makes it the most recently used
+    cache.get(texts[0])
+    cache.max_bytes = 3 * size
+    cache.derive("|- 7 + 1 evalto 8")
+
+    assert cache.stats.evictions == 2
+    assert [cache.get(text) is not None for text in texts] == [
+        True,
+        False,
+        False,
+        True,
+    ]
+
+
+def test_batch_with_cache(tmp_path):
+    lines = [JUDGEMENT, "|- 1 + 2 evalto 4", "|- 1 + evalto 3"]
+    cache = DiskCache(tmp_path)
+    first = list(check_batch(lines, workers=0, derivations=True, cache=cache))
+    again = list(check_batch(lines, workers=0, derivations=True, cache=cache))
+
+    assert again == first
+    assert [r.status for r in again] == ["ok", "wrong", "error"]
+    assert (cache.stats.hits, cache.stats.writes) == (2, 2)
+    assert check(1, JUDGEMENT, derivation=True, cache=cache) == check(
+        1, JUDGEMENT, derivation=True
+    )
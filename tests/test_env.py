@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from type_project.ast import Env, Judgement, Plus
+
+
+def test_env_push_pop():
+    env = Env([("x", 3), ("y", 2)])
+
+    assert list(env) == [("x", 3), ("y", 2)]
+    assert env.vars == [("x", 3), ("y", 2)]
+    assert env.top() == ("y", 2)
+    assert env.pop() == Env([("x", 3)])
+    assert env.push("x", True) == Env([("x", 3), ("y", 2), ("x", True)])
+    assert env.push("z", 1).pop() is env
+    assert env.extend(Env([("z", 1)])) == [("x", 3), ("y", 2), ("z", 1)]
+    assert env != Env([("y", 2), ("x", 3)])
+    assert Env([]).pop() == Env([])
+    with pytest.raises(IndexError):
+        Env([]).top()
+
+
+def test_env_lookup():
+    env = Env([("x", 3), ("y", 2)])
+    shadowed = env.push("x", 5)
+
+    assert shadowed.lookup("x") == 5
+    assert shadowed.lookup("y") == 2
+    assert shadowed.push("z", 1).lookup("x") == 5
+    assert env.lookup("x") == 3
+    with pytest.raises(KeyError):
+        env.lookup("z")
+
+
+def test_env_locate():
+    env = Env([("x", 3), ("y", 2)])
+    for i in range(100):
+        env = env.push(f"z{i}", i)
+    env = env.push("x", 5)
+
+    assert env.locate("x") == (5, 1)
+    assert env.pop().locate("x") == (3, 102)
+    assert env.locate("y") == (2, 102)
+    assert env.locate("z0") == (0, 101)
+    with pytest.raises(KeyError):
+        env.locate("w")
+
+
+def _push_and_lookup(env: Env, n: int) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        e = env
+        for i in range(n):
+            e = e.push(f"y{i}", i)
+            e.lookup("x0")
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def test_env_lookup_flat():
+    # pushing onto a deep environment and looking a name up costs no more
+    # than on a shallow one: the index is extended, not copied
+    shallow, deep = Env([]), Env([])
+    for i in range(100):
+        shallow = shallow.push(f"x{i}", i)
+    for i in range(10_000):
+        deep = deep.push(f"x{i}", i)
+    shallow.lookup("x0"), deep.lookup("x0")
+
+    assert _push_and_lookup(deep, 300) < 4 * _push_and_lookup(shallow, 300)
+
+
+def test_env_str():
+    env = Env([("x", 3), ("y", True)])
+
+    assert str(env) == "x=3,y=True"
+    assert str(Judgement(env, Plus(1, 1), 2)) == "x=3,y=True |- (1 + 1) evalto 2"
+    assert str(Judgement(Env([]), 1, 1)) == "|- 1 evalto 1"
+
+
+def test_env_str_cached():
+    base = Env([("x", 3)])
+    env = base.push("y", 2).push("z", 1)
+
+    assert str(env) == "x=3,y=2,z=1"
+    # rendering a child renders and keeps every parent on the way
+    assert str(env.pop()) is str(env.pop())
+    assert str(env.pop()) == "x=3,y=2"
+    assert str(Env([("x", 3), ("y", 2)])) == "x=3,y=2"
+    assert str(Env([]).push("a", True)) == "a=True"
@@ -0,0 +1,67 @@
+import io
+import json
+
+from type_project import evaluator
+from type_project.ast import Env
+from type_project.eval_profile import main, profile_eval
+from type_project.evaluator import infer, pp
+from type_project.parser import parser_expr
+
+FIB = "let rec fib = fun n -> if n < 3 then 1 else fib (n - 1) + fib (n - 2) in fib 5"
+
+
+def test_profile_eval():
+    e = parser_expr(FIB).return_value
+    expected = pp(infer(Env([]), e))
+    format_node = evaluator._pp
+
+    with profile_eval() as profile:
+        d = infer(Env([]), e)
+        text = pp(d)
+        assert evaluator._pp is not format_node
+
+    assert text == expected
+    assert evaluator._active_cache is None
+    assert evaluator._pp is format_node
+
+    rules = profile.infer.rules
+    # fib 5 makes 9 calls, 4 of them adding up two more
+    assert rules["E-AppRec"].calls == 9
+    assert rules["E-Lt"].calls == rules["B-Lt"].calls == 9
+    assert rules["B-Plus"].calls == 4
+    assert rules["B-Minus"].calls == 8
+    assert profile.max_env_depth == 2
+    for s in rules.values():
+        assert s.cumulative_time >= s.self_time >= 0
+    total = sum(s.self_time for s in rules.values())
+    # recursive calls are counted in the outermost one only
+    assert rules["E-AppRec"].cumulative_time <= rules["E-LetRec"].cumulative_time
+    assert rules["E-LetRec"].cumulative_time >= total * 0.99
+
+    assert profile.pp.rules["E-AppRec"].calls == 9
+    assert sum(s.nodes for s in profile.pp.rules.values()) == text.count(" by ")
+    assert profile.pp.rules["E-LetRec"].bytes > len(text)
+
+    out = io.StringIO()
+    profile.write_json(out)
+    data = json.loads(out.getvalue())
+    assert data["infer"]["E-AppRec"]["calls"] == 9
+    assert set(data["pp"]["E-Int"]) == {
+        "calls",
+        "self_time",
+        "cumulative_time",
+        "nodes",
+        "bytes",
+    }
+
+
+def test_profile_eval_main(tmp_path, capsys):
+    src = tmp_path / "judgements.txt"
+    src.write_text(f"|- {FIB} evalto 5\nx = 3 |- x + true evalto error\n")
+    out = tmp_path / "profile.json"
+
+    main([str(src), "--json", str(out)])
+
+    report = capsys.readouterr().out
+    assert "E-PlusBoolR" in report
+    assert json.loads(out.read_text())["infer"]["E-PlusBoolR"]["calls"] == 1
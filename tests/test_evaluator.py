@@ -0,0 +1,162 @@
+import sys
+
+import pytest
+
+from type_project import evaluator
+from type_project.ast import Env, Error, Judgement, Let, Plus, Var
+from type_project.evaluator import (
+    Derivation,
+    LazyDerivation,
+    UnboundVariableError,
+    evaluate,
+    infer,
+    infer_lazy,
+    pp,
+    var_derivation,
+)
+from type_project.parser import parser_expr
+
+
+def test_var_chain():
+    env = Env([("x", 1), ("y", 2), ("z", 3)])
+    d = var_derivation(env, Var("x"))
+
+    assert d.val() == 1
+    assert d.rule == "E-Var2"
+    y = Env([("x", 1), ("y", 2)])
+    assert d == Derivation(
+        Judgement(env, Var("x"), 1),
+        "E-Var2",
+        [
+            Derivation(
+                Judgement(y, Var("x"), 1),
+                "E-Var2",
+                [Derivation(Judgement(Env([("x", 1)]), Var("x"), 1), "E-Var1", [])],
+            )
+        ],
+    )
+    with pytest.raises(UnboundVariableError, match="unbound variable w"):
+        var_derivation(env, Var("w"))
+    with pytest.raises(UnboundVariableError, match="unbound variable w"):
+        evaluate(env, Plus(1, Var("w")))
+
+
+def test_var_chain_shared_and_lazy():
+    env = Env([("x", 1), ("y", 2), ("z", 3)])
+    d = var_derivation(env, Var("x"))
+
+    assert d._premises is None
+    assert var_derivation(env, Var("x")) is d
+    assert var_derivation(env, Var("x"), 3) is d
+    # the chain below is shared with direct lookups in the shorter envs
+    assert d.premises[0] is var_derivation(env.pop(), Var("x"))
+
+    e = parser_expr("let x = 1 in let y = 2 in x + x").return_value
+    plus = infer(Env([]), e).premises[1].premises[1]
+    assert plus.premises[0] is plus.premises[1]
+    assert pp(plus.premises[0]) == "\n".join(
+        [
+            "x=1,y=2 |- x evalto 1 by E-Var2 {",
+            "  x=1 |- x evalto 1 by E-Var1{};",
+            "};",
+        ]
+    )
+
+
+def test_letrec():
+    e = parser_expr(
+        "let rec f = fun x -> if x < 1 then 0 else x + f (x - 1) in f 2"
+    ).return_value
+    d = infer(Env([]), e)
+
+    assert d.val() == 3
+    assert d.rule == "E-LetRec"
+    closure = d.conclusion.e.e1
+    assert str(d.premises[0].conclusion.env) == f"f=()[rec f = {closure}]"
+    app = d.premises[0]
+    assert app.rule == "E-AppRec"
+    # every call binds its argument on top of the same recursive environment
+    inner = app.premises[2].premises[1].premises[1].premises[2]
+    assert inner.conclusion.env.pop() is app.premises[2].conclusion.env.pop()
+
+
+def test_str_cached():
+    e = parser_expr("let f = fun x -> x + 1 in f 2").return_value
+    d = infer(Env([]), e)
+    closure = d.premises[0].val()
+
+    assert str(e) is str(e)
+    assert str(closure) == "()[fun x -> (x + 1)]"
+    assert str(closure) is str(d.premises[1].premises[0].val())
+
+
+def test_lazy_derivation():
+    e = parser_expr(
+        "let rec f = fun x -> if x < 1 then 0 else x + f (x - 1) in f 3 < 7"
+    ).return_value
+    d = infer_lazy(Env([]), e)
+
+    assert isinstance(d, LazyDerivation)
+    assert d._premises is None
+    assert d.val() is True
+    assert evaluate(Env([]), e) is True
+    assert d == infer(Env([]), e)
+    assert pp(d) == pp(infer(Env([]), e))
+    assert evaluate(Env([]), parser_expr("if 1 then 2 else 3").return_value) == Error()
+    assert evaluate(Env([]), parser_expr("1 + (2 < 3)").return_value) == Error()
+
+
+def test_lazy_derivation_evaluates_once(monkeypatch):
+    e = parser_expr(
+        "let rec fib = fun n -> if n < 2 then n else fib (n - 1) + fib (n - 2) "
+        "in let x = fib 8 in x * 2"
+    ).return_value
+    calls = []
+    monkeypatch.setattr(
+        evaluator, "evaluate", lambda *args: calls.append(args) or evaluate(*args)
+    )
+    d = infer_lazy(Env([]), e)
+
+    # every premise takes the value recorded when the root was evaluated
+    assert pp(d) == pp(infer(Env([]), e))
+    assert len(calls) == 1
+
+
+def test_lazy_derivation_deep():
+    depth = sys.getrecursionlimit() * 2
+    e = Var("x")
+    for _ in range(depth):
+        e = Let("x", Plus(Var("x"), 1), e)
+    e = Let("x", 0, e)
+    assert evaluate(Env([]), e) == depth
+
+    d = infer_lazy(Env([]), e)
+    for _ in range(depth + 1):
+        assert d.rule == "E-Let"
+        d = d.premises[1]
+    assert d.val() == depth
+
+    e = parser_expr(
+        f"let rec f = fun n -> if n < 1 then 0 else 1 + f (n - 1) in f {depth}"
+    ).return_value
+    assert evaluate(Env([]), e) == depth
+
+
+def test_pp_max_depth():
+    e = parser_expr("let x = 1 + 2 in x * 2").return_value
+    d = infer_lazy(Env([]), e)
+
+    assert pp(d, max_depth=1) == "\n".join(
+        [
+            "|- let x = (1 + 2) in (x * 2) evalto 6 by E-Let {",
+            "  |- (1 + 2) evalto 3 by E-Plus {...};",
+            "  x=3 |- (x * 2) evalto 6 by E-Times {...};",
+            "};",
+        ]
+    )
+    assert pp(d, max_depth=0) == (
+        "|- let x = (1 + 2) in (x * 2) evalto 6 by E-Let {...};"
+    )
+    # the premises of elided nodes were never expanded
+    assert d.premises[0].premises[0]._premises is None
+    assert pp(d, max_depth=3) == pp(infer(Env([]), e))
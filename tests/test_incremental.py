@@ -0,0 +1,59 @@
+import random
+import sys
+
+from type_project.incremental import parse_judgement, reparse
+from type_project.parser import PARSER_BACKENDS, grammar, set_parser_backend
+
+sys.path.insert(0, __file__.rsplit("/", 1)[0])
+from test_pratt import gen_expr  # noqa: E402
+
+EDITS = ["", " ", "1", "x", "+ 2", "(", ")", "let y = 2 in ", " in ", "if", "fun"]
+EDITS += ["true", "error", "val", "2"]
+
+
+def check(result):
+    full = parse_judgement(result.text)
+    assert result.judgement == full.judgement, result.text
+    assert result.span == full.span, result.text
+    assert result.end == full.end, result.text
+    assert (result.error is None) == (full.error is None), result.text
+
+    # spans come from the Pratt backend, but the judgement is the one
+    # either backend parses
+    for backend in PARSER_BACKENDS:
+        previous = set_parser_backend(backend)
+        try:
+            pret = grammar().judge(result.text)
+        finally:
+            set_parser_backend(previous)
+        assert pret.return_value == result.judgement, (backend, result.text)
+        if pret.error is None:
+            assert len(result.text) - len(pret.remain) == result.end
+
+
+def test_reparse_matches_full_parse():
+    rng = random.Random(5)
+    for _ in range(300):
+        current = parse_judgement(f"x = 3 |- {gen_expr(rng, 4)} evalto 3")
+        for _ in range(4):
+            start = rng.randint(0, len(current.text))
+            end = min(len(current.text), start + rng.choice([0, 0, 1, 2, 5]))
+            current = reparse(current, start, end, rng.choice(EDITS))
+            check(current)
+
+
+def test_reparse_smallest_enclosing_node():
+    text = "|- let a = (let b = 1 in b + 1) in if a < 2 then a else 3 evalto 2"
+    previous = parse_judgement(text)
+
+    start = text.index("b + 1")
+    edited = reparse(previous, start, start + 1, "b * b")
+    check(edited)
+    assert edited.reparsed == (text.index("let b"), text.index(")") + 4)
+    assert edited.judgement.e.e2 is previous.judgement.e.e2
+
+    start = text.index("then a") + 5
+    edited = reparse(previous, start, start + 1, "a - 1")
+    check(edited)
+    assert edited.reparsed == (text.index("if"), text.index(" evalto") + 4)
+    assert edited.judgement.e.e1 is previous.judgement.e.e1
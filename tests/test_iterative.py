@@ -0,0 +1,62 @@
+import pytest
+
+from type_project.ast import Env, FunctionApply, FunctionEval, Let, Plus, Var
+from type_project.evaluator import infer, pp
+from type_project.iterative import DerivationDepthError, infer_iterative
+from type_project.parser import parser_expr
+
+PROGRAMS = [
+    "let a = 3 in let f = fun y -> y * a in let a = 5 in f 4",
+    "let max = fun x -> fun y -> if x < y then y else x in max 3 5",
+    "let sq = fun x -> x * x in sq 3 + sq 4",
+    "let twice = fun f -> fun x -> f (f x) in twice (fun x -> x * x) 2",
+    "if 1 < 2 then 1 + true else 3",
+    "if 2 < 1 then 3 else if 3 then 4 else 5",
+    "let x = if 1 then 1 else 2 in x - 1 * 2",
+    "let rec fact = fun n -> if n < 2 then 1 else n * fact (n - 1) in fact 5",
+    "let k = 2 in let rec f = fun n -> if n < 1 then k else f (n - 1) in f 3",
+]
+
+
+@pytest.mark.parametrize("program", PROGRAMS)
+def test_same_derivation_as_infer(program):
+    e = parser_expr(program).return_value
+    env = Env([("z", 7)])
+
+    d = infer_iterative(env, e)
+    assert d == infer(env, e)
+    assert pp(d) == pp(infer(env, e))
+
+
+def test_deep_expressions():
+    n = 20000
+    plus = 0
+    for i in range(n):
+        plus = Plus(plus, Var("x"))
+    assert infer_iterative(Env([("x", 1)]), plus).val() == n
+
+    lets = Var("x0")
+    for i in reversed(range(n)):
+        lets = Let(f"x{i}", i, lets)
+    assert infer_iterative(Env([]), lets).val() == 0
+
+    # k_i calls k_(i-1) in tail position
+    calls = FunctionApply(Var(f"k{n - 1}"), 5)
+    for i in reversed(range(1, n)):
+        body = FunctionApply(Var(f"k{i - 1}"), Var("x"))
+        calls = Let(f"k{i}", FunctionEval("x", body), calls)
+    calls = Let("k0", FunctionEval("x", Plus(Var("x"), 1)), calls)
+    assert infer_iterative(Env([]), calls).val() == 6
+
+    sum_n = parser_expr(
+        "let rec sum = fun n -> if n < 1 then 0 else n + sum (n - 1) in sum 10000"
+    ).return_value
+    assert infer_iterative(Env([]), sum_n).val() == 50005000
+
+
+def test_max_depth():
+    e = parser_expr("let x = 1 in let y = 2 in x + y").return_value
+
+    assert infer_iterative(Env([]), e, max_depth=3).val() == 3
+    with pytest.raises(DerivationDepthError, match="maximum depth of 2"):
+        infer_iterative(Env([]), e, max_depth=2)
@@ -0,0 +1,62 @@
+from type_project.ast import Env, Plus
+from type_project.evaluator import infer, pp
+from type_project.memo import InferCache, same, structural_hash
+from type_project.parser import parser_expr
+
+FIB = "let rec fib = fun n -> if n < 3 then 1 else fib (n - 1) + fib (n - 2) in fib {}"
+
+
+def test_memo_matches_infer():
+    e = parser_expr(FIB.format(10)).return_value
+    cache = InferCache()
+    d = cache.infer(Env([]), e)
+
+    assert d == infer(Env([]), e)
+    assert pp(d) == pp(infer(Env([]), e))
+    assert cache.stats.hits > 0
+    assert cache.stats.evictions == 0
+    # calls in equal environments share one subderivation
+    seen: dict[str, set[int]] = {}
+    stack = [d]
+    while stack:
+        node = stack.pop()
+        seen.setdefault(str(node.conclusion), set()).add(id(node))
+        stack.extend(p for p in node.premises if not isinstance(p, str))
+    assert all(len(ids) == 1 for ids in seen.values())
+
+    hits = cache.stats.hits
+    assert cache.infer(Env([]), e) is d
+    assert cache.stats.hits == hits + 1
+
+
+def test_memo_structural_keys():
+    e = parser_expr("x + 1").return_value
+    cache = InferCache()
+    d = cache.infer(Env([("x", 2)]), e)
+
+    # a different but equal environment and expression hit the same entry
+    assert cache.infer(Env([("x", 2)]), parser_expr("x + 1").return_value) is d
+    assert cache.stats.hits == 1
+    # 1 and True are equal in Python but not as terms
+    assert Env([("x", 1)]) == Env([("x", True)])
+    assert not same(Plus(1, 2), Plus(True, 2))
+    assert not same(Env([("x", 1)]), Env([("x", True)]))
+    assert structural_hash(Env([("x", 1)])) == structural_hash(Env([("x", 1)]))
+    d = cache.infer(Env([("x", True)]), e)
+    assert pp(d) == pp(infer(Env([("x", True)]), e))
+
+
+def test_memo_bounds():
+    e = parser_expr(FIB.format(12)).return_value
+    cache = InferCache(max_entries=8)
+    assert cache.infer(Env([]), e) == infer(Env([]), e)
+    assert cache.stats.entries == 8
+    assert cache.stats.evictions == cache.stats.misses - 8
+
+    cache = InferCache(max_bytes=2**14)
+    assert cache.infer(Env([]), e) == infer(Env([]), e)
+    assert 0 < cache.stats.bytes <= 2**14
+    assert cache.stats.evictions > 0
+
+    cache.clear()
+    assert cache.stats.entries == cache.stats.bytes == 0
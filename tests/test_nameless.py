@@ -0,0 +1,150 @@
+import time
+
+import pytest
+
+from type_project.ast import (
+    Env,
+    FunctionApply,
+    FunctionEval,
+    FunctionValue,
+    Index,
+    Let,
+    Plus,
+    Times,
+)
+from type_project import nameless
+from type_project.evaluator import infer, pp
+from type_project.nameless import Frame, UnboundVariableError, compile_expr, derive
+from type_project.parser import parser_expr
+
+PROGRAMS = [
+    "let a = 3 in let f = fun y -> y * a in let a = 5 in f 4",
+    "let max = fun x -> fun y -> if x < y then y else x in max 3 5",
+    "let sq = fun x -> x * x in sq 3 + sq 4",
+    "let twice = fun f -> fun x -> f (f x) in twice (fun x -> x * x) 2",
+    "let x = 1 in let y = true in if y then x + 1 else error",
+    "1 + true + 2",
+    "let rec fact = fun n -> if n < 2 then 1 else n * fact (n - 1) in fact 5",
+    "let k = 2 in let rec f = fun n -> if n < 1 then k else f (n - 1) in f 3",
+]
+
+
+def test_compile_expr():
+    e = parser_expr("let a = 3 in let f = fun y -> y * a in f 4").return_value
+
+    assert compile_expr(e) == Let(
+        ".",
+        3,
+        Let(
+            ".",
+            FunctionEval(".", Times(Index(1), Index(2))),
+            FunctionApply(Index(1), 4),
+        ),
+    )
+    assert compile_expr(parser_expr("x + y").return_value, ["y", "x"]) == Plus(
+        Index(1), Index(2)
+    )
+
+
+def test_compile_expr_unbound():
+    with pytest.raises(UnboundVariableError):
+        compile_expr(parser_expr("let x = 1 in fun y -> z").return_value)
+    with pytest.raises(UnboundVariableError):
+        derive(Env([("x", 1)]), parser_expr("x + #2").return_value)
+
+
+@pytest.mark.parametrize("program", PROGRAMS)
+def test_derive_named(program):
+    e = parser_expr(program).return_value
+    env = Env([("z", 7)])
+
+    assert derive(env, e) == infer(env, e)
+    assert pp(derive(env, e)) == pp(infer(env, e))
+
+
+def test_derive_nameless():
+    e = parser_expr("let sq = fun x -> x * x in sq 3").return_value
+
+    assert pp(derive(Env([]), e, nameless=True)) == "\n".join(
+        [
+            "|- let . = fun . -> (#1 * #1) in #1 (3) evalto 9 by E-Let {",
+            "  |- fun . -> (#1 * #1) evalto ()[fun . -> (#1 * #1)] by E-Fun{};",
+            "  ()[fun . -> (#1 * #1)] |- #1 (3) evalto 9 by E-App {",
+            "    ()[fun . -> (#1 * #1)] |- #1 evalto ()[fun . -> (#1 * #1)] by E-Var{};",
+            "    ()[fun . -> (#1 * #1)] |- 3 evalto 3 by E-Int{};",
+            "    3 |- (#1 * #1) evalto 9 by E-Times {",
+            "      3 |- #1 evalto 3 by E-Var{};",
+            "      3 |- #1 evalto 3 by E-Var{};",
+            "      3 times 3 is 9 by B-Times{};",
+            "    };",
+            "  };",
+            "};",
+        ]
+    )
+    d = derive(Env([("x", 1), ("y", 2)]), parser_expr("x").return_value, True)
+    assert d.conclusion.env == Frame([1, 2])
+    assert d.rule == "E-Var"
+    assert d.val() == 1
+
+
+def test_frame():
+    frame = Frame([1, 2]).push(3)
+
+    assert list(frame) == [1, 2, 3]
+    assert [frame.lookup(i) for i in (1, 2, 3)] == [3, 2, 1]
+    assert frame == Frame([1, 2, 3])
+    assert frame != Frame([1, 3, 3])
+    assert str(frame) == "1,2,3"
+    assert str(Frame([])) == ""
+    with pytest.raises(IndexError):
+        frame.lookup(4)
+
+
+def _push_and_lookup(frame: Frame, n: int) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        f = frame
+        for i in range(n):
+            f = f.push(i)
+            f.lookup(i + 1)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def test_frame_push_flat():
+    # pushing onto a deep frame costs no more than onto a shallow one, and
+    # looking it up all the way down costs its logarithm
+    shallow, deep = Frame(range(100)), Frame(range(10_000))
+
+    assert _push_and_lookup(deep, 300) < 4 * _push_and_lookup(shallow, 300)
+    values = list(range(10_000))
+    assert all(deep.lookup(i) == values[-i] for i in range(1, 10_001, 97))
+
+
+def test_derive_fun_in_other_scopes():
+    # ``fun x -> y`` is one node, but ``y`` is #2 in ``f`` and #4 in ``g``
+    e = parser_expr(
+        "let y = 1 in let f = fun x -> y in let z = 2 in let g = fun x -> y in f 0 + g 0"
+    ).return_value
+    assert derive(Env([]), e) == infer(Env([]), e)
+
+    # and a closure of the initial environment was compiled in another scope
+    closure_env = Env([("y", 5), ("w", 0)])
+    closure = FunctionValue(closure_env, parser_expr("fun x -> y").return_value)
+    e = parser_expr("let y = 1 in let g = fun x -> y in h 0 + g 0").return_value
+    env = Env([("h", closure)])
+    assert derive(env, e) == infer(env, e)
+    assert derive(env, e).val() == 6
+
+
+def test_closure_bodies_bounded():
+    e = parser_expr(
+        "let rec loop = fun n -> "
+        "if n < 1 then 0 else let id = fun x -> x in id (loop (n - 1)) in loop 200"
+    ).return_value
+    evaluator = nameless._Evaluator(named=True)
+    evaluator.infer(Env([]), e, compile_expr(e))
+
+    # one entry per ``fun`` node, not per closure
+    assert len(evaluator.bodies) == 2
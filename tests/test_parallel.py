@@ -0,0 +1,73 @@
+import pytest
+
+from type_project import evaluator
+from type_project.ast import Env
+from type_project.eval_profile import profile_eval
+from type_project.evaluator import UnboundVariableError, infer, pp
+from type_project.memo import InferCache
+from type_project.parallel import ParallelInfer
+from type_project.parser import parser_expr
+
+FIB = "let rec fib = fun n -> if n < 3 then 1 else fib (n - 1) + fib (n - 2) in {}"
+
+
+def test_parallel_matches_infer():
+    # x + fib 9 holds the same variable node, in the same environment, as
+    # the premise sent to a worker
+    e = parser_expr(FIB.format("let x = 3 in (x + fib 9) * (fib 8 + x)")).return_value
+    expected = pp(infer(Env([]), e))
+
+    with ParallelInfer(workers=2, min_size=8) as parallel:
+        d = parallel.infer(Env([]), e)
+        assert parallel.infer(Env([]), parser_expr("1 + 2").return_value).val() == 3
+
+    assert pp(d) == expected
+    assert d == infer(Env([]), e)
+    assert parallel.stats.submitted > 0
+    # estimates are kept for one ``infer`` only
+    assert parallel._sizes == {}
+
+
+def test_small_premises_stay_inline():
+    e = parser_expr(FIB.format("fib 10")).return_value
+    with ParallelInfer(workers=2, min_size=10**6) as parallel:
+        d = parallel.infer(Env([]), e)
+
+    assert d.val() == 55
+    assert parallel.stats.submitted == 0
+    assert parallel._executor is None
+
+
+def test_worker_exception_raised():
+    e = parser_expr(FIB.format("fib 5 + (y + fib 6)")).return_value
+    with ParallelInfer(workers=1, min_size=8) as parallel:
+        with pytest.raises(UnboundVariableError, match="unbound variable y"):
+            parallel.infer(Env([]), e)
+    assert parallel.stats.submitted == 1
+
+
+def test_chains_to_installed_hook():
+    e = parser_expr(FIB.format("fib 9 + fib 8")).return_value
+    expected = pp(infer(Env([]), e))
+    cache = InferCache()
+
+    with ParallelInfer(workers=1, min_size=8) as parallel:
+        evaluator._active_cache = cache
+        try:
+            d = parallel.infer(Env([]), e)
+            submitted = parallel.stats.submitted
+            assert evaluator._active_cache is cache
+            # the cache answers the root, so nothing is sent to a worker
+            again = parallel.infer(Env([]), e)
+            assert parallel.stats.submitted == submitted
+        finally:
+            evaluator._active_cache = None
+
+        with profile_eval() as profile:
+            profiled = parallel.infer(Env([]), e)
+
+    assert pp(d) == pp(again) == pp(profiled) == expected
+    assert submitted > 0
+    assert again is d
+    assert cache.stats.hits > 0
+    assert profile.infer.rules["E-LetRec"].calls == 1
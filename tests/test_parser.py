@@ -15,12 +15,13 @@ from type_project.ast import (
     Index,
 )
 from type_project.parser import (
+    grammar,
     parser_expr,
     parser_environment,
-    parser_judge,
     skip_space_sequence,
     parser_bind,
     parser_value,
+    parser_expr_packrat,
 )
 from type_project.parser_utility import opt, preceded, wraped, space0
 
@@ -53,12 +54,16 @@ def test_environment():
 
 
 def test_judge():
-    pret = parser_judge()("x = 3, y = 2 |- 1 + 1 evalto 2")
+    pret = grammar().judge("x = 3, y = 2 |- 1 + 1 evalto 2")
 
     assert pret.error is None
     assert pret.remain == ""
 
     assert pret.return_value == Judgement(Env([("x", 3), ("y", 2)]), Plus(1, 1), 2)
+    # built once, not per parse
+    assert grammar().judge is grammar().judge
+    # the value of a judgement is a value, never ``error``
+    assert grammar().judge("|- 1 + true evalto error").error is not None
 
 
 def test_fun():
@@ -128,9 +133,31 @@ def test_nameless_form():
 
 
 def test_real_parser_error():
-    pret = parser_judge()(
+    pret = grammar().judge(
         "|- let max = fun x -> fun y -> if x < y then y else x in max 3 5 evalto 5"
     )
 
     assert pret.error is None
     assert pret.remain == ""
+
+
+def test_packrat():
+    s = "let x = let y = 3 - 2 in y * y in let y = 4 in x + y"
+    packrat = parser_expr_packrat()
+    pret = packrat(s)
+
+    assert pret.error is None
+    assert pret.remain == ""
+    assert pret.return_value == parser_expr(s).return_value
+
+    misses = []
+    for n in (5, 10, 20):
+        pret = packrat("(" * n + "f 1 + 2" + ")" * n)
+        assert pret.error is None
+        misses.append(packrat.stats.misses)
+    assert misses[2] - misses[1] == 2 * (misses[1] - misses[0])
+
+    bounded = parser_expr_packrat(max_entries=16)
+    pret = bounded("let x = 1 in " * 20 + "x")
+    assert pret.error is None
+    assert bounded.stats.peak_entries <= 17
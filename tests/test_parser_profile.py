@@ -0,0 +1,49 @@
+import io
+
+from type_project import parser
+from type_project.parser import grammar, parser_expr
+from type_project.parser_profile import main, profile_parser
+
+JUDGEMENT = "|- let max = fun x -> fun y -> if x < y then y else x in max 3 5 evalto 5"
+
+
+def test_profile_parser():
+    shared = parser.grammar()
+    with profile_parser() as profile:
+        pret = grammar().judge(JUDGEMENT)
+        assert parser.grammar() is not shared
+        # ``let`` gets through "let x" before it fails
+        parser_expr("let x < 1")
+
+    assert pret.error is None
+    assert pret.remain == ""
+    assert parser.grammar() is shared
+
+    let = profile.rules["parser_let"]
+    assert let.calls == let.successes + let.failures
+    assert let.successes == 1
+    assert let.wasted == len("let x")
+    assert profile.rules["parser_name"].consumed >= len("maxxy")
+    times = [float(line.split()[-1]) for line in profile.report().splitlines()[1:]]
+    assert times == sorted(times, reverse=True)
+
+    out = io.StringIO()
+    profile.write_collapsed(out)
+    stacks = out.getvalue().splitlines()
+    assert "parser_judge;skip_space_sequence;parser_environment" in {
+        s.rsplit(" ", 1)[0] for s in stacks
+    }
+
+    # parsers built outside of the block are left uninstrumented
+    assert parser_expr("1 + 2").return_value == parser.Plus(1, 2)
+
+
+def test_profile_main(tmp_path, capsys):
+    src = tmp_path / "judgements.txt"
+    src.write_text(JUDGEMENT + "\n" + "x = 3 |- x + 1 evalto 4\n")
+    collapsed = tmp_path / "stacks.txt"
+
+    main([str(src), "--collapsed", str(collapsed)])
+
+    assert "parser_let" in capsys.readouterr().out
+    assert collapsed.read_text().startswith("parser_judge")
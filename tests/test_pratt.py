@@ -0,0 +1,143 @@
+import random
+import sys
+
+import pytest
+
+from type_project.ast import FunctionApply, Let, Plus, Var
+from type_project.lexer import tokenize
+from type_project.parser import (
+    PARSER_BACKENDS,
+    grammar,
+    parser_expr,
+    set_parser_backend,
+)
+
+NAMES = ["x", "y", "f", "g", "sq", "a1", "rec", "fun"]
+# names that start with a keyword or a literal, which both backends must read
+# as one word, and binders that are not names at all
+WORDS = ["trueval", "falsey", "errorx", "funx", "iffy", "letx", "inx", "recf"]
+BINDERS = NAMES[:-2] + WORDS + ["1x", "2", "true", "error"]
+
+
+def gen_expr(rng: random.Random, depth: int) -> str:
+    if depth == 0:
+        return rng.choice(
+            [str(rng.randint(0, 99)), rng.choice(NAMES[:-1]), "true", "false"]
+            + ["#3", "error", rng.choice(WORDS), "error1", "true2", "1x"]
+        )
+    space = rng.choice([" ", "", "  ", "\n"])
+    # mostly a space after a keyword, sometimes none, so the keyword runs
+    # into the name after it
+    kw = rng.choice([" ", " ", " ", ""])
+    match rng.randint(0, 8):
+        case 0:
+            key = rng.choice(NAMES + BINDERS)
+            return f"let{kw}{key} = {gen_expr(rng, depth - 1)} in {gen_expr(rng, depth - 1)}"
+        case 1:
+            key = rng.choice(BINDERS)
+            return f"let rec{kw}{key} = {gen_expr(rng, depth - 1)} in {gen_expr(rng, depth - 1)}"
+        case 2:
+            return f"fun{kw}{rng.choice(BINDERS + ['.'])} -> {gen_expr(rng, depth - 1)}"
+        case 3:
+            return (
+                f"if{kw}{gen_expr(rng, depth - 1)} then{kw}{gen_expr(rng, depth - 1)}"
+                f" else{kw}{gen_expr(rng, depth - 1)}"
+            )
+        case 4:
+            return f"({space}{gen_expr(rng, depth - 1)}{space})"
+        case 5:
+            return f"{gen_operand(rng, depth - 1)} {gen_operand(rng, depth - 1)}"
+        case _:
+            op = rng.choice("+-*<")
+            return f"{gen_operand(rng, depth - 1)}{space}{op}{space}{gen_operand(rng, depth - 1)}"
+
+
+def gen_operand(rng: random.Random, depth: int) -> str:
+    e = gen_expr(rng, depth)
+    if e.startswith(("let", "if", "fun")):
+        return f"({e})"
+    return e
+
+
+@pytest.fixture
+def pratt_backend():
+    previous = set_parser_backend("pratt")
+    yield
+    set_parser_backend(previous)
+
+
+def parse_with(backend: str, s: str):
+    previous = set_parser_backend(backend)
+    try:
+        return parser_expr(s)
+    finally:
+        set_parser_backend(previous)
+
+
+def test_tokenize():
+    kinds = [t.kind for t in tokenize("x = 3 |- let f = fun . -> #1 in f 2 evalto 5")]
+    assert kinds == [
+        "name", "=", "int", "|-", "let", "name", "=", "name", ".", "->", "index",
+        "in", "name", "int", "evalto", "int", "eof",
+    ]  # fmt: skip
+
+
+def test_backends_agree():
+    rng = random.Random(813)
+    for _ in range(300):
+        s = gen_expr(rng, rng.randint(0, 4))
+        for text in (s, s + " evalto 3", s + " )", s + " + ", " " + s):
+            combinator = parse_with("combinator", text)
+            pratt = parse_with("pratt", text)
+            assert (pratt.error is None) == (combinator.error is None), text
+            assert pratt.return_value == combinator.return_value, text
+            if combinator.error is None:
+                assert pratt.remain == combinator.remain, text
+
+
+@pytest.mark.parametrize(
+    "text, value, remain",
+    [
+        ("errorx + 1", Plus(Var("errorx"), 1), ""),
+        ("let trueval = 1 in trueval", Let("trueval", 1, Var("trueval")), ""),
+        ("funx -> funx", Var("funx"), "-> funx"),
+        ("fun 1 -> x", FunctionApply(Var("fun"), 1), "-> x"),
+        ("let recf = 1 in recf", Let("recf", 1, Var("recf")), ""),
+        ("letx = 1 in x", Var("letx"), "= 1 in x"),
+        ("true2", Var("true2"), ""),
+    ],
+)
+def test_backends_read_words(text, value, remain):
+    for backend in PARSER_BACKENDS:
+        pret = parse_with(backend, text)
+        assert (pret.return_value, pret.remain) == (value, remain), backend
+
+
+def test_backends_reject_leading_space():
+    for backend in PARSER_BACKENDS:
+        assert parse_with(backend, " 1").error is not None
+
+
+def test_pratt_judge(pratt_backend):
+    pret = grammar().judge(
+        "|- let max = fun x -> fun y -> if x < y then y else x in max 3 5 evalto 5"
+    )
+
+    assert pret.error is None
+    assert pret.remain == ""
+
+
+def test_pratt_deep_nesting(pratt_backend):
+    depth = sys.getrecursionlimit() * 2
+
+    pret = parser_expr("(" * depth + "1" + ")" * depth)
+    assert pret.error is None
+    assert pret.return_value == 1
+
+    pret = parser_expr("let x = 1 in " * depth + "x + 1")
+    assert pret.error is None
+    e = pret.return_value
+    for _ in range(depth):
+        assert isinstance(e, Let)
+        e = e.e2
+    assert e == Plus(e.e1, 1)
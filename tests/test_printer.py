@@ -0,0 +1,68 @@
+import io
+
+import pytest
+
+from type_project.ast import Env
+from type_project.evaluator import infer, pp
+from type_project.iterative import infer_iterative
+from type_project.parser import parser_expr
+from type_project.printer import write_derivation
+
+PROGRAM = "let max = fun x -> fun y -> if x < y then y else x in max 3 5 < 4"
+
+
+@pytest.mark.parametrize("buffer_size", [0, 1, 7, 8192])
+def test_same_text_as_pp(buffer_size):
+    d = infer(Env([("b", True)]), parser_expr(PROGRAM).return_value)
+    expected = pp(d).replace("True", "true").replace("False", "false")
+
+    out = io.StringIO()
+    write_derivation(d, out, buffer_size=buffer_size)
+    assert out.getvalue() == expected
+
+    raw = io.BytesIO()
+    write_derivation(d, raw, buffer_size=buffer_size)
+    assert raw.getvalue() == expected.encode()
+
+    out = io.StringIO()
+    write_derivation(d, out, buffer_size=buffer_size, lower_bools=False)
+    assert out.getvalue() == pp(d)
+
+
+def test_buffered_writes():
+    d = infer(Env([]), parser_expr(PROGRAM).return_value)
+
+    class Recorder(io.StringIO):
+        writes = 0
+
+        def write(self, s):
+            self.writes += 1
+            return super().write(s)
+
+    unbuffered, buffered = Recorder(), Recorder()
+    write_derivation(d, unbuffered, buffer_size=0)
+    write_derivation(d, buffered, buffer_size=1 << 20)
+    assert buffered.writes == 1 < unbuffered.writes
+    assert buffered.getvalue() == unbuffered.getvalue()
+
+
+def test_deep_derivation():
+    e = parser_expr(
+        "let rec sum = fun n -> if n < 1 then 0 else n + sum (n - 1) in sum 2000"
+    ).return_value
+    out = io.StringIO()
+    write_derivation(infer_iterative(Env([]), e), out)
+
+    text = out.getvalue()
+    assert text.startswith("|- let rec sum = ")
+    assert text.endswith("\n};")
+    assert text.count("by E-AppRec") == 2001
+
+
+def test_max_depth():
+    d = infer(Env([]), parser_expr(PROGRAM).return_value)
+
+    for max_depth in range(4):
+        out = io.StringIO()
+        write_derivation(d, out, lower_bools=False, max_depth=max_depth)
+        assert out.getvalue() == pp(d, max_depth=max_depth)
@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+from type_project.service import DerivationService, serve
+
+JUDGEMENT = "|- let x = 3 in x * 4 evalto 12"
+
+
+async def _exchange(service: DerivationService, requests: list) -> dict:
+    server = await serve(service, port=0)
+    try:
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for request in requests:
+            line = request if isinstance(request, str) else json.dumps(request)
+            writer.write(line.encode() + b"\n")
+        writer.write_eof()
+        responses = {}
+        while line := await reader.readline():
+            response = json.loads(line)
+            responses[response.pop("id")] = response
+        writer.close()
+        return responses
+    finally:
+        server.close()
+        await server.wait_closed()
+        service.close()
+
+
+def test_service_ops():
+    judgement = "x = true |- if x then 1 else 2 evalto 1"
+    requests = [
+        {"id": 1, "op": "judge", "judgement": judgement},
+        {"id": 2, "op": "infer", "judgement": "|- 1 + 2 evalto 4"},
+        {"id": 3, "op": "pp", "judgement": JUDGEMENT},
+        {"id": 4, "op": "infer", "judgement": "|- 1 + evalto 3"},
+        {"id": 5, "op": "eval", "judgement": JUDGEMENT},
+        {"id": 6, "op": "pp"},
+        "not json",
+        "",
+    ]
+    responses = asyncio.run(_exchange(DerivationService(workers=0), requests))
+
+    assert responses[1] == {
+        "status": "ok",
+        "judgement": "x=true |- if x then 1 else 2 evalto 1",
+    }
+    assert responses[2] == {
+        "status": "wrong",
+        "value": "3",
+        "message": "evaluates to 3, not 4",
+    }
+    assert responses[3]["status"] == "ok"
+    assert responses[3]["derivation"].startswith(
+        "|- let x = 3 in (x * 4) evalto 12 by E-Let {"
+    )
+    assert responses[4]["message"] == "parse error: expected 'evalto' at offset 5"
+    assert responses[5] == {"error": "unknown op 'eval'"}
+    assert responses[6] == {"error": "'judgement' must be a string"}
+    assert responses[None]["error"].startswith("bad request")
+
+
+def test_service_coalesces_and_times_out():
+    service = DerivationService(workers=0)
+    requests = [{"id": i, "op": "pp", "judgement": JUDGEMENT} for i in range(5)]
+    responses = asyncio.run(_exchange(service, requests))
+
+    assert len(responses) == 5
+    assert all(r == responses[0] for r in responses.values())
+    assert (service.stats.jobs, service.stats.coalesced) == (1, 4)
+
+    service = DerivationService(workers=0, timeout=0)
+    responses = asyncio.run(
+        _exchange(service, [{"id": 1, "op": "infer", "judgement": JUDGEMENT}])
+    )
+    assert responses[1] == {"error": "timed out after 0s"}
+    assert service.stats.timeouts == 1
+
+
+def test_service_process_pool():
+    service = DerivationService(workers=1)
+    requests = [
+        {"id": 1, "op": "infer", "judgement": JUDGEMENT},
+        {"id": 2, "op": "stats"},
+    ]
+    responses = asyncio.run(_exchange(service, requests))
+
+    assert responses[1] == {"status": "ok", "value": "12"}
+    assert responses[2]["requests"] == 2
@@ -0,0 +1,90 @@
+import json
+import sys
+
+sys.path.insert(0, __file__.rsplit("/", 2)[0] + "/benchmarks")
+from suite import FORMAT_VERSION, THRESHOLDS, compare, main  # noqa: E402
+
+
+def results(*cases: dict) -> dict:
+    return {"version": FORMAT_VERSION, "results": list(cases)}
+
+
+def case(workload="arithmetic", size=10, **metrics) -> dict:
+    return {"workload": workload, "size": size} | metrics
+
+
+BASE = case(infer_seconds=0.1, pp_seconds=0.0001, peak_bytes=1000, nodes=50)
+
+
+def test_compare_unchanged():
+    lines, regressions = compare(results(BASE), results(BASE), THRESHOLDS)
+
+    assert len(lines) == 4
+    assert regressions == []
+    assert all(line.endswith("+0.0%") for line in lines)
+
+
+def test_compare_regressions():
+    current = BASE | {"infer_seconds": 0.2, "peak_bytes": 1050, "nodes": 51}
+    lines, regressions = compare(results(BASE), results(current), THRESHOLDS)
+
+    assert len(lines) == 4
+    assert len(regressions) == 2
+    assert regressions[0].split()[2:] == [
+        "infer_seconds",
+        "0.100000",
+        "0.200000",
+        "+100.0%",
+        "regression",
+        "(threshold",
+        "25%)",
+    ]
+    # any growth of the node count, but peak memory only past 10%
+    assert regressions[1].split()[2] == "nodes"
+    # faster is never a regression
+    _, regressions = compare(results(current), results(BASE), THRESHOLDS)
+    assert regressions == []
+
+
+def test_compare_noise_floor():
+    # four times slower, but by less than a millisecond
+    current = BASE | {"pp_seconds": 0.0004}
+    _, regressions = compare(results(BASE), results(current), THRESHOLDS)
+    assert regressions == []
+
+    _, regressions = compare(results(BASE), results(current), THRESHOLDS, 0.0)
+    assert [r.split()[2] for r in regressions] == ["pp_seconds"]
+    # the floor is for timings only
+    current = BASE | {"peak_bytes": 2000}
+    _, regressions = compare(results(BASE), results(current), THRESHOLDS, 10.0)
+    assert [r.split()[2] for r in regressions] == ["peak_bytes"]
+
+
+def test_compare_skips_missing_metrics_and_cases():
+    typed = case("let_chain", 2000, parse_seconds=0.01, type_seconds=0.02)
+    slower = typed | {"parse_seconds": 0.1, "type_seconds": 0.2}
+    new = case("church", 10, nodes=1)
+    lines, regressions = compare(
+        results(BASE, typed), results(BASE, slower, new), THRESHOLDS
+    )
+
+    # ``typed`` has only its timings; ``new`` is not in the baseline
+    assert len(lines) == 6
+    assert [r.split()[:3] for r in regressions] == [
+        ["let_chain", "2000", "parse_seconds"],
+        ["let_chain", "2000", "type_seconds"],
+    ]
+    lines, _ = compare(results(BASE), results(BASE), {"nodes": 0.0})
+    assert [line.split()[2] for line in lines] == ["nodes"]
+
+
+def test_main_compare(tmp_path, capsys):
+    baseline, current = tmp_path / "baseline.json", tmp_path / "current.json"
+    baseline.write_text(json.dumps(results(BASE)))
+    current.write_text(json.dumps(results(BASE | {"infer_seconds": 0.2})))
+
+    assert main(["compare", str(baseline), str(baseline)]) == 0
+    assert main(["compare", str(baseline), str(current)]) == 1
+    assert "1 regressions:" in capsys.readouterr().err
+    args = ["compare", str(baseline), str(current), "--threshold", "infer_seconds=2"]
+    assert main(args) == 0
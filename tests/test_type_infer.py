@@ -0,0 +1,110 @@
+import sys
+
+import pytest
+
+from type_project.ast import Env, FunctionApply, FunctionEval, Let, Plus, Var
+from type_project.evaluator import pp
+from type_project.parser import parser_expr
+from type_project.type_infer import (
+    INT,
+    TVar,
+    TypeCheckError,
+    infer_type,
+    resolve,
+    unify,
+)
+
+
+def type_of(src: str) -> str:
+    return str(infer_type(Env([]), parser_expr(src).return_value).conclusion.t)
+
+
+def test_pp():
+    d = infer_type(Env([]), parser_expr("let id = fun x -> x in id 3").return_value)
+
+    assert pp(d) == (
+        "|- let id = fun x -> x in id (3) : int by T-Let {\n"
+        "  |- fun x -> x : 'a -> 'a by T-Fun {\n"
+        "    x : 'a |- x : 'a by T-Var{};\n"
+        "  };\n"
+        "  id : 'a.'a -> 'a |- id (3) : int by T-App {\n"
+        "    id : 'a.'a -> 'a |- id : int -> int by T-Var{};\n"
+        "    id : 'a.'a -> 'a |- 3 : int by T-Int{};\n"
+        "  };\n"
+        "};"
+    )
+
+
+@pytest.mark.parametrize(
+    "src, expected",
+    [
+        ("if 1 < 2 then 3 * 4 else 5 - 6", "int"),
+        ("fun f -> fun g -> fun x -> f (g x)", "('a -> 'b) -> ('c -> 'a) -> 'c -> 'b"),
+        (
+            "let rec fib = fun n -> if n < 3 then 1 else fib (n - 1) + fib (n - 2) "
+            "in fib",
+            "int -> int",
+        ),
+        ("let id = fun x -> x in if id true then id 1 else 2", "int"),
+        # the variable of x is bound outside the let, so f is not generalized
+        # over it
+        ("fun x -> let f = fun y -> x in f", "'a -> 'b -> 'a"),
+        (
+            "let zero = fun f -> fun x -> x in "
+            "let succ = fun n -> fun f -> fun x -> f (n f x) in "
+            "let c2 = succ (succ zero) in let inc = fun k -> k + 1 in "
+            "let not = fun b -> if b then false else true in "
+            "if c2 not true then c2 inc 0 else 1",
+            "int",
+        ),
+    ],
+)
+def test_infer_type(src, expected):
+    assert type_of(src) == expected
+
+
+@pytest.mark.parametrize(
+    "src, message",
+    [
+        ("1 + true", "cannot unify bool with int"),
+        ("fun x -> x x", "occurs in"),
+        # a function argument is not polymorphic
+        ("fun f -> if f true then f 1 else 2", "cannot unify"),
+        ("fun x -> let y = x in y + (if y then 1 else 2)", "cannot unify"),
+        ("x + 1", "unbound variable x"),
+    ],
+)
+def test_untypable(src, message):
+    with pytest.raises(TypeCheckError, match=message):
+        type_of(src)
+
+
+def test_union_find_path_compression():
+    names = object()
+    chain = [TVar(0, names) for _ in range(5)]
+    for a, b in zip(chain, chain[1:]):
+        unify(a, b, None)
+    unify(chain[-1], INT, None)
+
+    assert resolve(chain[0]) is INT
+    assert all(v.link is INT for v in chain)
+
+
+def test_deep_programs():
+    depth = sys.getrecursionlimit() * 2
+    e = Var("x")
+    for _ in range(depth):
+        e = Let("x", Plus(Var("x"), 1), e)
+    d = infer_type(Env([]), Let("x", 0, e))
+    assert d.conclusion.t is INT
+    for _ in range(depth + 1):
+        assert d.rule == "T-Let"
+        d = d.premises[1]
+    assert d.rule == "T-Var"
+
+    # ``id (id (... (id 1)))``, with the argument nested on the right
+    e = 1
+    for _ in range(depth):
+        e = FunctionApply(Var("id"), e)
+    d = infer_type(Env([]), Let("id", FunctionEval("x", Var("x")), e))
+    assert resolve(d.conclusion.t) is INT
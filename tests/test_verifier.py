@@ -0,0 +1,103 @@
+import io
+
+import pytest
+
+from type_project.ast import Env
+from type_project.evaluator import infer, pp
+from type_project.parser import parser_expr
+from type_project.printer import write_derivation
+from type_project.verifier import main, verify
+
+PROGRAMS = [
+    "let rec fib = fun n -> if n < 3 then 1 else fib (n - 1) + fib (n - 2) in fib 5",
+    "let twice = fun f -> fun x -> f (f x) in twice (fun x -> x * x) 2",
+    "let x = 1 in let y = true in if y then x - 2 else 0",
+    "1 + true + 2",
+    "if 2 + 3 then 1 else 3",
+    "let f = fun x -> x < 3 in f 1 < 2",
+]
+
+
+def derivation(program: str) -> str:
+    return pp(infer(Env([]), parser_expr(program).return_value))
+
+
+@pytest.mark.parametrize("program", PROGRAMS)
+@pytest.mark.parametrize("chunk_size", [1, 5, 1 << 16])
+def test_verify_derivations(program, chunk_size):
+    d = infer(Env([]), parser_expr(program).return_value)
+    out = io.StringIO()
+    write_derivation(d, out)
+
+    for text in (pp(d), out.getvalue()):
+        result = verify(io.StringIO(text), chunk_size)
+        assert result.ok, result.error
+        assert result.nodes == text.count("by ")
+
+
+def test_verify_reports_first_failure():
+    text = derivation("let x = 3 in x * 4")
+    lines = text.splitlines(keepends=True)
+
+    wrong = text.replace("3 times 4 is 12", "3 times 4 is 13")
+    error = verify(io.StringIO(wrong)).error
+    assert str(error) == "6:5: B-Times: 3 times 4 must be 12, not 13"
+
+    wrong = text.replace("|- (x * 4) evalto 12", "|- (x * 4) evalto 11")
+    error = verify(io.StringIO(wrong)).error
+    assert str(error) == "3:3: E-Times: the value must be 12, not 11"
+
+    wrong = "".join(lines[:3] + [lines[3].replace("x=3", "x=4")] + lines[4:])
+    error = verify(io.StringIO(wrong)).error
+    assert str(error) == "4:5: E-Var1: the value must be 4, not 3"
+
+    wrong = text.replace("E-Let", "E-Fun")
+    error = verify(io.StringIO(wrong)).error
+    assert error.message == "E-Fun: let x = 3 in (x * 4) is not a function"
+
+
+@pytest.mark.parametrize(
+    "text, message",
+    [
+        ("", "1:1: no derivation"),
+        ("|- 1 evalto 1 by E-Int {}", "1:26: expected ';'"),
+        ("|- 1 evalto 1 by E-Int {", "1:1: the node is not closed"),
+        (
+            "|- 1 evalto 1 by E-Int {};\n|- 2",
+            "2:1: unexpected text after the end of the derivation",
+        ),
+        (
+            "|- 1 evalto by E-Int {};",
+            "1:1: expected a value at offset 12 of the judgement",
+        ),
+        (
+            "|- 1 evalto 1 {};",
+            "1:1: expected 'by' and a rule at offset 13 of the judgement",
+        ),
+        ("|- 1 evalto 1 by E-Int {...};", "1:25: expected '{' after the judgement"),
+        (
+            "|- 1 + 2 evalto 3 by E-Plus {...};",
+            "1:30: expected '{' after the judgement",
+        ),
+    ],
+)
+def test_verify_malformed(text, message):
+    assert str(verify(io.StringIO(text)).error) == message
+
+
+def test_verify_accepts_spacing():
+    text = "x = 1 ,  y = True |- \n  y  evalto true by E-Var1 { } ;"
+    assert verify(io.StringIO(text)).ok
+
+
+def test_main(tmp_path, capsys):
+    path = tmp_path / "d.txt"
+    path.write_text(derivation("1 + 2"))
+    assert main([str(path)]) == 0
+    path.write_text(derivation("1 + 2").replace("is 3", "is 4"))
+    assert main([str(path)]) == 1
+    out = capsys.readouterr().out.splitlines()
+    assert out == [
+        f"{path}: 4 nodes ok",
+        f"{path}:4:3: B-Plus: 1 plus 2 must be 3, not 4",
+    ]
@@ -1,154 +1,467 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any
+import threading
+import weakref
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Callable
 
 
 Expr = Any
 Value = int | bool
 
 
-@dataclass
-class Error:
+def cached_str(render: Callable[[Any], str]) -> Callable[[Any], str]:
+    """Keep the string ``render`` returns on the instance.
+
+    Expression and closure nodes are not changed once they are built, so
+    each one is rendered once, however many judgements print it.
+    """
+
+    @wraps(render)
+    def __str__(self) -> str:
+        try:
+            return self._str
+        except AttributeError:
+            s = render(self)
+            object.__setattr__(self, "_str", s)
+            return s
+
+    return __str__
+
+
+class _Cached:
+    __slots__ = ("_str",)
+
+
+class _Probe:
+    """Looks a node up in ``_nodes`` by its class and fields.
+
+    The set holds weak references to nodes, which compare unequal to
+    anything but references, so the set falls back to ``_Probe.__eq__``.
+    A match is kept in ``found``.
+    """
+
+    __slots__ = ("cls", "args", "hash", "found")
+
+    def __init__(self, cls: type, args: tuple):
+        self.cls = cls
+        self.args = args
+        self.hash = hash((cls, args))
+        self.found = None
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self, ref):
+        node = ref()
+        if type(node) is not self.cls:
+            return False
+        for a, b in zip(self.args, node.__match_args__):
+            b = getattr(node, b)
+            # children are interned, and 1 == True must not match
+            if a is not b and (type(a) is not type(b) or a != b):
+                return False
+        self.found = node
+        return True
+
+
+# a weak reference to every live node; a node is its own key, so the table
+# costs a reference and a set slot per distinct node
+_nodes: set[weakref.ref] = set()
+_forget = _nodes.discard
+_nodes_lock = threading.Lock()
+
+
+class _Interned(type):
+    """Calling a node class returns the live node with the same fields if
+    there is one, so structurally equal subtrees are the same object."""
+
+    def __call__(cls, *args, **kwargs):
+        if kwargs:
+            args += tuple(kwargs[name] for name in cls.__match_args__[len(args) :])
+        probe = _Probe(cls, args)
+        if probe in _nodes:
+            return probe.found
+        with _nodes_lock:
+            if probe in _nodes:
+                return probe.found
+            node = super().__call__(*args)
+            object.__setattr__(node, "_hash", probe.hash)
+            _nodes.add(weakref.ref(node, _forget))
+        return node
+
+
+class Node(_Cached, metaclass=_Interned):
+    """An interned, immutable expression node.
+
+    Equality is identity and the hash is computed once, when the node is
+    built.
+    """
+
+    __slots__ = ("_hash", "__weakref__")
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        # rebuild through the intern table, so copies are the same node
+        return type(self), tuple(getattr(self, f) for f in self.__match_args__)
+
+
+def live_nodes() -> int:
+    """The number of distinct nodes alive."""
+    return len(_nodes)
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class Error(Node):
+    @cached_str
     def __str__(self):
         return "error"
 
 
-@dataclass
-class Plus:
+@dataclass(frozen=True, slots=True, eq=False)
+class Plus(Node):
     e1: Any
     e2: Any
 
+    @cached_str
     def __str__(self):
         return f"({self.e1} + {self.e2})"
 
 
-@dataclass
-class Minus:
+@dataclass(frozen=True, slots=True, eq=False)
+class Minus(Node):
     e1: Any
     e2: Any
 
+    @cached_str
     def __str__(self):
         return f"({self.e1} - {self.e2})"
 
 
-@dataclass
-class Times:
+@dataclass(frozen=True, slots=True, eq=False)
+class Times(Node):
     e1: Any
     e2: Any
 
+    @cached_str
     def __str__(self):
         return f"({self.e1} * {self.e2})"
 
 
-@dataclass
-class Lt:
+@dataclass(frozen=True, slots=True, eq=False)
+class Lt(Node):
     e1: Any
     e2: Any
 
+    @cached_str
     def __str__(self):
         return f"{self.e1} < {self.e2}"
 
 
-@dataclass
-class If:
+@dataclass(frozen=True, slots=True, eq=False)
+class If(Node):
     e1: Any
     e2: Any
     e3: Any
 
+    @cached_str
     def __str__(self):
         return f"if {self.e1} then {self.e2} else {self.e3}"
 
 
-@dataclass
-class Let:
+@dataclass(frozen=True, slots=True, eq=False)
+class Let(Node):
     key: str
     e1: Any
     e2: Any
 
+    @cached_str
     def __str__(self):
         return f"let {self.key} = {self.e1} in {self.e2}"
 
 
-@dataclass
-class LetRec:
+@dataclass(frozen=True, slots=True, eq=False)
+class LetRec(Node):
     key: str
     e1: Any
     e2: Any
 
+    @cached_str
     def __str__(self):
         return f"let rec {self.key} = {self.e1} in {self.e2}"
 
 
-@dataclass
-class FunctionEval:
+@dataclass(frozen=True, slots=True, eq=False)
+class FunctionEval(Node):
     arg_name: str
     body: Expr
 
-
-@dataclass
-class FunctionValue:
-    env: Env
-    eval: FunctionEval
+    @cached_str
+    def __str__(self):
+        return f"fun {self.arg_name} -> {self.body}"
 
 
-@dataclass
-class FunctionApply:
+@dataclass(frozen=True, slots=True, eq=False)
+class FunctionApply(Node):
     func: Expr
     arg: Expr
 
+    @cached_str
+    def __str__(self):
+        return f"{self.func} ({self.arg})"
+
 
-@dataclass
-class Var:
+@dataclass(frozen=True, slots=True, eq=False)
+class Var(Node):
     key: str
 
+    @cached_str
     def __str__(self):
         return self.key
 
 
-@dataclass
-class Index:
+@dataclass(frozen=True, slots=True, eq=False)
+class Index(Node):
     index: int
 
-
+    @cached_str
     def __str__(self):
         return f"#{self.index}"
 
 
+@dataclass
+class Span:
+    """Source extent of an expression, relative to the start of its parent.
+
+    Integers and booleans are bare Python values and cannot carry a span,
+    so spans form a tree parallel to the expression: ``children`` follow
+    the order of the node's subexpressions. A parenthesized expression gets
+    its own span (``paren``), covering the parentheses, whose only child is
+    the span of the expression inside.
+    """
+
+    offset: int
+    length: int
+    children: tuple[Span, ...] = ()
+    paren: bool = False
+
+
+# ``Env`` indexes its bindings in a persistent hash array mapped trie: a
+# node holds the entries of the 5-bit hash chunks present in its bitmap,
+# and setting a key copies only the nodes on its path, so every
+# environment's index shares all but O(log n) of its parent's.
+_MASK64 = 2**64 - 1
+
+
+class _Leaf:
+    """The bindings of the keys with hash ``hash``."""
+
+    __slots__ = ("hash", "items")
+
+    def __init__(self, hash: int, items: tuple):
+        self.hash = hash
+        self.items = items
+
+
+class _TrieNode:
+    __slots__ = ("bitmap", "entries")
+
+    def __init__(self, bitmap: int, entries: tuple):
+        self.bitmap = bitmap
+        self.entries = entries
+
+
+_EMPTY_TRIE = _TrieNode(0, ())
+# bindings ``Env.locate`` looks at before it goes to the index
+_WALK = 8
+_MISSING = object()
+
+
+def _trie_get(node: _TrieNode, key: str, h: int) -> Any:
+    shift = 0
+    while True:
+        bit = 1 << ((h >> shift) & 31)
+        if not node.bitmap & bit:
+            return _MISSING
+        entry = node.entries[(node.bitmap & (bit - 1)).bit_count()]
+        if type(entry) is _Leaf:
+            if entry.hash == h:
+                for k, v in entry.items:
+                    if k == key:
+                        return v
+            return _MISSING
+        node = entry
+        shift += 5
+
+
+def _trie_set(node: _TrieNode, key: str, h: int, value: Any, shift: int = 0):
+    bit = 1 << ((h >> shift) & 31)
+    i = (node.bitmap & (bit - 1)).bit_count()
+    entries = node.entries
+    if not node.bitmap & bit:
+        leaf = _Leaf(h, ((key, value),))
+        return _TrieNode(node.bitmap | bit, entries[:i] + (leaf,) + entries[i:])
+    entry = entries[i]
+    if type(entry) is not _Leaf:
+        new = _trie_set(entry, key, h, value, shift + 5)
+    elif entry.hash == h:
+        items = tuple(kv for kv in entry.items if kv[0] != key)
+        new = _Leaf(h, items + ((key, value),))
+    else:
+        # another key in this slot: move it a level down, next to this one
+        below = _TrieNode(1 << ((entry.hash >> (shift + 5)) & 31), (entry,))
+        new = _trie_set(below, key, h, value, shift + 5)
+    return _TrieNode(node.bitmap, entries[:i] + (new,) + entries[i + 1 :])
+
+
 class Env:
-    vars: list[(str, Value)]
+    """A persistent environment: each binding points at the environment it
+    was pushed onto, so ``push`` and ``pop`` are O(1) and environments share
+    their common prefix instead of copying it. ``lookup`` and ``locate``
+    look a few bindings down, then go to an index built the first time it
+    is needed, extended from the parent's, so they are O(log n) in the
+    number of distinct names.
+    """
+
+    __slots__ = ("_parent", "_key", "_value", "_size", "_index", "_memo", "_str")
 
     def __init__(self, vars: list[(str, Value)]):
-        self.vars = vars
+        env = _EMPTY if vars else None
+        for k, v in vars:
+            env = env.push(k, v)
+        if env is None:
+            self._parent, self._key, self._value, self._size = None, None, None, 0
+            self._str = ""
+        else:
+            self._parent, self._key, self._value = env._parent, env._key, env._value
+            self._size = env._size
+            self._str = env._str
+        self._index = None
+        self._memo = None
+
+    @property
+    def vars(self) -> list[(str, Value)]:
+        return list(self)
+
+    @property
+    def depth(self) -> int:
+        """The number of bindings, shadowed ones included."""
+        return self._size
+
+    def __iter__(self):
+        bindings = []
+        env = self
+        while env._size:
+            bindings.append((env._key, env._value))
+            env = env._parent
+        return reversed(bindings)
 
     def __eq__(self, other):
-        return self.vars == other
+        if not isinstance(other, Env):
+            return self.vars == other
+        a, b = self, other
+        if a._size != b._size:
+            return False
+        while a is not b and a._size:
+            if a._key != b._key or a._value != b._value:
+                return False
+            a, b = a._parent, b._parent
+        return True
 
     def pop(self) -> Env:
-        return Env(self.vars[:-1])
+        return self._parent if self._size else self
 
     def push(self, key: str, value: Value) -> Env:
-        return Env(self.vars + [(key, value)])
+        env = Env.__new__(Env)
+        env._parent, env._key, env._value = self, key, value
+        env._size = self._size + 1
+        env._index = None
+        env._memo = None
+        env._str = None
+        return env
 
     def top(self) -> (str, Value):
-        return self.vars[-1]
+        if not self._size:
+            raise IndexError("top of empty environment")
+        return self._key, self._value
 
     def lookup(self, key):
-        for k, v in self.vars[::-1]:
-            if k == key:
-                return v
-        raise KeyError(f"key {key} not found")
+        return self.locate(key)[0]
+
+    def locate(self, key) -> (Value, int):
+        """The value of the binding of ``key`` closest to the top, and how
+        many bindings down it is, counting the top as 1."""
+        # most lookups find a binding near the top, where walking down is
+        # cheaper than building the index
+        env = self
+        for depth in range(1, _WALK + 1):
+            if not env._size:
+                raise KeyError(f"key {key} not found")
+            if env._key == key:
+                return env._value, depth
+            env = env._parent
+        found = _trie_get(self._trie(), key, hash(key) & _MASK64)
+        if found is _MISSING:
+            raise KeyError(f"key {key} not found")
+        value, size = found
+        return value, self._size - size + 1
+
+    def _trie(self) -> _TrieNode:
+        # each binding and the size it was pushed at, indexed once per
+        # environment and extended from the nearest indexed parent
+        if self._index is None:
+            pending = []
+            env = self
+            while env._index is None and env._size:
+                pending.append(env)
+                env = env._parent
+            trie = env._index or _EMPTY_TRIE
+            for env in reversed(pending):
+                h = hash(env._key) & _MASK64
+                trie = _trie_set(trie, env._key, h, (env._value, env._size))
+                env._index = trie
+            self._index = trie
+        return self._index
+
+    def memo(self) -> dict:
+        """A dict for evaluators to keep results that depend only on this
+        environment, so every user of the environment shares them."""
+        if self._memo is None:
+            self._memo = {}
+        return self._memo
 
     def extend(self, env: Env):
-        return Env(self.vars + env.vars)
+        ret = self
+        for k, v in env:
+            ret = ret.push(k, v)
+        return ret
 
     def __str__(self):
-        return ",".join([f"{k}={v}" for k, v in self.vars])
+        if self._str is None:
+            # render down from the nearest environment already rendered, so
+            # each one is built once, as its parent's string plus a binding
+            pending = []
+            env = self
+            while env._str is None:
+                pending.append(env)
+                env = env._parent
+            text = env._str
+            for env in reversed(pending):
+                binding = f"{env._key}={env._value}"
+                text = f"{text},{binding}" if text else binding
+                env._str = text
+        return self._str
 
     def __repr__(self):
         return str(self)
 
 
+_EMPTY = Env([])
+
+
 @dataclass
 class Judgement:
     env: Env | None
@@ -165,28 +478,30 @@ class Judgement:
         return f"{prefix}{self.e} evalto {self.v}"
 
 
-@dataclass
-class FunctionEval:
-    arg_name: str
-    body: Expr
-
-    def __str__(self):
-        return f"fun {self.arg_name} -> {self.body}"
-
-
-@dataclass
-class FunctionValue:
+@dataclass(frozen=True, slots=True)
+class FunctionValue(_Cached):
     env: Env
     eval: FunctionEval
 
+    @cached_str
     def __str__(self):
         return f"({self.env})[{self.eval}]"
 
 
-@dataclass
-class FunctionApply:
-    func: Expr
-    arg: Expr
+@dataclass(frozen=True, slots=True)
+class RecFunctionValue(_Cached):
+    env: Env
+    key: str
+    eval: FunctionEval
+    _rec_env: Env | None = field(default=None, init=False, repr=False, compare=False)
 
+    def rec_env(self) -> Env:
+        """``env`` with ``key`` bound to this closure, built once and shared
+        by every call."""
+        if self._rec_env is None:
+            object.__setattr__(self, "_rec_env", self.env.push(self.key, self))
+        return self._rec_env
+
+    @cached_str
     def __str__(self):
-        return f"{self.func} ({self.arg})"
+        return f"({self.env})[rec {self.key} = {self.eval}]"
@@ -0,0 +1,246 @@
+"""Check many judgements at once.
+
+Every non-blank line of the input is a judgement such as
+``|- let x = 3 in x * 4 evalto 12``. Each one is parsed, derived, and its
+claimed value compared with the derived one. Lines are handed to a
+``ProcessPoolExecutor`` in chunks of ``chunk_size``; results come back in
+input order, and a line that fails to parse or to derive is reported on
+its own without stopping the others.
+
+    python main.py batch [FILE] [--workers N] [--chunk-size N] [--derivations]
+        [--cache DIR]
+
+prints one line per judgement, and a throughput summary on stderr. With
+``--cache`` every derivation is kept in a ``disk_cache.DiskCache`` in
+``DIR``, so checking the same judgements again reads them back instead of
+parsing and deriving them.
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+
+from type_project.ast import Judgement
+from type_project.disk_cache import DiskCache
+from type_project.evaluator import UnboundVariableError
+from type_project.iterative import infer_iterative
+from type_project.parser import parser_error, parser_judge, parser_value
+from type_project.parser_core import alt
+from type_project.printer import write_derivation
+
+OK = "ok"
+WRONG = "wrong"
+ERROR = "error"
+
+
+@dataclass
+class BatchResult:
+    line: int
+    status: str
+    # the derived value, and the rendered derivation if it was asked for
+    value: str | None = None
+    derivation: str | None = None
+    message: str | None = None
+
+    def __str__(self):
+        match self.status:
+            case "ok":
+                text = f"{self.line}: ok"
+            case "wrong":
+                text = f"{self.line}: wrong: {self.message}"
+            case _:
+                text = f"{self.line}: error: {self.message}"
+        if self.derivation is not None:
+            text += "\n" + self.derivation
+        return text
+
+
+@dataclass
+class BatchSummary:
+    ok: int = 0
+    wrong: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    workers: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.ok + self.wrong + self.errors
+
+    def add(self, result: BatchResult):
+        match result.status:
+            case "ok":
+                self.ok += 1
+            case "wrong":
+                self.wrong += 1
+            case _:
+                self.errors += 1
+
+    def __str__(self):
+        rate = self.total / self.seconds if self.seconds else 0.0
+        return (
+            f"{self.total} judgements: {self.ok} ok, {self.wrong} wrong, "
+            f"{self.errors} errors in {self.seconds:.2f}s "
+            f"({rate:.0f}/s, {self.workers or 'no'} workers)"
+        )
+
+
+class ParseError(ValueError):
+    pass
+
+
+def show(v) -> str:
+    """``v`` as judgements write it, ``true`` rather than ``True``."""
+    return str(v).replace("True", "true").replace("False", "false")
+
+
+# wrong programs are part of what gets checked, so unlike
+# ``grammar().judge`` this also reads ``evalto error``
+_judge = parser_judge(alt([parser_value(), parser_error()]))
+
+
+def parse_judgement(text: str) -> Judgement:
+    """The judgement ``text`` holds, all of it; raise ``ParseError`` if it
+    holds something else. It may claim ``evalto error``."""
+    r = _judge(text)
+    if r.error is not None:
+        raise ParseError(f"parse error: {r.error}")
+    if r.remain.strip():
+        offset = len(text) - len(r.remain)
+        raise ParseError(f"parse error: unexpected text at offset {offset}")
+    return r.return_value
+
+
+def check(
+    line: int, text: str, derivation: bool = False, cache: DiskCache | None = None
+) -> BatchResult:
+    """Parse the judgement ``text`` and check it against its derivation,
+    or read both from ``cache``."""
+    try:
+        if cache is not None:
+            j, d = cache.derive(text)
+        else:
+            j = parse_judgement(text)
+            d = infer_iterative(j.env, j.e)
+        v = d.val()
+        rendered = None
+        if derivation:
+            out = io.StringIO()
+            write_derivation(d, out)
+            rendered = out.getvalue()
+    except (ParseError, UnboundVariableError) as e:
+        return BatchResult(line, ERROR, message=str(e))
+    except Exception as e:
+        return BatchResult(line, ERROR, message=f"{type(e).__name__}: {e}")
+    # compare types too: 1 == True, but they are different values
+    if type(v) is type(j.v) and v == j.v:
+        return BatchResult(line, OK, show(v), rendered)
+    message = f"evaluates to {show(v)}, not {show(j.v)}"
+    return BatchResult(line, WRONG, show(v), rendered, message)
+
+
+def _check_chunk(
+    items: list[tuple[int, str]], derivation: bool, cache: DiskCache | None = None
+) -> list[BatchResult]:
+    return [check(line, text, derivation, cache) for line, text in items]
+
+
+def _chunks(lines: Iterable[str], chunk_size: int) -> Iterator[list[tuple[int, str]]]:
+    chunk = []
+    for number, text in enumerate(lines, 1):
+        if text.strip():
+            chunk.append((number, text.rstrip("\n")))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def check_batch(
+    lines: Iterable[str],
+    workers: int | None = None,
+    chunk_size: int = 64,
+    derivations: bool = False,
+    cache: DiskCache | None = None,
+) -> Iterator[BatchResult]:
+    """Check every judgement in ``lines`` and yield the results in order.
+
+    ``workers`` is the size of the process pool, ``None`` for one per CPU;
+    ``0`` checks everything in this process. At most two chunks per worker
+    are in flight, so the input is read as results are consumed. Workers
+    share ``cache`` through its directory; its counters are only kept up
+    to date when ``workers`` is ``0``.
+    """
+    if workers == 0:
+        for chunk in _chunks(lines, chunk_size):
+            yield from _check_chunk(chunk, derivations, cache)
+        return
+    ahead = 2 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(workers) as executor:
+        pending: deque[tuple[list[tuple[int, str]], Future]] = deque()
+        for chunk in _chunks(lines, chunk_size):
+            future = executor.submit(_check_chunk, chunk, derivations, cache)
+            pending.append((chunk, future))
+            if len(pending) >= ahead:
+                yield from _collect(*pending.popleft())
+        while pending:
+            yield from _collect(*pending.popleft())
+
+
+def _collect(chunk: list[tuple[int, str]], future: Future) -> list[BatchResult]:
+    try:
+        return future.result()
+    except Exception as e:
+        # the worker itself failed, e.g. it was killed
+        message = f"{type(e).__name__}: {e}"
+        return [BatchResult(line, ERROR, message=message) for line, _ in chunk]
+
+
+def main(argv: list[str] | None = None) -> int:
+    argparser = argparse.ArgumentParser(
+        prog="main.py batch", description="Check one judgement per line."
+    )
+    argparser.add_argument(
+        "file", nargs="?", type=argparse.FileType("r"), default=sys.stdin
+    )
+    argparser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="processes to use; 0 checks in this process",
+    )
+    argparser.add_argument("--chunk-size", type=int, default=64)
+    argparser.add_argument(
+        "--derivations", action="store_true", help="print each derivation"
+    )
+    argparser.add_argument("--cache", metavar="DIR", help="keep derivations in DIR")
+    argparser.add_argument(
+        "--cache-size",
+        type=int,
+        default=256,
+        metavar="MIB",
+        help="evict the least recently used derivations beyond this",
+    )
+    args = argparser.parse_args(argv)
+
+    cache = None
+    if args.cache is not None:
+        cache = DiskCache(args.cache, args.cache_size * 2**20)
+    summary = BatchSummary(workers=args.workers)
+    start = time.perf_counter()
+    results = check_batch(
+        args.file, args.workers, args.chunk_size, args.derivations, cache
+    )
+    for result in results:
+        summary.add(result)
+        print(result)
+    summary.seconds = time.perf_counter() - start
+    print(summary, file=sys.stderr)
+    return 0 if summary.ok == summary.total else 1
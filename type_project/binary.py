@@ -0,0 +1,513 @@
+"""Compact binary format for expressions, environments and derivations.
+
+    data = dumps(infer(env, e))
+    d = loads(data)
+    assert pp(d) == pp(infer(env, e))
+
+    dump(d, "fib.tpd")
+    with BinaryReader.open("fib.tpd") as reader:  # maps the file, reads nothing
+        print(reader.load().val())  # reads the root's conclusion only
+
+A file is a table of records, one per distinct object: a tag byte, then
+the object's fields as varints. Fields that are objects are record
+numbers, always of earlier records; integers are zigzag varints; names,
+rules and side conditions are numbers in a string table. Records are
+hash-consed as they are written, so equal subtrees, whether shared in
+memory or built apart, are written once and referred back to.
+
+    header   magic, version, offset width, root, counts, index offsets
+    records  one after another
+    strings  varint length and UTF-8 bytes, one after another
+    indexes  the offset of every record, then of every string
+
+The indexes have fixed-width entries, so any record can be found and
+decoded on its own. ``BinaryReader`` decodes records as they are asked
+for, and derivations read from it are ``StoredDerivation`` objects that
+decode their conclusion and premises the first time they are read, so a
+reader over ``mmap`` touches only the part of the file that is used.
+"""
+
+import mmap
+import os
+import struct
+from dataclasses import fields
+from typing import Any, BinaryIO
+
+from type_project.ast import (
+    Env,
+    Error,
+    FunctionApply,
+    FunctionEval,
+    FunctionValue,
+    If,
+    Index,
+    Judgement,
+    Let,
+    LetRec,
+    Lt,
+    Minus,
+    Plus,
+    RecFunctionValue,
+    Times,
+    Var,
+)
+from type_project.evaluator import Derivation
+
+MAGIC = b"TPDB"
+VERSION = 1
+
+# magic, version, offset width, root, records, strings, and the offsets of
+# the record and string indexes
+_HEADER = struct.Struct("<4sBB2xQQQQQ")
+_WIDTHS = {4: struct.Struct("<I"), 8: struct.Struct("<Q")}
+
+_INT = 0
+_TRUE = 1
+_FALSE = 2
+_NONE = 3
+_SIDE = 4
+_TUPLE = 5
+_ENV_EMPTY = 6
+_ENV = 7
+_CLOSURE = 8
+_REC_CLOSURE = 9
+_JUDGEMENT = 10
+_DERIVATION = 11
+
+# expression nodes by tag; each field is a name (s), an integer (i) or
+# a record (r)
+_NODES = {
+    16: Error,
+    17: Var,
+    18: Index,
+    19: Plus,
+    20: Minus,
+    21: Times,
+    22: Lt,
+    23: If,
+    24: Let,
+    25: LetRec,
+    26: FunctionEval,
+    27: FunctionApply,
+}
+_NODE_TAGS = {cls: tag for tag, cls in _NODES.items()}
+_NODE_FIELDS = {
+    cls: tuple(
+        (f.name, {"key": "s", "arg_name": "s", "index": "i"}.get(f.name, "r"))
+        for f in fields(cls)
+    )
+    for cls in _NODES.values()
+}
+
+
+class FormatError(ValueError):
+    pass
+
+
+def _varint(n: int, out: bytearray):
+    while n > 0x7F:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _zigzag(n: int) -> int:
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def _unzigzag(n: int) -> int:
+    return n >> 1 if not n & 1 else -(n >> 1) - 1
+
+
+class _Writer:
+    def __init__(self):
+        self.records: list[bytes] = []
+        self.strings: list[str] = []
+        self._record_index: dict[tuple[int, ...], int] = {}
+        self._string_index: dict[str, int] = {}
+        # record of every object written, by identity; the object is kept
+        # alongside so its id is not reused
+        self._by_id: dict[int, tuple[Any, int]] = {}
+
+    def string(self, s: str) -> int:
+        i = self._string_index.get(s)
+        if i is None:
+            i = self._string_index[s] = len(self.strings)
+            self.strings.append(s)
+        return i
+
+    def write(self, obj: Any) -> int:
+        """The record of ``obj``, writing it and everything it holds first."""
+        by_id = self._by_id
+        # an object with its tag and fields once the records it refers to
+        # are on the stack above it
+        stack: list[tuple[Any, Any]] = [(obj, None)]
+        while stack:
+            top, parts = stack.pop()
+            if id(top) in by_id:
+                continue
+            if parts is None:
+                parts = _parts(top)
+                stack.append((top, parts))
+                for kind, x in parts[1]:
+                    if kind == "r" and id(x) not in by_id:
+                        stack.append((x, None))
+                continue
+            tag, fields = parts
+            key = [tag]
+            for kind, x in fields:
+                if kind == "r":
+                    key.append(by_id[id(x)][1])
+                elif kind == "s":
+                    key.append(self.string(x))
+                elif kind == "i":
+                    key.append(_zigzag(x))
+                else:
+                    key.append(x)
+            key = tuple(key)
+            index = self._record_index.get(key)
+            if index is None:
+                index = self._record_index[key] = len(self.records)
+                record = bytearray()
+                for n in key:
+                    _varint(n, record)
+                self.records.append(bytes(record))
+            by_id[id(top)] = (top, index)
+        return by_id[id(obj)][1]
+
+
+def _parts(obj: Any) -> tuple[int, list[tuple[str, Any]]]:
+    """The tag of ``obj`` and its fields, each with its kind."""
+    cls = type(obj)
+    if cls is bool:
+        return (_TRUE if obj else _FALSE), []
+    if cls is int:
+        return _INT, [("i", obj)]
+    if obj is None:
+        return _NONE, []
+    if cls is str:
+        # a side condition like "3 plus 4 is 7 by B-Plus{}"
+        return _SIDE, [("s", obj)]
+    tag = _NODE_TAGS.get(cls)
+    if tag is not None:
+        return tag, [(kind, getattr(obj, name)) for name, kind in _NODE_FIELDS[cls]]
+    if cls is Env:
+        parent = obj.pop()
+        if parent is obj:
+            return _ENV_EMPTY, []
+        key, value = obj.top()
+        return _ENV, [("r", parent), ("s", key), ("r", value)]
+    if cls is FunctionValue:
+        return _CLOSURE, [("r", obj.env), ("r", obj.eval)]
+    if cls is RecFunctionValue:
+        return _REC_CLOSURE, [("r", obj.env), ("s", obj.key), ("r", obj.eval)]
+    if cls is Judgement:
+        return _JUDGEMENT, [("r", obj.env), ("r", obj.e), ("r", obj.v)]
+    if isinstance(obj, Derivation):
+        c = obj.conclusion
+        premises = obj.premises
+        return _DERIVATION, [
+            ("r", c.env),
+            ("r", c.e),
+            ("r", c.v),
+            ("s", obj.rule),
+            ("n", len(premises)),
+        ] + [("r", p) for p in premises]
+    if cls is tuple:
+        return _TUPLE, [("n", len(obj))] + [("r", x) for x in obj]
+    raise TypeError(f"cannot serialize {cls.__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    """``obj`` in the binary format: an expression, value, environment,
+    judgement or derivation, or a tuple of them."""
+    writer = _Writer()
+    root = writer.write(obj)
+    strings = []
+    for s in writer.strings:
+        data = s.encode()
+        length = bytearray()
+        _varint(len(data), length)
+        strings.append(bytes(length) + data)
+
+    start = _HEADER.size
+    record_offsets = []
+    for record in writer.records:
+        record_offsets.append(start)
+        start += len(record)
+    string_offsets = []
+    for s in strings:
+        string_offsets.append(start)
+        start += len(s)
+    count = len(record_offsets) + len(string_offsets)
+    width = 4 if start + 4 * count < 2**32 else 8
+    entry = _WIDTHS[width]
+    record_index = start
+    string_index = record_index + width * len(record_offsets)
+
+    out = bytearray(
+        _HEADER.pack(
+            MAGIC,
+            VERSION,
+            width,
+            root,
+            len(writer.records),
+            len(strings),
+            record_index,
+            string_index,
+        )
+    )
+    out += b"".join(writer.records)
+    out += b"".join(strings)
+    for offset in record_offsets + string_offsets:
+        out += entry.pack(offset)
+    return bytes(out)
+
+
+def dump(obj: Any, file: str | os.PathLike | BinaryIO):
+    data = dumps(obj)
+    if hasattr(file, "write"):
+        file.write(data)
+    else:
+        with open(file, "wb") as f:
+            f.write(data)
+
+
+def loads(data: bytes) -> Any:
+    return BinaryReader(data).load()
+
+
+def load(path: str | os.PathLike) -> Any:
+    """The root object of the file at ``path``, read through ``mmap``.
+
+    The file stays mapped for as long as anything read from it is alive,
+    since derivations decode their parts from the map when they are read.
+    """
+    return BinaryReader.open(path).load()
+
+
+class BinaryReader:
+    """Decodes the records of a buffer in the binary format on demand.
+
+    Every record is decoded at most once, and its object kept, so objects
+    shared in the file are shared when read. A reader from ``open`` maps
+    its file until ``close``, or the end of a ``with`` block.
+    """
+
+    def __init__(self, buffer: bytes | bytearray | memoryview | mmap.mmap):
+        if len(buffer) < _HEADER.size:
+            raise FormatError("too short for a header")
+        (
+            magic,
+            version,
+            width,
+            self.root,
+            self.records,
+            self.strings,
+            self._record_index,
+            self._string_index,
+        ) = _HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise FormatError("not a derivation file")
+        if version != VERSION or width not in _WIDTHS:
+            raise FormatError(f"unsupported version {version}")
+        if self._string_index + width * self.strings > len(buffer):
+            raise FormatError("truncated")
+        self.buffer = buffer
+        self._entry = _WIDTHS[width]
+        self._width = width
+        self._objects: dict[int, Any] = {}
+        self._string_cache: dict[int, str] = {}
+
+    @classmethod
+    def open(cls, path: str | os.PathLike) -> "BinaryReader":
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def close(self):
+        """Unmap the buffer, if it is a map. Records not decoded by then,
+        such as the premises of a derivation not yet read, can no longer
+        be: reading them raises ``ValueError``."""
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def __enter__(self) -> "BinaryReader":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _varint(self, pos: int) -> tuple[int, int]:
+        buf = self.buffer
+        n = shift = 0
+        while True:
+            b = buf[pos]
+            pos += 1
+            n |= (b & 0x7F) << shift
+            if b < 0x80:
+                return n, pos
+            shift += 7
+
+    def string(self, i: int) -> str:
+        s = self._string_cache.get(i)
+        if s is None:
+            if not 0 <= i < self.strings:
+                raise FormatError(f"no string {i}")
+            (at,) = self._entry.unpack_from(
+                self.buffer, self._string_index + self._width * i
+            )
+            length, pos = self._varint(at)
+            s = bytes(self.buffer[pos : pos + length]).decode()
+            self._string_cache[i] = s
+        return s
+
+    def record(self, i: int) -> tuple[int, list[int]]:
+        """The tag of record ``i`` and its fields, undecoded."""
+        if not 0 <= i < self.records:
+            raise FormatError(f"no record {i}")
+        (pos,) = self._entry.unpack_from(
+            self.buffer, self._record_index + self._width * i
+        )
+        tag = self.buffer[pos]
+        pos += 1
+        values = []
+        if tag in _NODES:
+            n = len(_NODE_FIELDS[_NODES[tag]])
+        else:
+            n = _FIELD_COUNTS.get(tag)
+            if n is None:
+                raise FormatError(f"unknown tag {tag} in record {i}")
+        for _ in range(n):
+            value, pos = self._varint(pos)
+            values.append(value)
+        if tag == _DERIVATION or tag == _TUPLE:
+            # followed by as many records as the last field says
+            for _ in range(values[-1]):
+                value, pos = self._varint(pos)
+                values.append(value)
+        return tag, values
+
+    def load(self, i: int | None = None) -> Any:
+        """The object of record ``i``, the root by default."""
+        if i is None:
+            i = self.root
+        objects = self._objects
+        if i in objects:
+            return objects[i]
+        stack = [i]
+        while stack:
+            top = stack[-1]
+            if top in objects:
+                stack.pop()
+                continue
+            tag, values = self.record(top)
+            refs = _refs(tag, values)
+            for r in refs:
+                if r >= top:
+                    raise FormatError(f"record {top} refers forward to {r}")
+            pending = [r for r in refs if r not in objects]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            objects[top] = self._build(top, tag, values)
+        return objects[i]
+
+    def _build(self, i: int, tag: int, values: list[int]) -> Any:
+        get = self._objects.__getitem__
+        if tag == _INT:
+            return _unzigzag(values[0])
+        if tag == _TRUE or tag == _FALSE:
+            return tag == _TRUE
+        if tag == _NONE:
+            return None
+        if tag == _SIDE:
+            return self.string(values[0])
+        if tag == _TUPLE:
+            return tuple(get(r) for r in values[1:])
+        if tag == _ENV_EMPTY:
+            return Env([])
+        if tag == _ENV:
+            parent, key, value = values
+            return get(parent).push(self.string(key), get(value))
+        if tag == _CLOSURE:
+            return FunctionValue(get(values[0]), get(values[1]))
+        if tag == _REC_CLOSURE:
+            env, key, fun = values
+            return RecFunctionValue(get(env), self.string(key), get(fun))
+        if tag == _JUDGEMENT:
+            return Judgement(*(get(r) for r in values))
+        if tag == _DERIVATION:
+            return StoredDerivation(self, values)
+        cls = _NODES[tag]
+        args = []
+        for (_, kind), value in zip(_NODE_FIELDS[cls], values):
+            match kind:
+                case "s":
+                    args.append(self.string(value))
+                case "i":
+                    args.append(_unzigzag(value))
+                case _:
+                    args.append(get(value))
+        return cls(*args)
+
+
+# fields of each record that is not an expression node, before any
+# trailing records
+_FIELD_COUNTS = {
+    _INT: 1,
+    _TRUE: 0,
+    _FALSE: 0,
+    _NONE: 0,
+    _SIDE: 1,
+    _TUPLE: 1,
+    _ENV_EMPTY: 0,
+    _ENV: 3,
+    _CLOSURE: 2,
+    _REC_CLOSURE: 3,
+    _JUDGEMENT: 3,
+    _DERIVATION: 5,
+}
+
+
+def _refs(tag: int, values: list[int]) -> list[int]:
+    """The records a record needs decoded before it; a derivation needs
+    none, since it decodes its parts when they are read."""
+    if tag == _TUPLE:
+        return values[1:]
+    if tag == _ENV or tag == _REC_CLOSURE:
+        return [values[0], values[2]]
+    if tag == _CLOSURE or tag == _JUDGEMENT:
+        return values
+    if tag not in _NODES:
+        return []
+    return [v for (_, kind), v in zip(_NODE_FIELDS[_NODES[tag]], values) if kind == "r"]
+
+
+class StoredDerivation(Derivation):
+    """A derivation read from a ``BinaryReader``; its conclusion and
+    premises are decoded the first time they are read."""
+
+    def __init__(self, reader: BinaryReader, values: list[int]):
+        self._reader = reader
+        self._values = values
+        self._conclusion = None
+        self._premises = None
+
+    @property
+    def conclusion(self) -> Judgement:
+        if self._conclusion is None:
+            env, e, v = self._values[:3]
+            load = self._reader.load
+            self._conclusion = Judgement(load(env), load(e), load(v))
+        return self._conclusion
+
+    @property
+    def rule(self) -> str:
+        return self._reader.string(self._values[3])
+
+    @property
+    def premises(self) -> list[Derivation | str]:
+        if self._premises is None:
+            self._premises = [self._reader.load(p) for p in self._values[5:]]
+        return self._premises
@@ -0,0 +1,245 @@
+"""Hash-consed derivations.
+
+A ``DerivationStore`` keeps every distinct derivation node once. A node is
+identified by the handles of its environment, expression and value, its
+rule and the handles of its premises, so two equal subderivations, built
+at different places or by different calls, become the same node. Handles
+are indices into the store's node list, and finding a node by its parts
+is a single dict lookup.
+
+Environments, expressions and values get handles from the same kind of
+table, keyed by structure, so ``x=3`` built by two calls of ``sq 3`` is one
+environment. Each object is hashed once; later lookups go by identity.
+
+    store = DerivationStore()
+    root = store.add(infer(env, e))
+    assert store.pp(root) == pp(infer(env, e))
+    print(store.stats)
+"""
+
+import sys
+from dataclasses import dataclass
+from typing import Any
+
+from type_project.ast import (
+    Env,
+    Error,
+    FunctionApply,
+    FunctionEval,
+    FunctionValue,
+    If,
+    Index,
+    Judgement,
+    Let,
+    LetRec,
+    Lt,
+    Minus,
+    Plus,
+    RecFunctionValue,
+    Times,
+    Var,
+)
+from type_project.evaluator import Derivation
+
+
+class DerivationNode:
+    __slots__ = ("env", "e", "v", "rule", "premises")
+
+    def __init__(self, env: Any, e: Any, v: Any, rule: str, premises: tuple):
+        self.env = env
+        self.e = e
+        self.v = v
+        self.rule = rule
+        # handles of premise nodes, and the ``B-`` side conditions as strings
+        self.premises = premises
+
+    @property
+    def conclusion(self) -> Judgement:
+        return Judgement(self.env, self.e, self.v)
+
+
+@dataclass
+class DagStats:
+    # derivation objects added, and how many of them were already stored
+    added: int = 0
+    reused: int = 0
+    # estimated size of the added trees and of the nodes kept for them
+    tree_bytes: int = 0
+    dag_bytes: int = 0
+
+    @property
+    def stored(self) -> int:
+        return self.added - self.reused
+
+    def __str__(self):
+        reuse = self.reused / self.added if self.added else 0.0
+        saved = 1 - self.dag_bytes / self.tree_bytes if self.tree_bytes else 0.0
+        return (
+            f"{self.added} nodes, {self.stored} stored ({reuse:.1%} reused); "
+            f"{self.tree_bytes} -> {self.dag_bytes} bytes ({saved:.1%} saved)"
+        )
+
+
+# fixed and child fields of each expression node
+_EXPR_FIELDS = {
+    Plus: ((), ("e1", "e2")),
+    Minus: ((), ("e1", "e2")),
+    Times: ((), ("e1", "e2")),
+    Lt: ((), ("e1", "e2")),
+    If: ((), ("e1", "e2", "e3")),
+    Let: (("key",), ("e1", "e2")),
+    LetRec: (("key",), ("e1", "e2")),
+    FunctionEval: (("arg_name",), ("body",)),
+    FunctionApply: ((), ("func", "arg")),
+    Var: (("key",), ()),
+    Index: (("index",), ()),
+    FunctionValue: ((), ("env", "eval")),
+    RecFunctionValue: (("key",), ("env", "eval")),
+}
+
+
+def _split(obj: Any) -> tuple[tuple, list[Any]]:
+    """The part of ``obj``'s key that needs no handles, and the objects
+    whose handles make up the rest."""
+    cls = type(obj)
+    if cls is int or cls is bool or cls is str:
+        return (cls, obj), []
+    if cls is Error or obj is None:
+        return (cls,), []
+    if cls is Env:
+        parent = obj.pop()
+        if parent is obj:
+            return (Env,), []
+        key, value = obj.top()
+        return (Env, key), [parent, value]
+    fields = _EXPR_FIELDS.get(cls)
+    if fields is not None:
+        fixed, children = fields
+        prefix = (cls,) + tuple(getattr(obj, f) for f in fixed)
+        return prefix, [getattr(obj, f) for f in children]
+    # a nameless ``Frame``, or anything else iterable as a sequence of values
+    return (cls,), list(obj)
+
+
+def _node_bytes(d: Derivation) -> int:
+    size = sys.getsizeof(d) + sys.getsizeof(d.conclusion)
+    size += sys.getsizeof(d.premises)
+    for obj in (d, d.conclusion):
+        if hasattr(obj, "__dict__"):
+            size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+class DerivationStore:
+    def __init__(self):
+        self.nodes: list[DerivationNode] = []
+        self._node_index: dict[tuple, int] = {}
+        # handles of environments, expressions and values, by structure
+        self._terms: dict[tuple, int] = {}
+        # handle of every object seen so far, by identity; the object is
+        # kept alongside so its id is not reused
+        self._by_id: dict[int, tuple[Any, int]] = {}
+        self.stats = DagStats()
+
+    def node(self, handle: int) -> DerivationNode:
+        return self.nodes[handle]
+
+    def term(self, obj: Any) -> int:
+        """The handle of an environment, expression or value."""
+        by_id = self._by_id
+        cached = by_id.get(id(obj))
+        if cached is not None:
+            return cached[1]
+        stack = [obj]
+        while stack:
+            top = stack[-1]
+            if id(top) in by_id:
+                stack.pop()
+                continue
+            prefix, children = _split(top)
+            pending = [c for c in children if id(c) not in by_id]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            key = prefix + tuple(by_id[id(c)][1] for c in children)
+            handle = self._terms.setdefault(key, len(self._terms))
+            by_id[id(top)] = (top, handle)
+        return by_id[id(obj)][1]
+
+    def intern(self, env: Any, e: Any, v: Any, rule: str, premises: tuple) -> int:
+        """The handle of the node with these parts, adding it if it is new.
+
+        ``premises`` holds handles of nodes already in the store, and
+        side conditions as strings.
+        """
+        key = (self.term(env), self.term(e), self.term(v), rule, premises)
+        handle = self._node_index.get(key)
+        self.stats.added += 1
+        if handle is not None:
+            self.stats.reused += 1
+            return handle
+        handle = self._node_index[key] = len(self.nodes)
+        node = DerivationNode(env, e, v, rule, premises)
+        self.nodes.append(node)
+        self.stats.dag_bytes += sys.getsizeof(node) + sys.getsizeof(premises)
+        return handle
+
+    def add(self, d: Derivation) -> int:
+        """Store the derivation tree ``d`` and return the handle of its root.
+
+        Subtrees shared by identity in ``d`` are visited once.
+        """
+        handles: dict[int, int] = {}
+        stack = [d]
+        while stack:
+            top = stack[-1]
+            if id(top) in handles:
+                stack.pop()
+                continue
+            pending = [
+                p
+                for p in top.premises
+                if isinstance(p, Derivation) and id(p) not in handles
+            ]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            premises = tuple(
+                handles[id(p)] if isinstance(p, Derivation) else p for p in top.premises
+            )
+            c = top.conclusion
+            handles[id(top)] = self.intern(c.env, c.e, c.v, top.rule, premises)
+            self.stats.tree_bytes += _node_bytes(top)
+        return handles[id(d)]
+
+    def expand(self, handle: int) -> Derivation:
+        """Rebuild the derivation of ``handle``; shared nodes stay shared."""
+        built: dict[int, Derivation] = {}
+        stack = [handle]
+        while stack:
+            h = stack[-1]
+            if h in built:
+                stack.pop()
+                continue
+            node = self.nodes[h]
+            pending = [p for p in node.premises if isinstance(p, int)]
+            pending = [p for p in pending if p not in built]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            premises = [built[p] if isinstance(p, int) else p for p in node.premises]
+            built[h] = Derivation(node.conclusion, node.rule, premises)
+        return built[handle]
+
+    def pp(self, handle: int | str, depth=0) -> str:
+        """``evaluator.pp`` of the derivation of ``handle``."""
+        indent = "  " * depth
+        if isinstance(handle, str):
+            return indent + handle + ";"
+        node = self.nodes[handle]
+        premises = "\n".join([self.pp(p, depth=depth + 1) for p in node.premises])
+        body = "\n".join([" {", premises, indent + "}"]) if premises else "{}"
+        return f"{indent}{node.conclusion} by {node.rule}{body};"
@@ -0,0 +1,159 @@
+"""Content-addressed cache of derivations on disk.
+
+    cache = DiskCache(".derivations", max_bytes=64 * 2**20)
+    j, d = cache.derive("|- let x = 3 in x * 4 evalto 12")
+
+The first ``derive`` of a judgement parses it, derives it and writes both
+in the format of ``binary``; every later one, in this process or another,
+reads the file and decodes them back without parsing or deriving anything.
+Derivations read back are decoded as they are walked.
+
+An entry is named by the SHA-256 of the judgement with its whitespace
+normalized, so the same judgement spaced differently is the same entry,
+and stored at ``DIR/ab/abcdef....tpd``. Entries are written to a temporary
+file and renamed into place, so processes sharing a directory never see
+half an entry. When the entries outgrow ``max_bytes``, the least recently
+used are removed: a hit touches the entry's modification time, and
+eviction removes the oldest first.
+"""
+
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+from type_project import binary
+from type_project.ast import Judgement
+from type_project.evaluator import Derivation
+from type_project.iterative import infer_iterative
+
+# part of every key, so entries written in an older format are never read
+_KEY_PREFIX = f"type-project derivation {binary.VERSION}\n".encode()
+_SUFFIX = ".tpd"
+
+
+def normalize(text: str) -> str:
+    """``text`` with runs of whitespace made single spaces, and stripped."""
+    return " ".join(text.split())
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+
+class DiskCache:
+    def __init__(self, directory: str | os.PathLike, max_bytes: int = 256 * 2**20):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        # bytes of the entries, counted when first needed and then kept up
+        # to date with this process's writes
+        self._size: int | None = None
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(_KEY_PREFIX + normalize(text).encode()).hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / (key + _SUFFIX)
+
+    def get(self, text: str) -> tuple[Judgement, Derivation] | None:
+        path = self.path(self.key(text))
+        try:
+            # read into memory rather than mapped: the derivation decodes
+            # from its reader for as long as it lives, and on some systems
+            # a mapped file cannot be removed, which eviction has to do
+            reader = binary.BinaryReader(path.read_bytes())
+            j, d = reader.load()
+        except FileNotFoundError:
+            self.stats.misses += 1
+            return None
+        except (binary.FormatError, ValueError, TypeError):
+            # an empty, damaged or foreign file: drop it and derive again
+            self._remove(path)
+            self.stats.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted by another process since; what was read is still good
+            pass
+        self.stats.hits += 1
+        return j, d
+
+    def put(self, text: str, j: Judgement, d: Derivation):
+        data = binary.dumps((j, d))
+        path = self.path(self.key(text))
+        path.parent.mkdir(exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp, path)
+        except BaseException:
+            self._remove(Path(temp))
+            raise
+        self.stats.writes += 1
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        else:
+            self._size += len(data)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def derive(self, text: str) -> tuple[Judgement, Derivation]:
+        """The judgement ``text`` and its derivation, from the cache if they
+        are there; parse errors are raised as ``batch.parse_judgement``
+        raises them and are not cached."""
+        found = self.get(text)
+        if found is not None:
+            return found
+        # imported here, as batch imports this module
+        from type_project.batch import parse_judgement
+
+        j = parse_judgement(text)
+        d = infer_iterative(j.env, j.e)
+        self.put(text, j, d)
+        return j, d
+
+    def evict(self):
+        """Remove the least recently used entries until the rest fit in
+        ``max_bytes``."""
+        entries = sorted(self._entries())
+        size = sum(size for _, size, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= self.max_bytes:
+                break
+            if self._remove(path):
+                self.stats.evictions += 1
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        for _, _, path in self._entries():
+            self._remove(path)
+        self._size = 0
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        """The modification time, size and path of every entry."""
+        entries = []
+        for path in self.directory.glob("??/*" + _SUFFIX):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    @staticmethod
+    def _remove(path: Path) -> bool:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            return False
+        return True
@@ -0,0 +1,218 @@
+"""Per-rule profiler for ``infer`` and ``pp``.
+
+    with profile_eval() as profile:
+        d = infer(env, e)
+        pp(d)
+    print(profile.report())
+    profile.write_json(open("profile.json", "w"))
+
+Inside the block ``infer`` calls the profile for every node, through the
+hook ``memo.InferCache`` uses, and ``pp`` formats every node through the
+profile, which stands in for the function that formats one node. Outside
+of it nothing is installed, so profiling costs nothing when it is off.
+
+For every rule (``E-Var2``, ``E-App``, ``E-PlusErrorL``, ``B-Plus``, ...)
+the profile records how often it concluded a node, the self and
+cumulative time, and the derivation nodes and estimated bytes allocated,
+separately for ``infer`` and ``pp``, and the deepest environment
+``infer`` was called in. Cumulative time counts a rule nested in itself
+once, in its outermost node.
+
+A variable's derivation is shared by every lookup in the same
+environment, and the ``E-Var2`` chain below it is built when it is first
+read, so a lookup that finds it shared allocates nothing, and the chain
+is not counted at all. ``pp`` allocates the text of each node afresh,
+premises included, and that is what its bytes count. A cache active when
+the block starts still answers ``infer`` calls; they are counted as
+calls, without nodes or bytes. ``InferCache.infer`` installs its own
+hook, so a cached evaluation started inside the block is not profiled.
+
+From the command line, with one judgement per line::
+
+    python -m type_project.eval_profile FILE [--json OUT]
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, TextIO
+
+from type_project import evaluator
+from type_project.ast import Env, Expr, Var
+from type_project.batch import parse_judgement
+from type_project.evaluator import Derivation
+
+
+@dataclass
+class RuleStats:
+    calls: int = 0
+    self_time: float = 0.0
+    cumulative_time: float = 0.0
+    nodes: int = 0
+    bytes: int = 0
+
+
+class _Timer:
+    """Self and cumulative time by rule, over calls nested in each other."""
+
+    def __init__(self):
+        self.rules: dict[str, RuleStats] = {}
+        # time spent in the calls made by the current one, and the
+        # cumulative time already counted inside it, by rule
+        self._child_time = 0.0
+        self._nested: dict[str, float] = {}
+
+    def run(self, call: Callable[[], Any], rule_of: Callable[[Any], str]):
+        outer_child_time, outer_nested = self._child_time, self._nested
+        self._child_time, self._nested = 0.0, {}
+        start = time.perf_counter()
+        try:
+            result = call()
+        finally:
+            elapsed = time.perf_counter() - start
+            child_time, nested = self._child_time, self._nested
+            self._child_time, self._nested = outer_child_time + elapsed, outer_nested
+        rule = rule_of(result)
+        stats = self.rules.get(rule)
+        if stats is None:
+            stats = self.rules[rule] = RuleStats()
+        stats.calls += 1
+        stats.self_time += elapsed - child_time
+        outermost = elapsed - nested.get(rule, 0.0)
+        stats.cumulative_time += outermost
+        nested[rule] = nested.get(rule, 0.0) + outermost
+        for r, seconds in nested.items():
+            outer_nested[r] = outer_nested.get(r, 0.0) + seconds
+        return result, stats
+
+
+def _rule_of(d: Derivation | str) -> str:
+    if isinstance(d, str):
+        # a side condition like "3 plus 4 is 7 by B-Plus{}"
+        return d.rsplit(" by ", 1)[-1].removesuffix("{}")
+    return d.rule
+
+
+def _node_bytes(d: Derivation) -> int:
+    size = (
+        sys.getsizeof(d)
+        + sys.getsizeof(d.__dict__)
+        + sys.getsizeof(d.conclusion)
+        + sys.getsizeof(d.conclusion.__dict__)
+    )
+    if "premises" in d.__dict__:
+        size += sys.getsizeof(d.premises)
+    return size
+
+
+class EvalProfile:
+    def __init__(self):
+        self.infer = _Timer()
+        self.pp = _Timer()
+        self.max_env_depth = 0
+        # the cache that was active when the profile started, and the
+        # function ``pp`` formats a node with
+        self._cache = None
+        self._format = evaluator._pp
+
+    def apply(
+        self,
+        env: Env,
+        e: Expr,
+        inner: Callable[[Env, Expr], Derivation],
+    ) -> Derivation:
+        if env.depth > self.max_env_depth:
+            self.max_env_depth = env.depth
+        cache = self._cache
+        if cache is not None:
+            return self.infer.run(lambda: cache.apply(env, e, inner), _rule_of)[0]
+        shared = isinstance(e, Var) and ("E-Var", e.key) in env.memo()
+        d, stats = self.infer.run(lambda: inner(env, e), _rule_of)
+        if not shared:
+            stats.nodes += 1
+            stats.bytes += _node_bytes(d)
+            if not isinstance(e, Var):
+                for p in d.premises:
+                    if isinstance(p, str):
+                        side = self.infer.rules.setdefault(_rule_of(p), RuleStats())
+                        side.calls += 1
+                        side.nodes += 1
+                        side.bytes += sys.getsizeof(p)
+        return d
+
+    def format(self, d: Derivation | str, depth: int, max_depth: int | None) -> str:
+        text, stats = self.pp.run(
+            lambda: self._format(d, depth, max_depth), lambda _: _rule_of(d)
+        )
+        stats.nodes += 1
+        stats.bytes += sys.getsizeof(text)
+        return text
+
+    def as_dict(self) -> dict:
+        return {
+            "max_env_depth": self.max_env_depth,
+            "infer": {rule: asdict(s) for rule, s in self.infer.rules.items()},
+            "pp": {rule: asdict(s) for rule, s in self.pp.rules.items()},
+        }
+
+    def write_json(self, out: TextIO):
+        json.dump(self.as_dict(), out, indent=2)
+        out.write("\n")
+
+    def report(self) -> str:
+        lines = [f"max environment depth: {self.max_env_depth}"]
+        for name, timer in (("infer", self.infer), ("pp", self.pp)):
+            lines.append(
+                f"{name + ' rule':<16} {'calls':>8} {'self ms':>9} {'cum ms':>9} "
+                f"{'nodes':>8} {'KiB':>9}"
+            )
+            ranked = sorted(timer.rules.items(), key=lambda kv: -kv[1].self_time)
+            for rule, s in ranked:
+                lines.append(
+                    f"{rule:<16} {s.calls:>8} {s.self_time * 1e3:>9.2f} "
+                    f"{s.cumulative_time * 1e3:>9.2f} {s.nodes:>8} "
+                    f"{s.bytes / 1024:>9.1f}"
+                )
+        return "\n".join(lines)
+
+
+@contextmanager
+def profile_eval() -> Iterator[EvalProfile]:
+    profile = EvalProfile()
+    saved_cache, saved_format = evaluator._active_cache, evaluator._pp
+    profile._cache = saved_cache
+    evaluator._active_cache = profile
+    evaluator._pp = profile.format
+    try:
+        yield profile
+    finally:
+        evaluator._active_cache = saved_cache
+        evaluator._pp = saved_format
+
+
+def main(argv: list[str] | None = None):
+    argparser = argparse.ArgumentParser(
+        description="Profile infer and pp rule by rule."
+    )
+    argparser.add_argument("file", type=argparse.FileType("r"))
+    argparser.add_argument(
+        "--json", type=argparse.FileType("w"), help="write the profile as JSON"
+    )
+    args = argparser.parse_args(argv)
+
+    judgements = [parse_judgement(line) for line in args.file if line.strip()]
+    with profile_eval() as profile:
+        for j in judgements:
+            evaluator.pp(evaluator.infer(j.env, j.e))
+    print(profile.report())
+    if args.json:
+        profile.write_json(args.json)
+        args.json.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
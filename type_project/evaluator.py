@@ -0,0 +1,470 @@
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from type_project.ast import (
+    Env,
+    Error,
+    Expr,
+    FunctionApply,
+    FunctionEval,
+    FunctionValue,
+    If,
+    Judgement,
+    Let,
+    LetRec,
+    Lt,
+    Minus,
+    Plus,
+    RecFunctionValue,
+    Times,
+    Value,
+    Var,
+)
+
+
+class UnboundVariableError(LookupError):
+    """A variable that no binding of its environment names."""
+
+
+@dataclass(eq=False)
+class Derivation:
+    conclusion: Judgement
+    rule: str
+    premises: list["Derivation | str"]
+
+    def val(self) -> Value:
+        return self.conclusion.v
+
+    def __eq__(self, other):
+        if not isinstance(other, Derivation):
+            return NotImplemented
+        return (
+            self.conclusion == other.conclusion
+            and self.rule == other.rule
+            and self.premises == other.premises
+        )
+
+
+class VarDerivation(Derivation):
+    """The ``E-Var1``/``E-Var2`` derivation of a variable ``depth`` bindings
+    down. The rest of the chain is built the first time ``premises`` is read.
+    """
+
+    def __init__(self, env: Env, e: Var, v: Value, depth: int):
+        self.conclusion = Judgement(env, e, v)
+        self.rule = "E-Var1" if depth == 1 else "E-Var2"
+        self.depth = depth
+        self._premises = None
+
+    @property
+    def premises(self) -> list[Derivation | str]:
+        if self._premises is None:
+            if self.depth == 1:
+                self._premises = []
+            else:
+                env, e, v = self.conclusion.env.pop(), self.conclusion.e, self.val()
+                self._premises = [_var_chain(env, e, v, self.depth - 1)]
+        return self._premises
+
+
+def var_derivation(env: Env, e: Var, depth: int | None = None) -> VarDerivation:
+    """The derivation of ``env |- e``, shared by every lookup of ``e.key``
+    in ``env``. ``depth`` is where the binding is, if the caller knows it;
+    if not and nothing binds ``e.key``, raise ``UnboundVariableError``.
+    """
+    d = env.memo().get(("E-Var", e.key))
+    if d is not None:
+        return d
+    if depth is None:
+        try:
+            v, depth = env.locate(e.key)
+        except KeyError:
+            raise UnboundVariableError(f"unbound variable {e.key}") from None
+        return _var_chain(env, e, v, depth)
+    bound = env
+    for _ in range(depth - 1):
+        bound = bound.pop()
+    return _var_chain(env, e, bound.top()[1], depth)
+
+
+def _var_chain(env: Env, e: Var, v: Value, depth: int) -> VarDerivation:
+    memo = env.memo()
+    d = memo.get(("E-Var", e.key))
+    if d is None:
+        d = memo[("E-Var", e.key)] = VarDerivation(env, e, v, depth)
+    return d
+
+
+INT2 = {
+    Plus: (lambda x, y: x + y, "plus", "Plus"),
+    Minus: (lambda x, y: x - y, "minus", "Minus"),
+    Times: (lambda x, y: x * y, "times", "Times"),
+    Lt: (lambda x, y: x < y, "less than", "Lt"),
+}
+
+
+def int2(
+    fn: Callable[[int, int], Value], op: str, name: str, d1: Derivation, d2: Derivation
+) -> tuple[Value, str, list[Derivation | str]]:
+    """Value, rule and premises of a binary integer operation on the results
+    of ``d1`` and ``d2``."""
+    match (d1.val(), d2.val()):
+        case (bool(), _):
+            return Error(), f"E-{name}BoolL", [d1]
+        case (Error(), _):
+            return Error(), f"E-{name}ErrorL", [d1]
+        case (_, bool()):
+            return Error(), f"E-{name}BoolR", [d2]
+        case (_, Error()):
+            return Error(), f"E-{name}ErrorR", [d2]
+        case (int(l), int(r)):
+            v = fn(l, r)
+            d3 = f"{l} {op} {r} is {v} by B-{name}" + "{}"
+            return v, f"E-{name}", [d1, d2, d3]
+    raise TypeError(f"no rule for {d1.val()} {op} {d2.val()}")
+
+
+# installed by ``memo.InferCache`` while a cached evaluation runs, by
+# ``eval_profile`` while a profile is recorded, and by ``parallel`` while a
+# parallel evaluation runs; the last two pass each node on to the hook they
+# found installed
+_active_cache = None
+
+
+def infer(env: Env, e: Expr, v: Value = None) -> Derivation:
+    cache = _active_cache
+    if cache is not None:
+        return cache.apply(env, e, _infer)
+    return _infer(env, e)
+
+
+def _infer(env: Env, e: Expr, v: Value = None) -> Derivation:
+    def by(v: Value, rule: str, premises: list[Derivation | str]) -> Derivation:
+        return Derivation(Judgement(env, e, v), rule, premises)
+
+    def by_int2(
+        fn: Callable[[int, int], Value], op: str, name: str, e1: Expr, e2: Expr
+    ) -> Derivation:
+        d1 = infer(env, e1)
+        d2 = infer(env, e2)
+        return by(*int2(fn, op, name, d1, d2))
+
+    match e:
+        case Var():
+            return var_derivation(env, e)
+        case Plus(e1, e2):
+            return by_int2(lambda x, y: x + y, "plus", "Plus", e1, e2)
+        case Minus(e1, e2):
+            return by_int2(lambda x, y: x - y, "minus", "Minus", e1, e2)
+        case Times(e1, e2):
+            return by_int2(lambda x, y: x * y, "times", "Times", e1, e2)
+        case Lt(e1, e2):
+            return by_int2(lambda x, y: x < y, "less than", "Lt", e1, e2)
+        case If(e1, e2, e3):
+            d1 = infer(env, e1)
+            match d1.val():
+                case True:
+                    d2 = infer(env, e2)
+                    match d2.val():
+                        case Error():
+                            return by(Error(), "E-IfTError", [d1, d2])
+                        case v:
+                            return by(v, "E-IfT", [d1, d2])
+                case False:
+                    d3 = infer(env, e3)
+                    match d3.val():
+                        case Error():
+                            return by(Error(), "E-IfFError", [d1, d3])
+                        case v:
+                            return by(v, "E-IfF", [d1, d3])
+                case Error():
+                    return by(Error(), "E-IfError", [d1])
+                case int():
+                    return by(Error(), "E-IfInt", [d1])
+
+        case Let(key, e1, e2):
+            d1 = infer(env, e1)
+            d2 = infer(env.push(key, d1.val()), e2)
+            return by(d2.val(), "E-Let", [d1, d2])
+        case FunctionEval(arg_name, body):
+            return by(FunctionValue(env=env, eval=e), "E-Fun", [])
+        case LetRec(key, FunctionEval() as fun, e2):
+            closure = RecFunctionValue(env, key, fun)
+            d1 = infer(closure.rec_env(), e2)
+            return by(d1.val(), "E-LetRec", [d1])
+        case FunctionApply(fun, arg):
+            d1 = infer(env, fun)
+            d2 = infer(env, arg)
+
+            fun_value: FunctionValue | RecFunctionValue = d1.val()
+
+            if isinstance(fun_value, RecFunctionValue):
+                arg_env = fun_value.rec_env().push(fun_value.eval.arg_name, d2.val())
+                d3 = infer(arg_env, fun_value.eval.body)
+                return by(d3.val(), "E-AppRec", [d1, d2, d3])
+
+            arg_env = fun_value.env.push(fun_value.eval.arg_name, d2.val())
+            d3 = infer(arg_env, fun_value.eval.body)
+
+            return by(d3.val(), "E-App", [d1, d2, d3])
+        case bool(x):
+            return by(x, "E-Bool", [])
+        case int(x):
+            return by(x, "E-Int", [])
+    raise Exception(env, e, v)
+
+
+class _Evaluation:
+    """A node of ``evaluate`` waiting for the values of its premises."""
+
+    __slots__ = ("env", "e", "step", "v1", "inner")
+
+    def __init__(self, env: Env, e: Expr):
+        self.env = env
+        self.e = e
+        # premises evaluated so far
+        self.step = 0
+        self.v1: Value = None
+        # the environment the last premise is evaluated in, when it is not
+        # ``env``
+        self.inner: Env | None = None
+
+
+# values of ``evaluate``, by the identity of the environment and the node;
+# each entry keeps its environment, so that identity is not reused
+Record = dict[tuple[int, Expr], tuple[Env, Value, Env | None]]
+
+
+def evaluate(env: Env, e: Expr, record: Record | None = None) -> Value:
+    """The value ``infer(env, e)`` derives, without building the derivation.
+
+    Like ``infer_iterative``, it keeps its continuations on an explicit
+    stack. The value of every subexpression that has premises is put in
+    ``record``, if given, with the environment of its last premise.
+    """
+    stack: list[_Evaluation] = []
+    while True:
+        # start ``e`` in ``env``: either ``v`` is its value, or it waits
+        match e:
+            case Var(key):
+                try:
+                    v = env.lookup(key)
+                except KeyError:
+                    raise UnboundVariableError(f"unbound variable {key}") from None
+            case bool() | int():
+                v = e
+            case FunctionEval():
+                v = FunctionValue(env=env, eval=e)
+            case (
+                Plus(e1, _)
+                | Minus(e1, _)
+                | Times(e1, _)
+                | Lt(e1, _)
+                | If(e1, _, _)
+                | Let(_, e1, _)
+                | FunctionApply(e1, _)
+            ):
+                stack.append(_Evaluation(env, e))
+                e = e1
+                continue
+            case LetRec(key, FunctionEval() as fun, e2):
+                frame = _Evaluation(env, e)
+                frame.inner = RecFunctionValue(env, key, fun).rec_env()
+                stack.append(frame)
+                env, e = frame.inner, e2
+                continue
+            case _:
+                raise Exception(env, e)
+
+        # hand ``v`` to the nodes waiting for it until one of them has
+        # another premise to evaluate
+        while stack:
+            frame = stack[-1]
+            match frame.e:
+                case Plus(_, e2) | Minus(_, e2) | Times(_, e2) | Lt(_, e2):
+                    if frame.step == 0:
+                        frame.step, frame.v1 = 1, v
+                        env, e = frame.env, e2
+                        break
+                    v1 = frame.v1
+                    match (v1, v):
+                        case (bool() | Error(), _) | (_, bool() | Error()):
+                            v = Error()
+                        case (int(), int()):
+                            v = INT2[type(frame.e)][0](v1, v)
+                        case _:
+                            op = INT2[type(frame.e)][1]
+                            raise TypeError(f"no rule for {v1} {op} {v}")
+                case If(_, e2, e3):
+                    if frame.step == 0:
+                        match v:
+                            case True:
+                                frame.step = 1
+                                env, e = frame.env, e2
+                                break
+                            case False:
+                                frame.step = 1
+                                env, e = frame.env, e3
+                                break
+                            case Error() | int():
+                                v = Error()
+                            case _:
+                                raise Exception(frame.env, frame.e)
+                case Let(key, _, e2):
+                    if frame.step == 0:
+                        frame.step, frame.inner = 1, frame.env.push(key, v)
+                        env, e = frame.inner, e2
+                        break
+                case FunctionApply(_, arg):
+                    if frame.step == 0:
+                        frame.step, frame.v1 = 1, v
+                        env, e = frame.env, arg
+                        break
+                    if frame.step == 1:
+                        closure: FunctionValue | RecFunctionValue = frame.v1
+                        if isinstance(closure, RecFunctionValue):
+                            inner = closure.rec_env()
+                        else:
+                            inner = closure.env
+                        inner = inner.push(closure.eval.arg_name, v)
+                        frame.step, frame.inner = 2, inner
+                        env, e = inner, closure.eval.body
+                        break
+            stack.pop()
+            if record is not None:
+                record[(id(frame.env), frame.e)] = (frame.env, v, frame.inner)
+        else:
+            return v
+
+
+class LazyDerivation(Derivation):
+    """A derivation whose value is computed up front, while its rule and
+    premises are worked out the first time either is read.
+
+    Each premise is lazy in turn, so printing the top few levels only
+    builds the nodes those levels mention. The values of the subexpressions
+    are recorded while the value of the root is computed, and each premise
+    takes its own out of the record shared by the tree, so expanding the
+    whole derivation evaluates nothing again and costs about what ``infer``
+    does.
+    """
+
+    def __init__(
+        self, env: Env, e: Expr, v: Value = None, record: Record | None = None
+    ):
+        if record is None:
+            record = {}
+        entry = record.pop((id(env), e), None)
+        if entry is None and v is None and not isinstance(e, _LEAVES):
+            evaluate(env, e, record)
+            entry = record.pop((id(env), e))
+        if entry is not None:
+            _, v, self._inner = entry
+        else:
+            if v is None:
+                v = FunctionValue(env=env, eval=e) if isinstance(e, FunctionEval) else e
+            self._inner = None
+        self.conclusion = Judgement(env, e, v)
+        self._record = record
+        self._rule = None
+        self._premises = None
+
+    @property
+    def rule(self) -> str:
+        if self._rule is None:
+            self._expand()
+        return self._rule
+
+    @property
+    def premises(self) -> list[Derivation | str]:
+        if self._premises is None:
+            self._expand()
+        return self._premises
+
+    def _premise(self, env: Env, e: Expr) -> Derivation:
+        if isinstance(e, Var):
+            return var_derivation(env, e)
+        return LazyDerivation(env, e, record=self._record)
+
+    def _expand(self):
+        env, e = self.conclusion.env, self.conclusion.e
+        premise = self._premise
+        match e:
+            case Plus(e1, e2) | Minus(e1, e2) | Times(e1, e2) | Lt(e1, e2):
+                d1, d2 = premise(env, e1), premise(env, e2)
+                _, rule, premises = int2(*INT2[type(e)], d1, d2)
+            case If(e1, e2, e3):
+                d1 = premise(env, e1)
+                match d1.val():
+                    case True:
+                        d2 = premise(env, e2)
+                        error = isinstance(d2.val(), Error)
+                        rule, premises = "E-IfTError" if error else "E-IfT", [d1, d2]
+                    case False:
+                        d3 = premise(env, e3)
+                        error = isinstance(d3.val(), Error)
+                        rule, premises = "E-IfFError" if error else "E-IfF", [d1, d3]
+                    case Error():
+                        rule, premises = "E-IfError", [d1]
+                    case int():
+                        rule, premises = "E-IfInt", [d1]
+            case Let(key, e1, e2):
+                d1 = premise(env, e1)
+                inner = self._inner
+                if inner is None:
+                    inner = env.push(key, d1.val())
+                rule, premises = "E-Let", [d1, premise(inner, e2)]
+            case LetRec(key, FunctionEval() as fun, e2):
+                inner = self._inner
+                if inner is None:
+                    inner = RecFunctionValue(env, key, fun).rec_env()
+                rule, premises = "E-LetRec", [premise(inner, e2)]
+            case FunctionEval():
+                rule, premises = "E-Fun", []
+            case FunctionApply(fun, arg):
+                d1, d2 = premise(env, fun), premise(env, arg)
+                closure: FunctionValue | RecFunctionValue = d1.val()
+                rec = isinstance(closure, RecFunctionValue)
+                inner = self._inner
+                if inner is None:
+                    inner = closure.rec_env() if rec else closure.env
+                    inner = inner.push(closure.eval.arg_name, d2.val())
+                rule = "E-AppRec" if rec else "E-App"
+                premises = [d1, d2, premise(inner, closure.eval.body)]
+            case bool():
+                rule, premises = "E-Bool", []
+            case int():
+                rule, premises = "E-Int", []
+        self._rule, self._premises = rule, premises
+
+
+# expressions whose value takes no evaluation, and which ``evaluate`` does
+# not record
+_LEAVES = (bool, int, FunctionEval)
+
+
+def infer_lazy(env: Env, e: Expr) -> Derivation:
+    """``infer(env, e)`` as a ``LazyDerivation``: only the value is computed
+    now."""
+    if isinstance(e, Var):
+        return var_derivation(env, e)
+    return LazyDerivation(env, e)
+
+
+def pp(d: Derivation | str, depth=0, max_depth: int | None = None) -> str:
+    """Format ``d``. Below ``max_depth`` levels, premises are shown as
+    ``{...}``."""
+    return _pp(d, depth, max_depth)
+
+
+# replaced by ``eval_profile`` while a profile is recorded; premises are
+# formatted through the name, so the replacement sees every node
+def _pp(d: Derivation | str, depth: int, max_depth: int | None) -> str:
+    indent = "  " * depth
+    if isinstance(d, str):
+        return indent + d + ";"
+    if max_depth is not None and depth >= max_depth and d.premises:
+        return f"{indent}{d.conclusion} by {d.rule} {{...}};"
+    premises = "\n".join([_pp(c, depth + 1, max_depth) for c in d.premises])
+    body = "\n".join([" {", premises, indent + "}"]) if premises else "{}"
+    return f"{indent}{d.conclusion} by {d.rule}{body};"
@@ -0,0 +1,165 @@
+"""Incremental re-parsing of judgements for editors.
+
+``parse_judgement`` parses a judgement as ``grammar().judge`` does and keeps
+the span tree of its expression. Only the Pratt backend builds span trees,
+so expressions are parsed with it whichever backend ``parser_expr`` is set
+to; both backends read the same tree from the same text.
+
+``reparse`` applies a text edit and re-parses only the smallest
+``let``/``let rec``/``if``/``fun`` or parenthesized node that encloses the
+edit, reusing every other subtree as is. The re-parsed region is accepted
+only if it parses as a whole, on its own. In those positions the grammar
+stops at a delimiter (``in``, ``then``, ``else``, ``)``, ``evalto``) that
+the edit did not touch, so the result is the same as a full parse. If no
+enclosing node qualifies, it falls back to a full parse.
+"""
+
+from dataclasses import dataclass, replace
+from typing import Any
+
+from type_project.ast import (
+    Expr,
+    FunctionApply,
+    FunctionEval,
+    If,
+    Judgement,
+    Let,
+    LetRec,
+    Lt,
+    Minus,
+    Plus,
+    Span,
+    Times,
+)
+from type_project.parser import (
+    parser_environment,
+    parser_value,
+    skip_space_sequence,
+)
+from type_project.parser_core import keyword, tag
+from type_project.pratt import parse_expr_with_spans
+
+# subexpression fields of each node, in span-children order
+CHILD_FIELDS = {
+    Plus: ("e1", "e2"),
+    Minus: ("e1", "e2"),
+    Times: ("e1", "e2"),
+    Lt: ("e1", "e2"),
+    If: ("e1", "e2", "e3"),
+    Let: ("e1", "e2"),
+    LetRec: ("e1", "e2"),
+    FunctionEval: ("body",),
+    FunctionApply: ("func", "arg"),
+}
+
+REPARSABLE = (Let, LetRec, If, FunctionEval)
+
+_judge_head = skip_space_sequence((parser_environment(), tag("|-")))
+_judge_tail = skip_space_sequence((keyword("evalto"), parser_value()))
+
+
+@dataclass
+class IncrementalParse:
+    text: str
+    judgement: Judgement | None
+    # span tree of ``judgement.e``; the root offset is absolute
+    span: Span | None
+    # offset where the judgement parse stopped, as ``len(text) - len(remain)``
+    end: int
+    error: Any = None
+    # region of ``text`` re-parsed by the last edit, ``None`` after a full parse
+    reparsed: tuple[int, int] | None = None
+
+
+def parse_judgement(text: str) -> IncrementalParse:
+    head = _judge_head.parse(text, 0)
+    if head.error is not None:
+        return IncrementalParse(text, None, None, head.pos, head.error)
+    env = head.value[0]
+    expr, span = parse_expr_with_spans(text, head.pos)
+    if expr.error is not None:
+        return IncrementalParse(text, None, None, expr.pos, expr.error)
+    tail = _judge_tail.parse(text, expr.pos)
+    if tail.error is not None:
+        return IncrementalParse(text, None, None, tail.pos, tail.error)
+    judgement = Judgement(env, expr.value, tail.value[1])
+    return IncrementalParse(text, judgement, span, tail.pos)
+
+
+def reparse(
+    previous: IncrementalParse, start: int, end: int, replacement: str
+) -> IncrementalParse:
+    """Replace ``previous.text[start:end]`` with ``replacement`` and re-parse."""
+    text = previous.text[:start] + replacement + previous.text[end:]
+    if previous.judgement is None:
+        return parse_judgement(text)
+    delta = len(replacement) - (end - start)
+
+    # path from the root to the innermost node containing the edit, as
+    # (node, span, absolute offset, index of the next child on the path)
+    path = []
+    node, span, offset = previous.judgement.e, previous.span, previous.span.offset
+    while offset <= start and end <= offset + span.length:
+        path.append([node, span, offset, None])
+        children = _children(node, span)
+        for index, (child, child_span) in enumerate(zip(children, span.children)):
+            child_offset = offset + child_span.offset
+            if child_offset <= start and end <= child_offset + child_span.length:
+                path[-1][3] = index
+                node, span, offset = child, child_span, child_offset
+                break
+        else:
+            break
+
+    for depth in range(len(path) - 1, -1, -1):
+        node, span, offset, _ = path[depth]
+        if span.paren:
+            # the edit must leave both parentheses alone
+            if not (offset < start and end < offset + span.length):
+                continue
+        elif not (isinstance(node, REPARSABLE) and offset < start):
+            continue
+        region_end = offset + span.length + delta
+        r, tree = parse_expr_with_spans(text, offset, region_end)
+        if r.error is not None or r.pos != region_end or tree.paren != span.paren:
+            continue
+
+        new_node, new_span = r.value, tree
+        if depth:
+            new_span.offset -= path[depth - 1][2]
+        for parent, parent_span, _, index in reversed(path[:depth]):
+            new_node, new_span = _rebuild(
+                parent, parent_span, index, new_node, new_span, delta
+            )
+        judgement = Judgement(previous.judgement.env, new_node, previous.judgement.v)
+        return IncrementalParse(
+            text,
+            judgement,
+            new_span,
+            previous.end + delta,
+            reparsed=(offset, region_end),
+        )
+
+    return parse_judgement(text)
+
+
+def _children(node: Expr, span: Span) -> tuple[Expr, ...]:
+    if span.paren:
+        return (node,)
+    fields = CHILD_FIELDS.get(type(node), ())
+    return tuple(getattr(node, f) for f in fields)
+
+
+def _rebuild(
+    node: Expr, span: Span, index: int, child: Expr, child_span: Span, delta: int
+) -> tuple[Expr, Span]:
+    children = list(span.children)
+    children[index] = child_span
+    for i in range(index + 1, len(children)):
+        c = children[i]
+        children[i] = Span(c.offset + delta, c.length, c.children, c.paren)
+    if span.paren:
+        return child, Span(span.offset, span.length + delta, tuple(children), True)
+    last = children[-1]
+    new_span = Span(span.offset, last.offset + last.length, tuple(children))
+    return replace(node, **{CHILD_FIELDS[type(node)][index]: child}), new_span
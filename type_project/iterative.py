@@ -0,0 +1,179 @@
+"""Stack-safe evaluation.
+
+``infer_iterative`` builds the same ``Derivation`` as ``evaluator.infer``,
+but keeps its continuations on an explicit stack instead of the Python
+call stack, so deep ``let`` chains, long ``+`` chains and long chains of
+calls are bounded by memory rather than by the recursion limit.
+
+The last premise of ``E-Let``, ``E-LetRec``, ``E-App``, ``E-AppRec``,
+``E-IfT`` and ``E-IfF`` is the one the conclusion takes its value from,
+so nothing is left to evaluate once it is known. Those nodes are created
+when the tail expression starts and wait in a single ``_Tail`` frame,
+which finishes all of them at once. A chain of tail calls therefore
+costs one node each and no stack frames.
+
+``max_depth`` bounds the depth of the derivation; a deeper one raises
+``DerivationDepthError``.
+"""
+
+from type_project.ast import (
+    Env,
+    Error,
+    Expr,
+    FunctionApply,
+    FunctionEval,
+    FunctionValue,
+    If,
+    Judgement,
+    Let,
+    LetRec,
+    Lt,
+    Minus,
+    Plus,
+    RecFunctionValue,
+    Times,
+    Var,
+)
+from type_project.evaluator import INT2, Derivation, int2, var_derivation
+
+MAX_DEPTH = 1_000_000
+
+
+class DerivationDepthError(RuntimeError):
+    pass
+
+
+class _Frame:
+    """A node waiting for the derivations of its non-tail premises."""
+
+    __slots__ = ("env", "e", "depth", "d1")
+
+    def __init__(self, env: Env, e: Expr, depth: int):
+        self.env = env
+        self.e = e
+        self.depth = depth
+        self.d1: Derivation | None = None
+
+
+class _Tail:
+    """Nodes waiting for the same tail derivation, outermost first."""
+
+    __slots__ = ("nodes",)
+
+    def __init__(self):
+        self.nodes: list[Derivation] = []
+
+
+def _finish(node: Derivation, d: Derivation) -> Derivation:
+    v = d.val()
+    if isinstance(v, Error) and node.rule in ("E-IfT", "E-IfF"):
+        node.rule += "Error"
+        v = Error()
+    node.premises.append(d)
+    node.conclusion.v = v
+    return node
+
+
+def infer_iterative(env: Env, e: Expr, max_depth: int = MAX_DEPTH) -> Derivation:
+    stack: list[_Frame | _Tail] = []
+    depth = 0
+
+    def tail(env: Env, e: Expr, rule: str, premises: list[Derivation]):
+        node = Derivation(Judgement(env, e, None), rule, premises)
+        if not (stack and isinstance(stack[-1], _Tail)):
+            stack.append(_Tail())
+        stack[-1].nodes.append(node)
+
+    while True:
+        # evaluate ``e`` in ``env``: either finish it as ``d``, or push its
+        # frame and go on with its first premise
+        if depth > max_depth:
+            raise DerivationDepthError(
+                f"derivation is deeper than the maximum depth of {max_depth}"
+            )
+        match e:
+            case Var():
+                d = var_derivation(env, e)
+            case bool(x):
+                d = Derivation(Judgement(env, e, x), "E-Bool", [])
+            case int(x):
+                d = Derivation(Judgement(env, e, x), "E-Int", [])
+            case FunctionEval():
+                v = FunctionValue(env=env, eval=e)
+                d = Derivation(Judgement(env, e, v), "E-Fun", [])
+            case Plus(e1, _) | Minus(e1, _) | Times(e1, _) | Lt(e1, _):
+                stack.append(_Frame(env, e, depth))
+                e, depth = e1, depth + 1
+                continue
+            case If(e1, _, _) | Let(_, e1, _) | FunctionApply(e1, _):
+                stack.append(_Frame(env, e, depth))
+                e, depth = e1, depth + 1
+                continue
+            case LetRec(key, FunctionEval() as fun, e2):
+                closure = RecFunctionValue(env, key, fun)
+                tail(env, e, "E-LetRec", [])
+                env, e, depth = closure.rec_env(), e2, depth + 1
+                continue
+            case _:
+                raise Exception(env, e)
+
+        # hand ``d`` to the frames waiting for it until one of them has
+        # another expression to evaluate
+        while stack:
+            frame = stack[-1]
+            if isinstance(frame, _Tail):
+                stack.pop()
+                for node in reversed(frame.nodes):
+                    d = _finish(node, d)
+                continue
+            env, e, depth = frame.env, frame.e, frame.depth + 1
+            match e:
+                case Plus(_, e2) | Minus(_, e2) | Times(_, e2) | Lt(_, e2):
+                    if frame.d1 is None:
+                        frame.d1 = d
+                        e = e2
+                        break
+                    stack.pop()
+                    v, rule, premises = int2(*INT2[type(e)], frame.d1, d)
+                    d = Derivation(Judgement(env, e, v), rule, premises)
+                case If(_, e2, e3):
+                    stack.pop()
+                    match d.val():
+                        case True:
+                            tail(env, e, "E-IfT", [d])
+                            e = e2
+                            break
+                        case False:
+                            tail(env, e, "E-IfF", [d])
+                            e = e3
+                            break
+                        case Error():
+                            rule = "E-IfError"
+                        case int():
+                            rule = "E-IfInt"
+                        case _:
+                            raise Exception(env, e)
+                    d = Derivation(Judgement(env, e, Error()), rule, [d])
+                case Let(key, _, e2):
+                    stack.pop()
+                    tail(env, e, "E-Let", [d])
+                    env, e = env.push(key, d.val()), e2
+                    break
+                case FunctionApply(_, arg):
+                    if frame.d1 is None:
+                        frame.d1 = d
+                        e = arg
+                        break
+                    stack.pop()
+                    closure: FunctionValue | RecFunctionValue = frame.d1.val()
+                    if isinstance(closure, RecFunctionValue):
+                        tail(env, e, "E-AppRec", [frame.d1, d])
+                        env = closure.rec_env()
+                    else:
+                        tail(env, e, "E-App", [frame.d1, d])
+                        env = closure.env
+                    env = env.push(closure.eval.arg_name, d.val())
+                    e = closure.eval.body
+                    break
+        else:
+            return d
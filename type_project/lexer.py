@@ -0,0 +1,65 @@
+import re
+from typing import Any, NamedTuple
+
+
+class Token(NamedTuple):
+    kind: str
+    value: Any
+    start: int
+    end: int
+    spaced: bool
+
+
+KEYWORDS = {"let", "if", "then", "else", "in", "evalto"}
+
+_TOKEN = re.compile(
+    r"""
+      (?P<int>[0-9]+)
+    | (?P<index>\#\d+)
+    | (?P<name>[^\W_]+)
+    | (?P<symbol>->|\|-|[-+*<()=,.])
+    """,
+    re.VERBOSE,
+)
+_SPACE = re.compile(r"[ \t\n]*")
+
+
+def tokenize(buf: str, pos: int = 0, endpos: int | None = None) -> list[Token]:
+    """Split ``buf[pos:endpos]`` into tokens, ending with an ``eof`` token.
+
+    Names are read by maximal munch, so ``letter`` is a single name. A
+    character that starts no token becomes a ``?`` token; parsers stop there.
+    """
+    tokens = []
+    n = len(buf) if endpos is None else endpos
+    match_token = _TOKEN.match
+    skip_space = _SPACE.match
+    while True:
+        start = skip_space(buf, pos, n).end()
+        spaced = start != pos
+        if start == n:
+            tokens.append(Token("eof", None, start, start, spaced))
+            return tokens
+        m = match_token(buf, start, n)
+        if m is None:
+            tokens.append(Token("?", buf[start], start, start + 1, spaced))
+            pos = start + 1
+            continue
+        pos = m.end()
+        kind = m.lastgroup
+        text = m.group()
+        if kind == "int":
+            tokens.append(Token("int", int(text), start, pos, spaced))
+        elif kind == "index":
+            tokens.append(Token("index", int(text[1:]), start, pos, spaced))
+        elif kind == "name":
+            if text in KEYWORDS:
+                tokens.append(Token(text, text, start, pos, spaced))
+            elif text == "true" or text == "false":
+                tokens.append(Token("bool", text == "true", start, pos, spaced))
+            elif text == "error":
+                tokens.append(Token("error", text, start, pos, spaced))
+            else:
+                tokens.append(Token("name", text, start, pos, spaced))
+        else:
+            tokens.append(Token(text, text, start, pos, spaced))
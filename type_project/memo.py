@@ -0,0 +1,213 @@
+"""Memoized evaluation.
+
+An ``InferCache`` remembers the derivations ``evaluator.infer`` builds,
+keyed by the structure of the environment and the expression, so a
+subexpression evaluated again in an equal environment, like each call of
+``fib 3`` inside ``fib 10``, is derived once. The cache is opt-in: while
+``InferCache.infer`` runs, every recursive ``infer`` call goes through it.
+
+    cache = InferCache(max_entries=4096, max_bytes=2**26)
+    d = cache.infer(env, e)
+    assert d == infer(env, e)
+    print(cache.stats)
+
+Keys are structural hashes: expression nodes are interned and carry
+theirs, and an environment keeps its hash in ``Env.memo()``, so a key
+costs a step or two. A hit is confirmed by comparing the structures,
+which tells ``1`` from ``True`` in environments even though Python's
+``==`` does not. Entries are dropped least recently used first once
+there are more than ``max_entries`` of them or their estimated size
+passes ``max_bytes``.
+"""
+
+import sys
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, fields, is_dataclass
+from typing import Any
+
+from type_project import evaluator
+from type_project.ast import Env, Expr, FunctionEval, Node, Var
+from type_project.evaluator import Derivation, VarDerivation
+
+# cheap to derive, so not worth an entry
+_UNCACHED = (Var, FunctionEval, int)
+
+
+def structural_hash(obj: Any) -> int:
+    """A hash of ``obj`` that depends only on its structure and types."""
+    cls = type(obj)
+    if cls is int or cls is bool or cls is str or obj is None:
+        return hash((cls, obj))
+    if cls is Env:
+        return _env_hash(obj)
+    if isinstance(obj, Node):
+        return hash(obj)
+    return hash(
+        (cls,)
+        + tuple(structural_hash(getattr(obj, f.name)) for f in fields(obj) if f.compare)
+    )
+
+
+def _env_hash(env: Env) -> int:
+    # hash the bindings from the nearest environment that has one, so a
+    # pushed environment costs a single step
+    pending = []
+    while "hash" not in env.memo():
+        parent = env.pop()
+        if parent is env:
+            env.memo()["hash"] = hash((Env,))
+            break
+        pending.append(env)
+        env = parent
+    h = env.memo()["hash"]
+    for env in reversed(pending):
+        key, value = env.top()
+        h = hash((h, key, structural_hash(value)))
+        env.memo()["hash"] = h
+    return h
+
+
+def same(a: Any, b: Any) -> bool:
+    """Whether ``a`` and ``b`` have the same structure, types included."""
+    if a is b:
+        return True
+    cls = type(a)
+    if cls is not type(b) or isinstance(a, Node):
+        # nodes are interned, so equal ones are the same object
+        return False
+    if cls is Env:
+        while a is not b:
+            pa, pb = a.pop(), b.pop()
+            if pa is a or pb is b:
+                return pa is a and pb is b
+            (ka, va), (kb, vb) = a.top(), b.top()
+            if ka != kb or not same(va, vb):
+                return False
+            a, b = pa, pb
+        return True
+    if is_dataclass(a):
+        return all(
+            same(getattr(a, f.name), getattr(b, f.name)) for f in fields(a) if f.compare
+        )
+    return a == b
+
+
+class _Key:
+    __slots__ = ("env", "e", "hash")
+
+    def __init__(self, env: Env, e: Expr):
+        self.env = env
+        self.e = e
+        self.hash = hash((structural_hash(env), structural_hash(e)))
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self, other):
+        return same(self.e, other.e) and same(self.env, other.env)
+
+
+def _node_bytes(d: Derivation) -> int:
+    return (
+        sys.getsizeof(d)
+        + sys.getsizeof(d.__dict__)
+        + sys.getsizeof(d.conclusion)
+        + sys.getsizeof(d.conclusion.__dict__)
+    )
+
+
+@dataclass(slots=True)
+class MemoStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    # entries held now, and their estimated size
+    entries: int = 0
+    bytes: int = 0
+
+    def __str__(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        return (
+            f"{self.hits} hits, {self.misses} misses ({rate:.1%} hit rate), "
+            f"{self.evictions} evictions; {self.entries} entries, {self.bytes} bytes"
+        )
+
+
+class InferCache:
+    """A bounded LRU cache of derivations by (environment, expression).
+
+    ``stats`` counts over the life of the cache, across ``infer`` calls.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 64 * 2**20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats = MemoStats()
+        self._entries: OrderedDict[_Key, tuple[Derivation, int]] = OrderedDict()
+        # ids of the derivations held as entries, which other entries share
+        # rather than own
+        self._held: set[int] = set()
+
+    def infer(self, env: Env, e: Expr) -> Derivation:
+        saved = evaluator._active_cache
+        evaluator._active_cache = self
+        try:
+            return evaluator.infer(env, e)
+        finally:
+            evaluator._active_cache = saved
+
+    def clear(self):
+        self._entries.clear()
+        self._held.clear()
+        self.stats.entries = self.stats.bytes = 0
+
+    def apply(
+        self,
+        env: Env,
+        e: Expr,
+        inner: Callable[[Env, Expr], Derivation],
+    ) -> Derivation:
+        if isinstance(e, _UNCACHED):
+            return inner(env, e)
+        key = _Key(env, e)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.stats.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+        self.stats.misses += 1
+        d = inner(env, e)
+        size = self._owned_bytes(d)
+        self._entries[key] = (d, size)
+        self._held.add(id(d))
+        self.stats.entries += 1
+        self.stats.bytes += size
+        while self._entries and (
+            self.stats.entries > self.max_entries or self.stats.bytes > self.max_bytes
+        ):
+            _, (old, old_size) = self._entries.popitem(last=False)
+            self._held.discard(id(old))
+            self.stats.evictions += 1
+            self.stats.entries -= 1
+            self.stats.bytes -= old_size
+        return d
+
+    def _owned_bytes(self, d: Derivation) -> int:
+        """The estimated size of the nodes of ``d`` not held by other entries."""
+        size = 0
+        stack = [d]
+        while stack:
+            d = stack.pop()
+            size += _node_bytes(d)
+            if isinstance(d, VarDerivation):
+                # its premises are built on demand and shared by the env
+                continue
+            size += sys.getsizeof(d.premises)
+            for p in d.premises:
+                if isinstance(p, str):
+                    size += sys.getsizeof(p)
+                elif id(p) not in self._held:
+                    stack.append(p)
+        return size
@@ -0,0 +1,356 @@
+"""De Bruijn compilation of expressions.
+
+``compile_expr`` resolves every ``Var`` to the ``Index`` of its binding:
+``#1`` is the innermost binder in scope, ``#2`` the next one out, and so on.
+``let``, ``let rec`` and ``fun`` then bind ``.``. A variable with no binding
+is reported before evaluation starts.
+
+``derive`` evaluates a compiled expression. Variable steps take their
+length from the index, so no names are compared at run time:
+
+* in the default named mode the derivation is the one ``infer`` builds,
+  ``E-Var1``/``E-Var2`` chains included;
+* with ``nameless=True`` it is the derivation of the nameless system. Its
+  environments are ``Frame``s, linked stacks of values, and a variable is
+  looked up with a single ``E-Var`` step.
+"""
+
+from collections.abc import Iterable, Sequence
+
+from type_project.ast import (
+    Env,
+    Error,
+    Expr,
+    FunctionApply,
+    FunctionEval,
+    FunctionValue,
+    If,
+    Index,
+    Judgement,
+    Let,
+    LetRec,
+    Lt,
+    Minus,
+    Plus,
+    RecFunctionValue,
+    Times,
+    Value,
+    Var,
+)
+from type_project.evaluator import (
+    Derivation,
+    UnboundVariableError,
+    int2,
+    var_derivation,
+)
+
+NAMELESS = "."
+
+Closure = FunctionValue | RecFunctionValue
+
+
+class Frame:
+    """A nameless environment: the values in scope, outermost first.
+
+    Like ``Env``, each frame points at the frame it was pushed onto, so
+    ``push`` is O(1) and frames share their common prefix. Each also points
+    at an ancestor further down, the jump lengths doubling as the frames
+    do, so ``lookup`` reaches any index in O(log n) steps.
+    """
+
+    __slots__ = ("_parent", "_value", "_size", "_jump", "_str")
+
+    def __init__(self, values: Iterable[Value] = ()):
+        frame = None
+        for v in values:
+            frame = (frame or _EMPTY_FRAME).push(v)
+        if frame is None:
+            self._parent, self._value, self._size, self._jump = None, None, 0, None
+            self._str = ""
+        else:
+            self._parent, self._value, self._size = (
+                frame._parent,
+                frame._value,
+                frame._size,
+            )
+            self._jump, self._str = frame._jump, frame._str
+
+    @property
+    def values(self) -> tuple[Value, ...]:
+        return tuple(self)
+
+    def __iter__(self):
+        values = []
+        frame = self
+        while frame._size:
+            values.append(frame._value)
+            frame = frame._parent
+        return reversed(values)
+
+    def __eq__(self, other):
+        if not isinstance(other, Frame):
+            return False
+        a, b = self, other
+        if a._size != b._size:
+            return False
+        while a is not b and a._size:
+            if a._value != b._value:
+                return False
+            a, b = a._parent, b._parent
+        return True
+
+    def push(self, value: Value) -> "Frame":
+        frame = Frame.__new__(Frame)
+        frame._parent, frame._value, frame._size = self, value, self._size + 1
+        # jump as far as this frame's jump and its jump's together when
+        # those two are as long as each other, else to the parent
+        jump = self._jump
+        if (
+            jump is not None
+            and jump._jump is not None
+            and self._size - jump._size == jump._size - jump._jump._size
+        ):
+            frame._jump = jump._jump
+        else:
+            frame._jump = self
+        frame._str = None
+        return frame
+
+    def lookup(self, index: int) -> Value:
+        """The value ``index`` frames down, counting this one as 1."""
+        if not 0 < index <= self._size:
+            raise IndexError(f"index #{index} out of range")
+        size = self._size - index + 1
+        frame = self
+        while frame._size > size:
+            jump = frame._jump
+            frame = jump if jump._size >= size else frame._parent
+        return frame._value
+
+    def __str__(self):
+        if self._str is None:
+            # as ``Env`` does: from the nearest frame already rendered down
+            pending = []
+            frame = self
+            while frame._str is None:
+                pending.append(frame)
+                frame = frame._parent
+            text = frame._str
+            for frame in reversed(pending):
+                text = f"{text},{frame._value}" if text else str(frame._value)
+                frame._str = text
+        return self._str
+
+    def __repr__(self):
+        return str(self)
+
+
+_EMPTY_FRAME = Frame()
+
+
+def compile_expr(e: Expr, names: Sequence[str] = ()) -> Expr:
+    """Return the nameless form of ``e`` under the binders ``names``,
+    outermost first.
+
+    Raises ``UnboundVariableError`` for a variable none of them binds.
+    """
+    scope = list(names)
+    # depths at which each name is bound, innermost last
+    depths: dict[str, list[int]] = {}
+    for depth, name in enumerate(scope):
+        depths.setdefault(name, []).append(depth)
+
+    def bind(name: str):
+        depths.setdefault(name, []).append(len(scope))
+        scope.append(name)
+
+    def unbind():
+        depths[scope.pop()].pop()
+
+    def under(name: str, e: Expr) -> Expr:
+        bind(name)
+        try:
+            return walk(e)
+        finally:
+            unbind()
+
+    def walk(e: Expr) -> Expr:
+        match e:
+            case Var(key):
+                if not depths.get(key):
+                    raise UnboundVariableError(f"unbound variable {key}")
+                return Index(len(scope) - depths[key][-1])
+            case Index(index):
+                if not 0 < index <= len(scope):
+                    raise UnboundVariableError(f"unbound index #{index}")
+                return e
+            case Plus(e1, e2):
+                return Plus(walk(e1), walk(e2))
+            case Minus(e1, e2):
+                return Minus(walk(e1), walk(e2))
+            case Times(e1, e2):
+                return Times(walk(e1), walk(e2))
+            case Lt(e1, e2):
+                return Lt(walk(e1), walk(e2))
+            case If(e1, e2, e3):
+                return If(walk(e1), walk(e2), walk(e3))
+            case Let(key, e1, e2):
+                return Let(NAMELESS, walk(e1), under(key, e2))
+            case LetRec(key, e1, e2):
+                return LetRec(NAMELESS, under(key, e1), under(key, e2))
+            case FunctionEval(arg_name, body):
+                return FunctionEval(NAMELESS, under(arg_name, body))
+            case FunctionApply(fun, arg):
+                return FunctionApply(walk(fun), walk(arg))
+        return e
+
+    return walk(e)
+
+
+def derive(env: Env, e: Expr, nameless: bool = False) -> Derivation:
+    """Compile ``e`` against ``env`` and evaluate it.
+
+    The named derivation is equal to ``infer(env, e)``; the nameless one is
+    for ``Frame(v for _, v in env) |- compile_expr(e, names)``.
+    """
+    c = compile_expr(e, [k for k, _ in env])
+    if nameless:
+        return _Evaluator(named=False).infer(Frame(v for _, v in env), c, c)
+    evaluator = _Evaluator(named=True)
+    evaluator.learn_env(env)
+    return evaluator.infer(env, e, c)
+
+
+def _compile_body(closure: Closure) -> Expr:
+    names = [k for k, _ in closure.env]
+    if isinstance(closure, RecFunctionValue):
+        names.append(closure.key)
+    names.append(closure.eval.arg_name)
+    return compile_expr(closure.eval.body, names)
+
+
+class _Evaluator:
+    """Walks an expression together with its compiled form.
+
+    In named mode judgements show the source expression ``e`` and its
+    environment; in nameless mode ``e`` is the compiled expression itself.
+    """
+
+    def __init__(self, named: bool):
+        self.named = named
+        # compiled body of the closures of each interned ``fun`` node, so
+        # there are no more entries than ``fun`` nodes. ``None`` when the
+        # node was compiled to different bodies in different scopes, as its
+        # free variables were bound at different depths
+        self.bodies: dict[FunctionEval, Expr | None] = {}
+
+    def learn(self, e: FunctionEval, body: Expr):
+        known = self.bodies.setdefault(e, body)
+        if known is not body:
+            self.bodies[e] = None
+
+    def learn_env(self, env: Env):
+        """Learn the closures of the initial environment, and those in
+        their environments, which were not compiled with the program."""
+        seen = set()
+        stack = [v for _, v in env]
+        while stack:
+            v = stack.pop()
+            if isinstance(v, (FunctionValue, RecFunctionValue)) and id(v) not in seen:
+                seen.add(id(v))
+                self.learn(v.eval, _compile_body(v))
+                stack.extend(w for _, w in v.env)
+
+    def body(self, closure: Closure) -> Expr:
+        if not self.named:
+            return closure.eval.body
+        body = self.bodies.get(closure.eval)
+        if body is None:
+            # its node compiles to different bodies in different scopes
+            body = _compile_body(closure)
+        return body
+
+    def var(self, env: Env, e: Expr, index: int) -> Derivation:
+        if not self.named:
+            return Derivation(Judgement(env, e, env.lookup(index)), "E-Var", [])
+        return var_derivation(env, e, index)
+
+    def infer(self, env: Env | Frame, e: Expr, c: Expr) -> Derivation:
+        infer = self.infer
+
+        def by(v: Value, rule: str, premises: list[Derivation | str]) -> Derivation:
+            return Derivation(Judgement(env, e, v), rule, premises)
+
+        match c:
+            case Index(index):
+                return self.var(env, e, index)
+            case Plus(c1, c2):
+                d1, d2 = infer(env, e.e1, c1), infer(env, e.e2, c2)
+                return by(*int2(lambda x, y: x + y, "plus", "Plus", d1, d2))
+            case Minus(c1, c2):
+                d1, d2 = infer(env, e.e1, c1), infer(env, e.e2, c2)
+                return by(*int2(lambda x, y: x - y, "minus", "Minus", d1, d2))
+            case Times(c1, c2):
+                d1, d2 = infer(env, e.e1, c1), infer(env, e.e2, c2)
+                return by(*int2(lambda x, y: x * y, "times", "Times", d1, d2))
+            case Lt(c1, c2):
+                d1, d2 = infer(env, e.e1, c1), infer(env, e.e2, c2)
+                return by(*int2(lambda x, y: x < y, "less than", "Lt", d1, d2))
+            case If(c1, c2, c3):
+                d1 = infer(env, e.e1, c1)
+                match d1.val():
+                    case True:
+                        d2 = infer(env, e.e2, c2)
+                        if isinstance(d2.val(), Error):
+                            return by(Error(), "E-IfTError", [d1, d2])
+                        return by(d2.val(), "E-IfT", [d1, d2])
+                    case False:
+                        d3 = infer(env, e.e3, c3)
+                        if isinstance(d3.val(), Error):
+                            return by(Error(), "E-IfFError", [d1, d3])
+                        return by(d3.val(), "E-IfF", [d1, d3])
+                    case Error():
+                        return by(Error(), "E-IfError", [d1])
+                    case int():
+                        return by(Error(), "E-IfInt", [d1])
+            case Let(_, c1, c2):
+                d1 = infer(env, e.e1, c1)
+                if self.named:
+                    inner = env.push(e.key, d1.val())
+                else:
+                    inner = env.push(d1.val())
+                d2 = infer(inner, e.e2, c2)
+                return by(d2.val(), "E-Let", [d1, d2])
+            case FunctionEval(_, body):
+                closure = FunctionValue(env=env, eval=e)
+                if self.named:
+                    self.learn(e, body)
+                return by(closure, "E-Fun", [])
+            case LetRec(_, FunctionEval(_, body), c2):
+                closure = RecFunctionValue(env, e.key, e.e1)
+                if self.named:
+                    self.learn(e.e1, body)
+                    inner = closure.rec_env()
+                else:
+                    inner = env.push(closure)
+                d1 = infer(inner, e.e2, c2)
+                return by(d1.val(), "E-LetRec", [d1])
+            case FunctionApply(c1, c2):
+                d1 = infer(env, e.func, c1)
+                d2 = infer(env, e.arg, c2)
+                closure: Closure = d1.val()
+                rec = isinstance(closure, RecFunctionValue)
+                if self.named:
+                    inner = closure.rec_env() if rec else closure.env
+                    inner = inner.push(closure.eval.arg_name, d2.val())
+                else:
+                    inner = closure.env.push(closure) if rec else closure.env
+                    inner = inner.push(d2.val())
+                d3 = infer(inner, closure.eval.body, self.body(closure))
+                rule = "E-AppRec" if rec else "E-App"
+                return by(d3.val(), rule, [d1, d2, d3])
+            case bool(x):
+                return by(x, "E-Bool", [])
+            case int(x):
+                return by(x, "E-Int", [])
+        raise Exception(env, e)
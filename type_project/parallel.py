@@ -0,0 +1,239 @@
+"""Parallel evaluation of independent premises.
+
+The two operands of ``+``, ``-``, ``*`` and ``<`` are derived independently
+of each other, and so are the function and the argument of an
+application. ``ParallelInfer`` derives the second of such a pair in a
+worker process while this process derives the first, when both are large
+enough to be worth it and a worker is idle:
+
+    with ParallelInfer(workers=4) as parallel:
+        d = parallel.infer(env, e)
+    assert pp(d) == pp(infer(env, e))
+
+Whether a subexpression is large is estimated from its syntax alone: its
+nodes, with each application counted as ``apply_weight`` nodes, since what
+it costs is the body of the function it calls. A pair is split when both
+of its estimates reach ``min_size``; everything else is derived inline.
+Splitting happens only in this process, which goes on splitting the first
+premise while workers are idle, and a worker derives its part
+sequentially.
+
+The expression and its environment are sent to the worker, and its
+derivation returned, in the format of ``binary``; the derivation is put in
+place of the premise it stands for as soon as its parent node is built.
+Derivations are the same whichever part a worker took, so the result,
+and its printed form, do not depend on the number of workers or on their
+timing. An exception raised in a worker is raised again here.
+
+``infer`` installs the parallel evaluator in the hook ``memo.InferCache``
+and ``eval_profile`` use, and passes every node on to the hook it found
+installed, if any, as ``eval_profile`` does. Under a cache a premise is
+only sent to a worker when the cache misses its parent; the premise a
+worker derives is neither cached nor profiled here, and workers run
+without either.
+"""
+
+import os
+import sys
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+
+from type_project import binary, evaluator
+from type_project.ast import Env, Expr, FunctionApply, Lt, Minus, Node, Plus, Times
+from type_project.evaluator import Derivation
+
+_INT2 = (Plus, Minus, Times, Lt)
+
+
+def _init_worker(recursion_limit: int):
+    # a forked worker inherits the parallel evaluator installed here
+    evaluator._active_cache = None
+    sys.setrecursionlimit(recursion_limit)
+
+
+def _derive(data: bytes) -> bytes:
+    env, e = binary.loads(data)
+    return binary.dumps(evaluator.infer(env, e))
+
+
+class _Pending(Derivation):
+    """A premise being derived in a worker; reading it waits for the
+    worker."""
+
+    def __init__(self, future: Future):
+        self._future = future
+        self._derivation = None
+
+    def result(self) -> Derivation:
+        if self._derivation is None:
+            self._derivation = binary.loads(self._future.result())
+        return self._derivation
+
+    @property
+    def conclusion(self):
+        return self.result().conclusion
+
+    @property
+    def rule(self) -> str:
+        return self.result().rule
+
+    @property
+    def premises(self) -> list[Derivation | str]:
+        return self.result().premises
+
+
+@dataclass(slots=True)
+class ParallelStats:
+    # premises derived in a worker, and pairs large enough to split that
+    # were derived inline as no worker was idle
+    submitted: int = 0
+    busy: int = 0
+
+
+class ParallelInfer:
+    """Derives large independent premises on a pool of ``workers``
+    processes, ``None`` for one per CPU; the pool is started on first use
+    and stopped by ``close``."""
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        min_size: int = 64,
+        apply_weight: int = 64,
+    ):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.min_size = min_size
+        self.apply_weight = apply_weight
+        self.stats = ParallelStats()
+        self._executor: ProcessPoolExecutor | None = None
+        self._in_flight: list[Future] = []
+        # the premise each pending derivation stands for, by its depth and
+        # the identity of its environment and expression: nodes are
+        # interned, so the first premise may hold the same node in the same
+        # environment deeper down
+        self._pending: dict[tuple[int, int, int], _Pending] = {}
+        self._depth = 0
+        # estimates of the expressions seen by the current ``infer``
+        self._sizes: dict[Expr, int] = {}
+        # the hook that was installed when ``infer`` started
+        self._next = None
+
+    def __enter__(self) -> "ParallelInfer":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        self._in_flight.clear()
+
+    def infer(self, env: Env, e: Expr) -> Derivation:
+        saved = evaluator._active_cache
+        self._next = saved
+        evaluator._active_cache = self
+        try:
+            return evaluator.infer(env, e)
+        finally:
+            evaluator._active_cache = saved
+            self._next = None
+            self._pending.clear()
+            self._sizes.clear()
+            self._depth = 0
+
+    def estimate(self, e: Expr) -> int:
+        """The size of ``e``, with applications weighted."""
+        sizes = self._sizes
+        stack = [e]
+        while stack:
+            top = stack[-1]
+            if top in sizes:
+                stack.pop()
+                continue
+            children = _children(top)
+            pending = [c for c in children if c not in sizes]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            size = 1 + sum(sizes[c] for c in children)
+            if isinstance(top, FunctionApply):
+                size += self.apply_weight
+            sizes[top] = size
+        return sizes[e]
+
+    def apply(
+        self,
+        env: Env,
+        e: Expr,
+        inner: Callable[[Env, Expr], Derivation],
+    ) -> Derivation:
+        depth = self._depth + 1
+        pending = self._pending.pop((depth, id(env), id(e)), None)
+        if pending is not None:
+            return pending
+
+        def derive(env: Env, e: Expr) -> Derivation:
+            second = self._split(e)
+            if second is not None:
+                # ``inner`` derives it once it has derived the first premise,
+                # and finds it here
+                future = self._pool().submit(_derive, binary.dumps((env, second)))
+                self._in_flight.append(future)
+                self._pending[(depth + 1, id(env), id(second))] = _Pending(future)
+                self.stats.submitted += 1
+            self._depth = depth
+            try:
+                d = inner(env, e)
+            finally:
+                self._depth = depth - 1
+            if second is not None:
+                d.premises = [
+                    p.result() if isinstance(p, _Pending) else p for p in d.premises
+                ]
+            return d
+
+        hook = self._next
+        if hook is not None:
+            return hook.apply(env, e, derive)
+        return derive(env, e)
+
+    def _split(self, e: Expr) -> Expr | None:
+        """The premise of ``e`` to derive in a worker, if any."""
+        if isinstance(e, _INT2):
+            first, second = e.e1, e.e2
+        elif isinstance(e, FunctionApply):
+            first, second = e.func, e.arg
+        else:
+            return None
+        if first is second:
+            return None
+        if min(self.estimate(first), self.estimate(second)) < self.min_size:
+            return None
+        if not self._idle():
+            self.stats.busy += 1
+            return None
+        return second
+
+    def _idle(self) -> bool:
+        self._in_flight = [f for f in self._in_flight if not f.done()]
+        return len(self._in_flight) < self.workers
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                self.workers,
+                initializer=_init_worker,
+                initargs=(sys.getrecursionlimit(),),
+            )
+        return self._executor
+
+
+def _children(e: Expr) -> list[Expr]:
+    if not isinstance(e, Node):
+        return []
+    children = [getattr(e, name) for name in e.__match_args__]
+    return [c for c in children if not isinstance(c, str)]
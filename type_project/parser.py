@@ -1,16 +1,4 @@
-from typing import Any, Callable, TypeVar
-from nompy import (
-    StrParser,
-    MapExceptionError,
-    StrParserResult,
-    take_while,
-    tag,
-    parser_map,
-    alt,
-    sequence,
-    many0,
-    sequence2,
-)
+from typing import Any, TypeVar
 
 from type_project.ast import (
     Expr,
@@ -31,7 +19,26 @@ from type_project.ast import (
     LetRec,
     Index,
 )
-
+from type_project.parser_core import (
+    Parser,
+    ParseResult,
+    take_while,
+    tag,
+    keyword,
+    parser_map,
+    parser_map_exception,
+    alt,
+    memo,
+    commit,
+    Packrat,
+    named,
+    rule,
+    sequence,
+    many0,
+    sequence2,
+)
+from type_project import pratt
+from type_project.lexer import KEYWORDS
 from type_project.parser_utility import (
     terminated,
     opt,
@@ -46,61 +53,49 @@ from type_project.parser_utility import (
 T = TypeVar("T")
 V = TypeVar("V")
 E = TypeVar("E")
-T1 = TypeVar("T1")
-E1 = TypeVar("E1")
-T2 = TypeVar("T2")
-E2 = TypeVar("E2")
-
-
-def parser_map_exception(
-    parser: StrParser[T1, E1], f: Callable[[T1], T2]
-) -> StrParser[T2, MapExceptionError | E1]:
-    def new_parser(s: str) -> StrParserResult[T2, MapExceptionError | E1]:
-        r = parser(s)
-        if r.return_value is None:
-            return StrParserResult(None, r.error, r.remain)
-        else:
-            try:
-                ret_val = f(r.return_value)
-            except Exception as e:
-                return StrParserResult(None, MapExceptionError(e), r.remain)
-            return StrParserResult(ret_val, None, r.remain)
-
-    return new_parser
-
-
-def parser_int() -> StrParser[int, str]:
+
+
+@rule
+def parser_int() -> Parser[int]:
     return parser_map_exception(take_while(lambda c: c in "0123456789"), int)
 
 
-def parser_bool() -> StrParser[bool, str]:
-    return parser_map(alt([tag("true"), tag("false")]), lambda x: x == "true")
+@rule
+def parser_bool() -> Parser[bool]:
+    return parser_map(alt([keyword("true"), keyword("false")]), lambda x: x == "true")
 
 
-def parser_error() -> StrParser[Error, str]:
-    return parser_map(tag("error"), lambda x: Error())
+@rule
+def parser_error() -> Parser[Error]:
+    return parser_map(keyword("error"), lambda x: Error())
 
 
-def parser_paren_expr() -> StrParser[Expr, str]:
+@rule
+def parser_paren_expr() -> Parser[Expr]:
     return parser_map_exception(
         skip_space_sequence((tag("("), parser_expr, tag(")"))), lambda x: x[1]
     )
 
 
-def parser_unary() -> StrParser[Expr, str]:
-    return alt(
-        [
-            parser_paren_expr(),
-            parser_int(),
-            parser_bool(),
-            parser_error(),
-            parser_var(),
-            parser_index(),
-        ]
+@rule
+def parser_unary() -> Parser[Expr]:
+    return memo(
+        "unary",
+        alt(
+            [
+                parser_paren_expr(),
+                parser_int(),
+                parser_bool(),
+                parser_error(),
+                parser_var(),
+                parser_index(),
+            ]
+        ),
     )
 
 
-def parser_value() -> StrParser[Value, str]:
+@rule
+def parser_value() -> Parser[Value]:
     return alt(
         [
             parser_int(),
@@ -109,11 +104,13 @@ def parser_value() -> StrParser[Value, str]:
     )
 
 
-def parser_var() -> StrParser[Expr, str]:
+@rule
+def parser_var() -> Parser[Expr]:
     return parser_map(parser_name(), Var)
 
 
-def parser_index() -> StrParser[Index, str]:
+@rule
+def parser_index() -> Parser[Index]:
     return parser_map(sequence2((tag("#"), number())), lambda x: Index(x[1]))
 
 
@@ -134,7 +131,8 @@ def assoc_left(head: Expr, tail: list[tuple[str, Expr]]) -> Any:
                 raise Exception("unreachable")
 
 
-def parser_times() -> StrParser[Times, str]:
+@rule
+def parser_times() -> Parser[Times]:
     return parser_map(
         skip_space_sequence(
             (parser_apply(), many0(skip_space_sequence((tag("*"), parser_apply()))))
@@ -143,27 +141,32 @@ def parser_times() -> StrParser[Times, str]:
     )
 
 
-def parser_apply() -> StrParser[FunctionApply | Expr, str]:
+@rule
+def parser_apply() -> Parser[FunctionApply | Expr]:
     def f(x: tuple[Expr, list[Expr]]):
         ret = x[0]
         for l in x[1]:
             ret = FunctionApply(ret, l)
         return ret
 
-    return parser_map(
-        sequence(
-            (
-                parser_unary(),
-                many0(
-                    preceded(space1(), parser_unary()),
-                ),
-            )
+    return memo(
+        "apply",
+        parser_map(
+            sequence(
+                (
+                    parser_unary(),
+                    many0(
+                        preceded(space1(), parser_unary()),
+                    ),
+                )
+            ),
+            f,
         ),
-        f,
     )
 
 
-def parser_plus_minus() -> StrParser[list[Plus | Minus], str]:
+@rule
+def parser_plus_minus() -> Parser[Plus | Minus]:
     return parser_map(
         skip_space_sequence(
             (
@@ -175,7 +178,8 @@ def parser_plus_minus() -> StrParser[list[Plus | Minus], str]:
     )
 
 
-def parser_lt() -> StrParser[Lt, str]:
+@rule
+def parser_lt() -> Parser[Lt]:
     return parser_map(
         skip_space_sequence(
             (
@@ -187,15 +191,16 @@ def parser_lt() -> StrParser[Lt, str]:
     )
 
 
-def parser_if() -> StrParser[If, str]:
+@rule
+def parser_if() -> Parser[If]:
     return parser_map(
         skip_space_sequence(
             (
-                tag("if"),
+                keyword("if"),
                 parser_expr,
-                tag("then"),
+                commit(keyword("then")),
                 parser_expr,
-                tag("else"),
+                commit(keyword("else")),
                 parser_expr,
             ),
         ),
@@ -203,25 +208,34 @@ def parser_if() -> StrParser[If, str]:
     )
 
 
-def parser_let() -> StrParser[Let, str]:
+@rule
+def parser_let() -> Parser[Let]:
     return parser_map(
         skip_space_sequence(
-            (tag("let"), parser_name(), tag("="), parser_expr, tag("in"), parser_expr)
+            (
+                keyword("let"),
+                parser_name(),
+                tag("="),
+                parser_expr,
+                commit(keyword("in")),
+                parser_expr,
+            )
         ),
         lambda x: Let(key=x[1], e1=x[3], e2=x[5]),
     )
 
 
-def parser_letrec() -> StrParser[LetRec, str]:
+@rule
+def parser_letrec() -> Parser[LetRec]:
     return parser_map(
         skip_space_sequence(
             (
-                tag("let"),
-                tag("rec"),
+                keyword("let"),
+                keyword("rec"),
                 parser_name(),
                 tag("="),
                 parser_expr,
-                tag("in"),
+                commit(keyword("in")),
                 parser_expr,
             )
         ),
@@ -229,14 +243,18 @@ def parser_letrec() -> StrParser[LetRec, str]:
     )
 
 
-def parser_fun() -> StrParser[FunctionEval, str]:
+@rule
+def parser_fun() -> Parser[FunctionEval]:
     return parser_map(
-        skip_space_sequence((tag("fun"), parser_arg_name(), tag("->"), parser_expr)),
+        skip_space_sequence(
+            (keyword("fun"), parser_arg_name(), commit(tag("->")), parser_expr)
+        ),
         lambda x: FunctionEval(x[1], x[3]),
     )
 
 
-def skip_space_sequence(parsers: tuple[StrParser[Any, Any]]) -> StrParser[Any, Any]:
+@rule
+def skip_space_sequence(parsers: tuple[Parser[Any], ...]) -> Parser[tuple]:
     ret_parsers = []
     for p in parsers:
         ret_parsers.append(p)
@@ -244,26 +262,48 @@ def skip_space_sequence(parsers: tuple[StrParser[Any, Any]]) -> StrParser[Any, A
     return parser_map(sequence(tuple(ret_parsers)), lambda x: x[::2])
 
 
-def parser_expr(s: str) -> StrParserResult[Expr, str]:
-    return alt(
-        [
-            parser_let(),
-            parser_letrec(),
-            parser_fun(),
-            parser_if(),
-            parser_lt(),
-        ]
-    )(s)
+def _parse_expr(buf: str, pos: int) -> ParseResult[Expr]:
+    return grammar().expr.parse(buf, pos)
+
+
+PARSER_BACKENDS = {
+    "combinator": _parse_expr,
+    "pratt": pratt.parse_expr,
+}
+_expr_backend = "combinator"
+
+
+def set_parser_backend(name: str) -> str:
+    """Select the backend behind ``parser_expr``; returns the previous one."""
+    global _expr_backend
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"unknown parser backend {name!r}")
+    previous, _expr_backend = _expr_backend, name
+    return previous
 
 
-def parser_bind() -> StrParser[tuple[str, Value]]:
+def _parse_expr_with_backend(buf: str, pos: int) -> ParseResult[Expr]:
+    return PARSER_BACKENDS[_expr_backend](buf, pos)
+
+
+parser_expr: Parser[Expr] = memo("expr", Parser(_parse_expr_with_backend))
+
+
+def parser_expr_packrat(max_entries: int = 4096) -> Packrat[Expr]:
+    """``parser_expr`` with packrat memoization; see ``Packrat.stats``."""
+    return Packrat(parser_expr, max_entries)
+
+
+@rule
+def parser_bind() -> Parser[tuple[str, Value]]:
     return parser_map(
         skip_space_sequence((parser_name(), tag("="), parser_value())),
         lambda x: (x[0], x[2]),
     )
 
 
-def parser_arg_name() -> StrParser[str, str]:
+@rule
+def parser_arg_name() -> Parser[str]:
     return alt(
         (
             parser_name(),
@@ -272,18 +312,22 @@ def parser_arg_name() -> StrParser[str, str]:
     )
 
 
-def parser_name() -> StrParser[str, str]:
+@rule
+def parser_name() -> Parser[str]:
+    # the names of ``lexer.tokenize``: a word that is not a keyword and does
+    # not start with a digit, as that starts an integer
     def is_not_keyword(s):
-        if s in {"let", "if", "then", "else", "in", "evalto"}:
+        if s in KEYWORDS:
             raise ValueError
-        if s == "":
+        if s == "" or s[0] in "0123456789":
             raise ValueError
         return s
 
-    return parser_map_exception(take_while(str.isalnum), is_not_keyword)
+    return memo("name", parser_map_exception(take_while(str.isalnum), is_not_keyword))
 
 
-def parser_environment() -> StrParser[Env, str]:
+@rule
+def parser_environment() -> Parser[Env]:
     def create_env(x):
         if x is None:
             return Env([])
@@ -310,7 +354,12 @@ def parser_environment() -> StrParser[Env, str]:
     )
 
 
-def parser_judge() -> StrParser[Judgement]:
+@rule
+def parser_judge(result: Parser[Any] | None = None) -> Parser[Judgement]:
+    """Builds the judgement rule; parse with ``grammar().judge``, which is
+    built once. ``result`` reads the right-hand side of ``evalto``, a value
+    by default."""
+
     def f(x):
         return Judgement(x[0], x[2], x[4])
 
@@ -320,14 +369,51 @@ def parser_judge() -> StrParser[Judgement]:
                 parser_environment(),
                 tag("|-"),
                 parser_expr,
-                tag("evalto"),
-                parser_value(),
+                keyword("evalto"),
+                result or parser_value(),
             )
         ),
         f,
     )
 
 
+class Grammar:
+    """Every rule of the grammar, built once.
+
+    Rules re-enter the grammar through ``parser_expr`` rather than by calling
+    each other's builders, so one instance allocates each combinator once and
+    parses reuse it. ``alt`` points dispatch on the FIRST set of their
+    alternatives, so ``let``, ``fun`` and ``if`` are only tried when the
+    input can start with them.
+    """
+
+    def __init__(self):
+        self.expr = named(
+            "parser_expr",
+            alt(
+                [
+                    parser_let(),
+                    parser_letrec(),
+                    parser_fun(),
+                    parser_if(),
+                    parser_lt(),
+                ]
+            ),
+        )
+        self.environment = parser_environment()
+        self.judge = parser_judge()
+
+
+_grammar: Grammar | None = None
+
+
+def grammar() -> Grammar:
+    global _grammar
+    if _grammar is None:
+        _grammar = Grammar()
+    return _grammar
+
+
 if __name__ == "__main__":
     print(parser_expr("1+2"))
     print(parser_expr("if true then 1 else 2"))
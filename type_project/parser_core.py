@@ -0,0 +1,341 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Callable, Generic, TypeVar
+
+from nompy import MapExceptionError, StrParserResult
+
+T = TypeVar("T")
+T1 = TypeVar("T1")
+T2 = TypeVar("T2")
+
+
+@dataclass(slots=True)
+class ParseResult(Generic[T]):
+    value: T | None
+    error: Any
+    pos: int
+
+
+@dataclass(slots=True, frozen=True)
+class Expected:
+    what: str
+    pos: int
+
+    def __str__(self):
+        return f"expected {self.what} at offset {self.pos}"
+
+
+class Parser(Generic[T]):
+    """A parser over a shared input buffer.
+
+    ``parse(buf, pos)`` reads ``buf`` starting at ``pos`` and returns the
+    offset it stopped at, so no combinator ever copies the rest of the input.
+    Calling a parser with a plain string keeps the nompy ``StrParserResult``
+    interface; the remainder is sliced once, at the very end.
+
+    ``first`` is the set of characters a successful parse can start with,
+    or ``None`` when that is unknown (for example when it may match empty).
+    ``alt`` uses it to skip alternatives that cannot match.
+    """
+
+    __slots__ = ("parse", "first")
+
+    def __init__(
+        self,
+        parse: Callable[[str, int], ParseResult[T]],
+        first: frozenset[str] | None = None,
+    ):
+        self.parse = parse
+        self.first = first
+
+    def __call__(self, s: str) -> StrParserResult[T, Any]:
+        r = self.parse(s, 0)
+        return StrParserResult(r.value, r.error, s[r.pos :])
+
+
+def tag(t: str) -> Parser[str]:
+    n = len(t)
+
+    def parse(buf: str, pos: int) -> ParseResult[str]:
+        if buf.startswith(t, pos):
+            return ParseResult(t, None, pos + n)
+        return ParseResult(None, Expected(repr(t), pos), pos)
+
+    return Parser(parse, frozenset(t[:1]) or None)
+
+
+def keyword(word: str) -> Parser[str]:
+    """``tag(word)``, but only as a whole word: ``iffy`` does not start
+    with ``if``. Words are runs of ``str.isalnum`` characters, as in
+    ``lexer.tokenize``."""
+    n = len(word)
+
+    def parse(buf: str, pos: int) -> ParseResult[str]:
+        end = pos + n
+        if buf.startswith(word, pos) and not buf[end : end + 1].isalnum():
+            return ParseResult(word, None, end)
+        return ParseResult(None, Expected(repr(word), pos), pos)
+
+    return Parser(parse, frozenset(word[:1]))
+
+
+def take_while(pred: Callable[[str], bool]) -> Parser[str]:
+    def parse(buf: str, pos: int) -> ParseResult[str]:
+        end = pos
+        n = len(buf)
+        while end < n and pred(buf[end]):
+            end += 1
+        return ParseResult(buf[pos:end], None, end)
+
+    return Parser(parse)
+
+
+def parser_map(parser: Parser[T1], f: Callable[[T1], T2]) -> Parser[T2]:
+    inner = parser.parse
+
+    def parse(buf: str, pos: int) -> ParseResult[T2]:
+        r = inner(buf, pos)
+        if r.error is not None:
+            return r
+        return ParseResult(f(r.value), None, r.pos)
+
+    return Parser(parse, parser.first)
+
+
+def parser_map_exception(parser: Parser[T1], f: Callable[[T1], T2]) -> Parser[T2]:
+    inner = parser.parse
+
+    def parse(buf: str, pos: int) -> ParseResult[T2]:
+        r = inner(buf, pos)
+        if r.error is not None:
+            return r
+        try:
+            ret_val = f(r.value)
+        except Exception as e:
+            return ParseResult(None, MapExceptionError(e), r.pos)
+        return ParseResult(ret_val, None, r.pos)
+
+    return Parser(parse, parser.first)
+
+
+def alt(parsers: tuple[Parser[Any], ...] | list[Parser[Any]]) -> Parser[Any]:
+    """Try ``parsers`` in order and return the first success.
+
+    Alternatives whose FIRST set excludes the next character are skipped:
+    the candidates for each character are computed once, up front.
+    """
+    known = [p.first for p in parsers if p.first is not None]
+    if not known:
+        inners = tuple(p.parse for p in parsers)
+
+        def parse(buf: str, pos: int) -> ParseResult[Any]:
+            r = None
+            for inner in inners:
+                r = inner(buf, pos)
+                if r.error is None:
+                    return r
+            return ParseResult(None, r.error, pos)
+
+        return Parser(parse)
+
+    chars = frozenset().union(*known)
+    table = {
+        c: tuple(p.parse for p in parsers if p.first is None or c in p.first)
+        for c in chars
+    }
+    default = tuple(p.parse for p in parsers if p.first is None)
+    first = chars if len(known) == len(parsers) else None
+
+    def parse(buf: str, pos: int) -> ParseResult[Any]:
+        inners = table.get(buf[pos : pos + 1], default)
+        r = None
+        for inner in inners:
+            r = inner(buf, pos)
+            if r.error is None:
+                return r
+        if r is None:
+            return ParseResult(None, Expected(f"one of {sorted(chars)}", pos), pos)
+        return ParseResult(None, r.error, pos)
+
+    return Parser(parse, first)
+
+
+def sequence(parsers: tuple[Parser[Any], ...]) -> Parser[tuple]:
+    inners = tuple(p.parse for p in parsers)
+
+    def parse(buf: str, pos: int) -> ParseResult[tuple]:
+        values = []
+        cur = pos
+        for inner in inners:
+            r = inner(buf, cur)
+            if r.error is not None:
+                return ParseResult(None, r.error, pos)
+            values.append(r.value)
+            cur = r.pos
+        return ParseResult(tuple(values), None, cur)
+
+    return Parser(parse, parsers[0].first if parsers else None)
+
+
+def sequence2(parsers: tuple[Parser[Any], Parser[Any]]) -> Parser[tuple]:
+    return sequence(parsers)
+
+
+def many0(parser: Parser[T]) -> Parser[list[T]]:
+    inner = parser.parse
+
+    def parse(buf: str, pos: int) -> ParseResult[list[T]]:
+        values = []
+        while True:
+            r = inner(buf, pos)
+            if r.error is not None or r.pos == pos:
+                return ParseResult(values, None, pos)
+            values.append(r.value)
+            pos = r.pos
+
+    return Parser(parse)
+
+
+@dataclass(slots=True)
+class PackratStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    peak_entries: int = 0
+
+
+class _MemoTable:
+    __slots__ = ("buckets", "size", "floor", "max_entries", "stats")
+
+    def __init__(self, max_entries: int, stats: PackratStats):
+        self.buckets: dict[int, dict[str, ParseResult]] = {}
+        self.size = 0
+        self.floor = 0
+        self.max_entries = max_entries
+        self.stats = stats
+
+    def apply(self, name: str, inner, buf: str, pos: int) -> ParseResult:
+        bucket = self.buckets.get(pos)
+        if bucket is not None:
+            r = bucket.get(name)
+            if r is not None:
+                self.stats.hits += 1
+                return r
+        self.stats.misses += 1
+        r = inner(buf, pos)
+        if pos >= self.floor:
+            bucket = self.buckets.get(pos)
+            if bucket is None:
+                bucket = self.buckets[pos] = {}
+            bucket[name] = r
+            self.size += 1
+            if self.size > self.stats.peak_entries:
+                self.stats.peak_entries = self.size
+            if self.size > self.max_entries:
+                # drop the older half of the offsets at once so the cost of
+                # sorting is amortized over the entries it frees
+                offsets = sorted(self.buckets)
+                self.drop_below(offsets[len(offsets) // 2] + 1)
+        return r
+
+    def drop_below(self, pos: int):
+        for off in [off for off in self.buckets if off < pos]:
+            n = len(self.buckets.pop(off))
+            self.size -= n
+            self.stats.evictions += n
+
+    def commit(self, pos: int):
+        if pos > self.floor:
+            self.floor = pos
+            self.drop_below(pos)
+
+
+_active_table: _MemoTable | None = None
+
+
+def memo(name: str, parser: Parser[T]) -> Parser[T]:
+    """Memoize ``parser`` by (``name``, offset) while a ``Packrat`` parse runs.
+
+    Outside of a packrat parse the wrapped parser is called directly.
+    """
+    inner = parser.parse
+
+    def parse(buf: str, pos: int) -> ParseResult[T]:
+        table = _active_table
+        if table is None:
+            return inner(buf, pos)
+        return table.apply(name, inner, buf, pos)
+
+    return Parser(parse, parser.first)
+
+
+def commit(parser: Parser[T]) -> Parser[T]:
+    """Mark the end of ``parser`` as a commit point.
+
+    Once it succeeds the grammar does not backtrack before that offset in
+    practice, so memo entries behind it are dropped.  Dropping is always
+    safe: at worst a rule is parsed again.
+    """
+    inner = parser.parse
+
+    def parse(buf: str, pos: int) -> ParseResult[T]:
+        r = inner(buf, pos)
+        table = _active_table
+        if table is not None and r.error is None:
+            table.commit(r.pos)
+        return r
+
+    return Parser(parse, parser.first)
+
+
+class Packrat(Parser[T]):
+    """Run ``parser`` with a fresh memo table for each parse.
+
+    ``stats`` holds the hit and miss counts of the most recent parse.
+    """
+
+    __slots__ = ("stats",)
+
+    def __init__(self, parser: Parser[T], max_entries: int = 4096):
+        inner = parser.parse
+
+        def parse(buf: str, pos: int) -> ParseResult[T]:
+            global _active_table
+            self.stats = PackratStats()
+            saved = _active_table
+            _active_table = _MemoTable(max_entries, self.stats)
+            try:
+                return inner(buf, pos)
+            finally:
+                _active_table = saved
+
+        super().__init__(parse, parser.first)
+        self.stats = PackratStats()
+
+
+# installed by ``parser_profile`` while a profile is recorded
+_rule_hook: Callable[[str, Parser[Any]], Parser[Any]] | None = None
+
+
+def named(name: str, parser: Parser[T]) -> Parser[T]:
+    """Give ``parser`` a rule name for instrumentation.
+
+    Without a rule hook installed when it is built, ``parser`` is returned
+    as is, so naming rules costs nothing at parse time.
+    """
+    if _rule_hook is None:
+        return parser
+    return _rule_hook(name, parser)
+
+
+def rule(builder: Callable[..., Parser[T]]) -> Callable[..., Parser[T]]:
+    """Name the parsers ``builder`` returns after the builder itself."""
+    name = builder.__name__
+
+    @wraps(builder)
+    def build(*args, **kwargs) -> Parser[T]:
+        return named(name, builder(*args, **kwargs))
+
+    return build
@@ -1,47 +1,52 @@
 from typing import Any
 
-from nompy import (
-    StrParser,
+from type_project.parser_core import (
+    Parser,
+    ParseResult,
     parser_map,
     sequence2,
-    StrParserResult,
     take_while,
     sequence,
     parser_map_exception,
+    rule,
 )
 
 
-def terminated(first: StrParser, second: StrParser) -> StrParser:
+def terminated(first: Parser, second: Parser) -> Parser:
     return parser_map(sequence2((first, second)), lambda x: x[0])
 
 
-def preceded(first: StrParser, second: StrParser) -> StrParser:
+def preceded(first: Parser, second: Parser) -> Parser:
     return parser_map(sequence2((first, second)), lambda x: x[1])
 
 
-def delimited(first: StrParser, second: StrParser, third: StrParser) -> StrParser:
+def delimited(first: Parser, second: Parser, third: Parser) -> Parser:
     return parser_map(sequence((first, second, third)), lambda x: x[1])
 
 
-def wraped(target: StrParser, wrap: StrParser) -> StrParser:
+def wraped(target: Parser, wrap: Parser) -> Parser:
     return delimited(wrap, target, wrap)
 
 
-def opt[V, E](parser: StrParser[V, E]) -> StrParser[V, E]:
-    def new_parser(s: str) -> StrParserResult:
-        res = parser(s)
+def opt[V](parser: Parser[V]) -> Parser[V]:
+    inner = parser.parse
+
+    def parse(buf: str, pos: int) -> ParseResult:
+        res = inner(buf, pos)
         if res.error is not None:
-            return StrParserResult(return_value=None, error=None, remain=s)
+            return ParseResult(None, None, pos)
         return res
 
-    return new_parser
+    return Parser(parse)
 
 
-def space0() -> StrParser:
+@rule
+def space0() -> Parser:
     return take_while(lambda c: c in " \t\n")
 
 
-def space1() -> StrParser:
+@rule
+def space1() -> Parser:
     def f(x: str):
         if len(x) == 0:
             raise ValueError
@@ -50,7 +55,8 @@ def space1() -> StrParser:
     return parser_map_exception(take_while(lambda c: c in " \t\n"), f)
 
 
-def number() -> StrParser[int, Any]:
+@rule
+def number() -> Parser[int]:
     def f(x: str):
         return int(x)
 
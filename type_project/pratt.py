@@ -0,0 +1,329 @@
+"""Expression parser backend built on ``lexer.tokenize``.
+
+Binary operators and application are parsed by precedence climbing, and
+``let``/``if``/``fun``/parentheses are driven by an explicit frame stack,
+so nesting depth is bounded by memory rather than by Python's recursion
+limit. The result is the same ``ast.py`` tree the combinator grammar in
+``parser.py`` builds; select it with ``parser.set_parser_backend("pratt")``.
+``parse_expr_with_spans`` also returns the source ``Span`` tree of the
+result, which incremental re-parsing builds on.
+"""
+
+from type_project.ast import (
+    Error,
+    Expr,
+    FunctionApply,
+    FunctionEval,
+    If,
+    Index,
+    Let,
+    LetRec,
+    Lt,
+    Minus,
+    Plus,
+    Span,
+    Times,
+    Var,
+)
+from type_project.lexer import Token, tokenize
+from type_project.parser_core import Expected, ParseResult
+
+APPLY = "apply"
+
+# binding power of each infix operator; all of them associate to the left
+PRECEDENCE = {"<": 1, "+": 2, "-": 2, "*": 3, APPLY: 4}
+
+NODES = {
+    "<": Lt,
+    "+": Plus,
+    "-": Minus,
+    "*": Times,
+    APPLY: FunctionApply,
+}
+
+OPERAND_KINDS = {"int", "bool", "error", "name", "index", "("}
+
+# ``parser_name`` accepts any non-keyword word, literals included
+BINDER_KINDS = {"name", "bool", "error"}
+
+
+def _operand(token: Token) -> Expr:
+    match token.kind:
+        case "int" | "bool":
+            return token.value
+        case "error":
+            return Error()
+        case "name":
+            return Var(token.value)
+        case "index":
+            return Index(token.value)
+
+
+def _text(buf: str, token: Token) -> str:
+    return buf[token.start : token.end]
+
+
+def _join(start: int, end: int, children: tuple[Span, ...], paren=False) -> Span:
+    # children are built with absolute offsets and only made relative once
+    # their parent exists; nothing else holds them yet, so update in place
+    for child in children:
+        child.offset -= start
+    return Span(start, end - start, children, paren)
+
+
+class _Infix:
+    """Operand and operator stacks of one ``lt``-level expression."""
+
+    __slots__ = ("values", "trees", "ops", "backtrack")
+
+    def __init__(self, spans: bool):
+        self.values: list[Expr] = []
+        self.trees: list[Span] | None = [] if spans else None
+        self.ops: list[str] = []
+        # token index to rewind to if the pending right operand fails
+        self.backtrack: int | None = None
+
+    def push_op(self, op: str):
+        prec = PRECEDENCE[op]
+        while self.ops and PRECEDENCE[self.ops[-1]] >= prec:
+            self.reduce()
+        self.ops.append(op)
+
+    def reduce(self):
+        op = self.ops.pop()
+        e2 = self.values.pop()
+        e1 = self.values.pop()
+        self.values.append(NODES[op](e1, e2))
+        if self.trees is not None:
+            t2 = self.trees.pop()
+            t1 = self.trees.pop()
+            self.trees.append(_join(t1.offset, t2.offset + t2.length, (t1, t2)))
+
+    def finish(self) -> tuple[Expr, Span | None]:
+        while self.ops:
+            self.reduce()
+        return self.values[0], self.trees[0] if self.trees is not None else None
+
+
+class _Let:
+    __slots__ = ("rec", "key", "start", "e1", "t1")
+
+    def __init__(self, rec: bool, key: str, start: int):
+        self.rec = rec
+        self.key = key
+        self.start = start
+        self.e1 = None
+        self.t1 = None
+
+
+class _If:
+    __slots__ = ("start", "es", "trees")
+
+    def __init__(self, start: int):
+        self.start = start
+        self.es: list[Expr] = []
+        self.trees: list[Span | None] = []
+
+
+class _Fun:
+    __slots__ = ("arg_name", "start")
+
+    def __init__(self, arg_name: str, start: int):
+        self.arg_name = arg_name
+        self.start = start
+
+
+class _Paren:
+    __slots__ = ("start",)
+
+    def __init__(self, start: int):
+        self.start = start
+
+
+def parse_expr(buf: str, pos: int) -> ParseResult[Expr]:
+    return _parse(buf, pos, False)[0]
+
+
+def parse_expr_with_spans(
+    buf: str, pos: int, endpos: int | None = None
+) -> tuple[ParseResult[Expr], Span | None]:
+    """Like ``parse_expr``, also returning the span tree of the result.
+
+    Only ``buf[pos:endpos]`` is read. The root span's offset is absolute.
+    """
+    return _parse(buf, pos, True, endpos)
+
+
+def _parse(
+    buf: str, pos: int, spans: bool, endpos: int | None = None
+) -> tuple[ParseResult[Expr], Span | None]:
+    tokens = tokenize(buf, pos, endpos)
+    if tokens[0].spaced:
+        # like the combinator grammar, whose callers skip the space before it
+        return ParseResult(None, Expected("an expression", pos), pos), None
+    stack: list = []
+    i = 0
+
+    def leaf(token: Token) -> Span | None:
+        return Span(token.start, token.end - token.start) if spans else None
+
+    def backtrack() -> tuple[int, Expr, Span | None] | None:
+        # unwind to the innermost choice point the combinator grammar would
+        # fall back to: an infix expression giving up on its pending right
+        # operand (``many0``), or a failed ``fun`` read as the variable ``fun``
+        while stack:
+            frame = stack.pop()
+            if isinstance(frame, _Infix) and frame.backtrack is not None:
+                frame.ops.pop()
+                return frame.backtrack, *frame.finish()
+            if isinstance(frame, _Fun):
+                stack.append(_Infix(spans))
+                return frame.start + 1, Var("fun"), leaf(tokens[frame.start])
+        return None
+
+    # the loop alternates between starting an expression at token ``i`` and
+    # handing a finished ``value`` (and its ``tree``) to the frame on top of
+    # the stack
+    value = None
+    tree = None
+    start = True
+    # a parenthesized operand swallows the whitespace after ``)`` in the
+    # combinator grammar, so it can never be followed by an argument
+    closed_paren = False
+    while True:
+        expected = None
+        if start:
+            token = tokens[i]
+            kind = token.kind
+            if kind == "let":
+                if (
+                    tokens[i + 1].kind == "name"
+                    and tokens[i + 1].value == "rec"
+                    and tokens[i + 2].kind in BINDER_KINDS
+                    and tokens[i + 3].kind == "="
+                ):
+                    stack.append(_Let(True, _text(buf, tokens[i + 2]), token.start))
+                    i += 4
+                    continue
+                if tokens[i + 1].kind in BINDER_KINDS and tokens[i + 2].kind == "=":
+                    stack.append(_Let(False, _text(buf, tokens[i + 1]), token.start))
+                    i += 3
+                    continue
+            if kind == "if":
+                stack.append(_If(token.start))
+                i += 1
+                continue
+            if (
+                kind == "name"
+                and token.value == "fun"
+                and (tokens[i + 1].kind in BINDER_KINDS or tokens[i + 1].kind == ".")
+                and tokens[i + 2].kind == "->"
+            ):
+                stack.append(_Fun(_text(buf, tokens[i + 1]), i))
+                i += 3
+                continue
+            stack.append(_Infix(spans))
+            if kind == "(":
+                stack.append(_Paren(token.start))
+                i += 1
+                continue
+            if kind in OPERAND_KINDS:
+                value = _operand(token)
+                tree = leaf(token)
+                closed_paren = False
+                i += 1
+                start = False
+                continue
+            expected = "an expression"
+
+        elif stack:
+            frame = stack[-1]
+            if isinstance(frame, _Infix):
+                frame.values.append(value)
+                if spans:
+                    frame.trees.append(tree)
+                frame.backtrack = None
+                token = tokens[i]
+                if token.kind in ("<", "+", "-", "*"):
+                    frame.push_op(token.kind)
+                    frame.backtrack = i
+                    i += 1
+                elif token.kind in OPERAND_KINDS and token.spaced and not closed_paren:
+                    frame.push_op(APPLY)
+                    frame.backtrack = i
+                else:
+                    stack.pop()
+                    value, tree = frame.finish()
+                    continue
+                token = tokens[i]
+                if token.kind == "(":
+                    stack.append(_Paren(token.start))
+                    i += 1
+                    start = True
+                    continue
+                if token.kind in OPERAND_KINDS:
+                    value = _operand(token)
+                    tree = leaf(token)
+                    closed_paren = False
+                    i += 1
+                    continue
+                expected = "an operand"
+            elif isinstance(frame, _Paren):
+                if tokens[i].kind == ")":
+                    stack.pop()
+                    if spans:
+                        tree = _join(frame.start, tokens[i].end, (tree,), paren=True)
+                    closed_paren = True
+                    i += 1
+                    continue
+                expected = "')'"
+            elif isinstance(frame, _Let):
+                if frame.e1 is None:
+                    if tokens[i].kind == "in":
+                        frame.e1 = value
+                        frame.t1 = tree
+                        i += 1
+                        start = True
+                        continue
+                    expected = "'in'"
+                else:
+                    stack.pop()
+                    node = LetRec if frame.rec else Let
+                    if spans:
+                        end = tree.offset + tree.length
+                        tree = _join(frame.start, end, (frame.t1, tree))
+                    value = node(frame.key, frame.e1, value)
+                    continue
+            elif isinstance(frame, _If):
+                frame.es.append(value)
+                frame.trees.append(tree)
+                if len(frame.es) == 3:
+                    stack.pop()
+                    if spans:
+                        end = tree.offset + tree.length
+                        tree = _join(frame.start, end, tuple(frame.trees))
+                    value = If(*frame.es)
+                    continue
+                keyword = "then" if len(frame.es) == 1 else "else"
+                if tokens[i].kind == keyword:
+                    i += 1
+                    start = True
+                    continue
+                expected = repr(keyword)
+            else:
+                stack.pop()
+                if spans:
+                    end = tree.offset + tree.length
+                    tree = _join(tokens[frame.start].start, end, (tree,))
+                value = FunctionEval(frame.arg_name, value)
+                continue
+
+        else:
+            return ParseResult(value, None, tokens[i].start), tree
+
+        resumed = backtrack()
+        if resumed is None:
+            return ParseResult(None, Expected(expected, tokens[i].start), pos), None
+        i, value, tree = resumed
+        start = False
+        closed_paren = False
@@ -0,0 +1,92 @@
+"""Streaming output of derivations.
+
+``write_derivation`` writes the text of ``evaluator.pp`` to a stream as it
+walks the derivation, with an explicit stack instead of recursion. Memory
+use depends on the depth of the derivation and the buffer size, not on
+the size of the output. Booleans are written the way the rules spell
+them, ``true`` and ``false``.
+"""
+
+import io
+from typing import BinaryIO, TextIO
+
+from type_project.evaluator import Derivation
+
+DEFAULT_BUFFER_SIZE = io.DEFAULT_BUFFER_SIZE
+
+
+def _is_binary(stream: TextIO | BinaryIO) -> bool:
+    if isinstance(stream, io.TextIOBase):
+        return False
+    if isinstance(stream, (io.RawIOBase, io.BufferedIOBase)):
+        return True
+    return "b" in getattr(stream, "mode", "")
+
+
+def write_derivation(
+    d: Derivation | str,
+    stream: TextIO | BinaryIO,
+    buffer_size: int = DEFAULT_BUFFER_SIZE,
+    lower_bools: bool = True,
+    encoding: str = "utf-8",
+    max_depth: int | None = None,
+):
+    """Write ``pp(d)`` to ``stream``, text or binary.
+
+    Output is collected into chunks of about ``buffer_size`` characters
+    before each write; ``0`` writes every piece as soon as it is formatted.
+    With ``lower_bools``, ``True`` and ``False`` are written as ``true``
+    and ``false``, as ``pp(d).replace(...)`` used to do. ``max_depth``
+    elides premises below that many levels like ``pp`` does.
+    """
+    binary = _is_binary(stream)
+    chunks: list[str] = []
+    buffered = 0
+
+    def emit(s: str):
+        nonlocal buffered
+        chunks.append(s)
+        buffered += len(s)
+        if buffered >= buffer_size:
+            flush()
+
+    def flush():
+        nonlocal buffered
+        if chunks:
+            text = "".join(chunks)
+            stream.write(text.encode(encoding) if binary else text)
+            chunks.clear()
+            buffered = 0
+
+    def fix(s: str) -> str:
+        if lower_bools:
+            return s.replace("True", "true").replace("False", "false")
+        return s
+
+    # a work item is text to write as is, or a derivation and its depth
+    stack: list[str | tuple[Derivation | str, int]] = [(d, 0)]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            emit(item)
+            continue
+        d, depth = item
+        indent = "  " * depth
+        if isinstance(d, str):
+            emit(indent + fix(d) + ";")
+            continue
+        head = fix(f"{indent}{d.conclusion} by {d.rule}")
+        premises = d.premises
+        if not premises:
+            emit(head + "{};")
+            continue
+        if max_depth is not None and depth >= max_depth:
+            emit(head + " {...};")
+            continue
+        emit(head + " {\n")
+        stack.append("\n" + indent + "};")
+        for i in range(len(premises) - 1, -1, -1):
+            stack.append((premises[i], depth + 1))
+            if i:
+                stack.append("\n")
+    flush()
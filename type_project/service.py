@@ -0,0 +1,280 @@
+"""A long-running derivation service on a local socket.
+
+Starting the interpreter and importing the parser costs far more than
+checking a judgement, so a front end that checks one judgement per
+process pays that cost every time. The service pays it once: it listens
+on a TCP port or a Unix socket and keeps a process pool warm.
+
+    python main.py serve [--port 7413 | --unix PATH] [--workers N]
+
+The protocol is JSON lines. Each request is one line, and each response
+one line carrying the request's ``id``, written as soon as it is ready,
+so responses to pipelined requests may come back out of order::
+
+    {"id": 1, "op": "pp", "judgement": "|- 1 + 2 evalto 3"}
+    {"id": 1, "status": "ok", "value": "3", "derivation": "|- (1 + 2) ..."}
+
+``op`` is one of
+
+- ``judge``: parse the judgement, answering with ``judgement``, the
+  judgement as it is printed;
+- ``infer``: derive it and compare the claimed value, answering with
+  ``status``, ``value`` and ``message`` as ``batch.check`` finds them;
+- ``pp``: the same, and the printed derivation as ``derivation``;
+- ``stats``: the counters of the service.
+
+A request the service cannot answer gets ``error`` instead: a line that
+is not a request, an unknown ``op``, or a timeout.
+
+Identical requests in flight at the same time are coalesced: they wait
+for one job. At most ``max_pending`` jobs wait for or run on the pool;
+once they are all taken, requests wait for a free slot. A connection has
+at most ``max_in_flight`` requests being answered, and the next line is
+not read until one of them is, so a client that sends faster than the
+service answers is held back by the socket. A request not answered
+within ``timeout`` seconds gets an error; its job is dropped if it has
+not started and no other request waits for it, but a job already running
+in a worker runs to the end.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+
+from type_project.batch import check, parse_judgement, show
+from type_project.parser import grammar
+
+OPS = ("judge", "infer", "pp")
+
+
+def _work(op: str, text: str) -> dict:
+    """Answer a request; runs in a worker."""
+    if op == "judge":
+        try:
+            j = parse_judgement(text)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        return {"status": "ok", "judgement": show(j)}
+    result = check(0, text, derivation=op == "pp")
+    return {k: v for k, v in asdict(result).items() if k != "line" and v is not None}
+
+
+def _warm():
+    # build the grammar before the first request needs it
+    grammar()
+
+
+@dataclass
+class ServiceStats:
+    requests: int = 0
+    # jobs run on the pool, and requests answered by a job already in flight
+    jobs: int = 0
+    coalesced: int = 0
+    timeouts: int = 0
+    errors: int = 0
+
+
+class _Job:
+    __slots__ = ("task", "waiters", "started")
+
+    def __init__(self):
+        self.task: asyncio.Task | None = None
+        self.waiters = 0
+        self.started = False
+
+
+class DerivationService:
+    """Answers requests on a pool of ``workers`` processes.
+
+    ``workers=None`` starts one per CPU; ``0`` answers in a thread of this
+    process, without a pool.
+    """
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        timeout: float = 30.0,
+        max_pending: int = 256,
+        max_in_flight: int = 32,
+    ):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.stats = ServiceStats()
+        self._executor: Executor | None = None
+        self._slots = asyncio.Semaphore(max_pending)
+        self._jobs: dict[tuple[str, str], _Job] = {}
+
+    async def start(self):
+        """Start the pool, and wait until every worker has built the grammar."""
+        if self.workers:
+            self._executor = ProcessPoolExecutor(self.workers, initializer=_warm)
+        else:
+            self._executor = ThreadPoolExecutor(1, initializer=_warm)
+        loop = asyncio.get_running_loop()
+        warming = [
+            loop.run_in_executor(self._executor, _warm)
+            for _ in range(max(self.workers, 1))
+        ]
+        await asyncio.gather(*warming)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    async def answer(self, request: dict) -> dict:
+        """The response to ``request``, without its ``id``."""
+        self.stats.requests += 1
+        op, text = request.get("op"), request.get("judgement")
+        if op == "stats":
+            return asdict(self.stats) | {"in_flight": len(self._jobs)}
+        if op not in OPS:
+            self.stats.errors += 1
+            return {"error": f"unknown op {op!r}"}
+        if not isinstance(text, str):
+            self.stats.errors += 1
+            return {"error": "'judgement' must be a string"}
+        try:
+            return await asyncio.wait_for(self._submit(op, text), self.timeout)
+        except TimeoutError:
+            self.stats.timeouts += 1
+            return {"error": f"timed out after {self.timeout}s"}
+        except Exception as e:
+            # the worker itself failed, e.g. it was killed
+            self.stats.errors += 1
+            return {"error": f"{type(e).__name__}: {e}"}
+
+    async def _submit(self, op: str, text: str) -> dict:
+        key = (op, text)
+        job = self._jobs.get(key)
+        if job is None:
+            job = self._jobs[key] = _Job()
+            job.task = asyncio.create_task(self._run(key, job))
+        else:
+            self.stats.coalesced += 1
+        job.waiters += 1
+        try:
+            return await asyncio.shield(job.task)
+        finally:
+            job.waiters -= 1
+            if not job.waiters and not job.started:
+                # everyone waiting for it gave up before it got a slot
+                job.task.cancel()
+                if self._jobs.get(key) is job:
+                    del self._jobs[key]
+
+    async def _run(self, key: tuple[str, str], job: _Job) -> dict:
+        try:
+            async with self._slots:
+                job.started = True
+                self.stats.jobs += 1
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, _work, *key)
+        finally:
+            if self._jobs.get(key) is job:
+                del self._jobs[key]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answer the requests of one connection until it closes."""
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+
+        async def respond(line: bytes):
+            try:
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("a request must be an object")
+                except ValueError as e:
+                    self.stats.errors += 1
+                    request, response = {}, {"error": f"bad request: {e}"}
+                else:
+                    response = await self.answer(request)
+                writer.write(
+                    json.dumps({"id": request.get("id")} | response).encode() + b"\n"
+                )
+                await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                in_flight.release()
+
+        try:
+            while True:
+                await in_flight.acquire()
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    # a line over the reader's limit, or a reset connection
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    in_flight.release()
+                    continue
+                task = asyncio.create_task(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            writer.close()
+
+
+async def serve(
+    service: DerivationService,
+    host: str = "127.0.0.1",
+    port: int = 7413,
+    unix: str | None = None,
+    limit: int = 2**24,
+) -> asyncio.Server:
+    """Start ``service`` and listen; ``limit`` is the longest request line."""
+    await service.start()
+    if unix is not None:
+        return await asyncio.start_unix_server(service.handle, unix, limit=limit)
+    return await asyncio.start_server(service.handle, host, port, limit=limit)
+
+
+def main(argv: list[str] | None = None) -> int:
+    argparser = argparse.ArgumentParser(
+        prog="main.py serve", description="Serve derivations over a local socket."
+    )
+    argparser.add_argument("--host", default="127.0.0.1")
+    argparser.add_argument("--port", type=int, default=7413)
+    argparser.add_argument("--unix", help="listen on this Unix socket instead")
+    argparser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="processes to use; 0 answers in this process",
+    )
+    argparser.add_argument(
+        "--timeout", type=float, default=30.0, help="seconds to answer a request"
+    )
+    argparser.add_argument("--max-pending", type=int, default=256)
+    argparser.add_argument("--max-in-flight", type=int, default=32)
+    args = argparser.parse_args(argv)
+
+    async def run():
+        service = DerivationService(
+            args.workers, args.timeout, args.max_pending, args.max_in_flight
+        )
+        try:
+            server = await serve(service, args.host, args.port, args.unix)
+            where = args.unix or f"{args.host}:{args.port}"
+            print(f"listening on {where} with {args.workers} workers", file=sys.stderr)
+            async with server:
+                await server.serve_forever()
+        finally:
+            service.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
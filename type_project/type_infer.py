@@ -0,0 +1,355 @@
+"""Hindley–Milner type inference, with typing derivations in the style of
+PolyTypingML4.
+
+    d = infer_type(Env([]), parser_expr("let id = fun x -> x in id 3").return_value)
+    print(pp(d))
+
+prints
+
+    |- let id = fun x -> x in id (3) : int by T-Let {
+      |- fun x -> x : 'a -> 'a by T-Fun {
+        x : 'a |- x : 'a by T-Var{};
+      };
+      id : 'a.'a -> 'a |- id (3) : int by T-App {
+        id : 'a.'a -> 'a |- id : int -> int by T-Var{};
+        id : 'a.'a -> 'a |- 3 : int by T-Int{};
+      };
+    };
+
+Type variables are mutable cells joined by union-find: unifying a variable
+links it to the other type, and ``resolve`` follows the links with path
+compression, so no substitution is ever composed or applied. Every
+variable records the ``let`` nesting level it was made at, lowered when it
+is linked into a type of an outer level; a ``let`` generalizes the
+variables of its bound expression whose level is deeper than its own,
+which are exactly those free in no enclosing binding, without scanning the
+environment.
+
+Like ``iterative.infer_iterative``, inference keeps the nodes waiting for
+their premises on an explicit stack, so deep programs are bounded by
+memory rather than by the recursion limit. Derivations are built as
+inference goes, so the types in them are complete only once it has
+finished. Variables left unbound are named
+``'a``, ``'b``, ... in the order they are first printed.
+"""
+
+from dataclasses import dataclass
+
+from type_project.ast import (
+    Env,
+    Expr,
+    FunctionApply,
+    FunctionEval,
+    If,
+    Let,
+    LetRec,
+    Lt,
+    Minus,
+    Plus,
+    Times,
+    Var,
+)
+from type_project.evaluator import Derivation
+
+
+class TypeCheckError(ValueError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class TCon:
+    name: str
+
+    def __str__(self):
+        return self.name
+
+
+INT = TCon("int")
+BOOL = TCon("bool")
+
+
+@dataclass(frozen=True, slots=True)
+class TFun:
+    arg: "Type"
+    result: "Type"
+
+    def __str__(self):
+        arg = str(self.arg)
+        if isinstance(resolve(self.arg), TFun):
+            arg = f"({arg})"
+        return f"{arg} -> {self.result}"
+
+
+class _Names:
+    """Hands out ``'a``, ``'b``, ... ``'z``, ``'a1``, ... to the variables
+    of one inference."""
+
+    def __init__(self):
+        self.count = 0
+
+    def next(self) -> str:
+        n, self.count = self.count, self.count + 1
+        letter = chr(ord("a") + n % 26)
+        return f"'{letter}{n // 26 or ''}"
+
+
+class TVar:
+    """A type variable: unbound while ``link`` is ``None``, the type it was
+    unified with otherwise."""
+
+    __slots__ = ("link", "level", "name", "_names")
+
+    def __init__(self, level: int, names: _Names):
+        self.link: Type | None = None
+        self.level = level
+        self.name: str | None = None
+        self._names = names
+
+    def __str__(self):
+        t = resolve(self)
+        if t is not self:
+            return str(t)
+        if self.name is None:
+            self.name = self._names.next()
+        return self.name
+
+
+Type = TCon | TFun | TVar
+
+
+@dataclass(frozen=True, slots=True)
+class Scheme:
+    """A type generalized over ``vars``, as a ``let`` binds it."""
+
+    vars: tuple[TVar, ...]
+    body: Type
+
+    def __str__(self):
+        return " ".join(str(v) for v in self.vars) + "." + str(self.body)
+
+
+@dataclass
+class TypeJudgement:
+    env: Env
+    e: Expr
+    t: Type
+
+    def __str__(self):
+        bindings = ", ".join(f"{k} : {t}" for k, t in self.env)
+        prefix = bindings + " |- " if bindings else "|- "
+        return f"{prefix}{self.e} : {self.t}"
+
+
+def resolve(t: Type) -> Type:
+    """The type ``t`` stands for: ``t`` itself unless it is a bound
+    variable. Every variable on the way is linked straight to the result."""
+    if not isinstance(t, TVar) or t.link is None:
+        return t
+    root = t.link
+    while isinstance(root, TVar) and root.link is not None:
+        root = root.link
+    while t is not root:
+        t.link, t = root, t.link
+    return root
+
+
+def _bind(v: TVar, t: Type, e: Expr):
+    if isinstance(t, TVar):
+        t.level = min(t.level, v.level)
+        v.link = t
+        return
+    # the occurs check, lowering the level of every variable ``t`` holds
+    # to ``v``'s on the way, as they now appear wherever ``v`` does
+    stack = [t]
+    while stack:
+        u = resolve(stack.pop())
+        if isinstance(u, TVar):
+            if u is v:
+                raise TypeCheckError(f"{e}: {v} occurs in {t}")
+            u.level = min(u.level, v.level)
+        elif isinstance(u, TFun):
+            stack.append(u.arg)
+            stack.append(u.result)
+    v.link = t
+
+
+def unify(t1: Type, t2: Type, e: Expr):
+    """Make ``t1`` and ``t2`` the same type; ``e`` is the expression that
+    requires it, for the error."""
+    stack = [(t1, t2)]
+    while stack:
+        a, b = stack.pop()
+        a, b = resolve(a), resolve(b)
+        if a is b:
+            continue
+        if isinstance(a, TVar):
+            _bind(a, b, e)
+        elif isinstance(b, TVar):
+            _bind(b, a, e)
+        elif isinstance(a, TFun) and isinstance(b, TFun):
+            stack.append((a.result, b.result))
+            stack.append((a.arg, b.arg))
+        elif a != b:
+            raise TypeCheckError(f"{e}: cannot unify {t1} with {t2}")
+
+
+def generalize(t: Type, level: int) -> Type | Scheme:
+    """``t`` over its variables deeper than ``level``; ``t`` if it has
+    none."""
+    seen: dict[TVar, None] = {}
+    stack = [t]
+    while stack:
+        u = resolve(stack.pop())
+        if isinstance(u, TVar):
+            if u.level > level:
+                seen[u] = None
+        elif isinstance(u, TFun):
+            stack.append(u.result)
+            stack.append(u.arg)
+    return Scheme(tuple(seen), t) if seen else t
+
+
+def instantiate(s: Type | Scheme, level: int, names: _Names) -> Type:
+    """``s`` with fresh variables at ``level`` for the ones it is
+    generalized over."""
+    if not isinstance(s, Scheme):
+        return s
+    fresh = {v: TVar(level, names) for v in s.vars}
+
+    def copy(t: Type) -> Type:
+        t = resolve(t)
+        if isinstance(t, TVar):
+            return fresh.get(t, t)
+        if isinstance(t, TFun):
+            return TFun(copy(t.arg), copy(t.result))
+        return t
+
+    return copy(s.body)
+
+
+# rule and result type of each binary operation on integers
+_INT2 = {
+    Plus: ("T-Plus", INT),
+    Minus: ("T-Minus", INT),
+    Times: ("T-Times", INT),
+    Lt: ("T-Lt", BOOL),
+}
+
+
+def infer_type(env: Env, e: Expr) -> Derivation:
+    """The typing derivation of ``e`` under ``env``, which binds names to
+    types or schemes; raise ``TypeCheckError`` if ``e`` has no type."""
+    return _infer_type(env, e, 0, _Names())
+
+
+class _Frame:
+    """A node waiting for the derivations of its premises."""
+
+    __slots__ = ("env", "e", "level", "premises", "t")
+
+    def __init__(self, env: Env, e: Expr, level: int, t: Type | None = None):
+        self.env = env
+        self.e = e
+        self.level = level
+        self.premises: list[Derivation] = []
+        # the argument variable of a ``fun``, the function type of a
+        # ``let rec``
+        self.t = t
+
+
+def _infer_type(env: Env, e: Expr, level: int, names: _Names) -> Derivation:
+    stack: list[_Frame] = []
+    while True:
+        # infer ``e`` in ``env``: either derive it as ``d``, or push its
+        # frame and go on with its first premise
+        match e:
+            case Var(key):
+                try:
+                    s = env.lookup(key)
+                except KeyError:
+                    raise TypeCheckError(f"unbound variable {key}") from None
+                t = instantiate(s, level, names)
+                d = Derivation(TypeJudgement(env, e, t), "T-Var", [])
+            case bool():
+                d = Derivation(TypeJudgement(env, e, BOOL), "T-Bool", [])
+            case int():
+                d = Derivation(TypeJudgement(env, e, INT), "T-Int", [])
+            case (
+                Plus(e1, _)
+                | Minus(e1, _)
+                | Times(e1, _)
+                | Lt(e1, _)
+                | If(e1, _, _)
+                | FunctionApply(e1, _)
+            ):
+                stack.append(_Frame(env, e, level))
+                e = e1
+                continue
+            case Let(_, e1, _):
+                stack.append(_Frame(env, e, level))
+                e, level = e1, level + 1
+                continue
+            case FunctionEval(arg_name, body):
+                a = TVar(level, names)
+                stack.append(_Frame(env, e, level, a))
+                env, e = env.push(arg_name, a), body
+                continue
+            case LetRec(key, FunctionEval(arg_name, body), _):
+                a, b = TVar(level + 1, names), TVar(level + 1, names)
+                t = TFun(a, b)
+                stack.append(_Frame(env, e, level, t))
+                env = env.push(key, t).push(arg_name, a)
+                e, level = body, level + 1
+                continue
+            case _:
+                raise TypeCheckError(f"cannot type {e}")
+
+        # hand ``d`` to the frames waiting for it until one of them has
+        # another premise to infer
+        while stack:
+            frame = stack[-1]
+            premises = frame.premises
+            premises.append(d)
+            env, e, level = frame.env, frame.e, frame.level
+            match e:
+                case Plus(e1, e2) | Minus(e1, e2) | Times(e1, e2) | Lt(e1, e2):
+                    if len(premises) == 1:
+                        e = e2
+                        break
+                    rule, t = _INT2[type(e)]
+                    unify(premises[0].conclusion.t, INT, e1)
+                    unify(premises[1].conclusion.t, INT, e2)
+                case If(e1, e2, e3):
+                    if len(premises) < 3:
+                        e = e2 if len(premises) == 1 else e3
+                        break
+                    d1, d2, d3 = premises
+                    unify(d1.conclusion.t, BOOL, e1)
+                    unify(d2.conclusion.t, d3.conclusion.t, e)
+                    rule, t = "T-If", d2.conclusion.t
+                case Let(key, _, e2):
+                    if len(premises) == 1:
+                        s = generalize(d.conclusion.t, level)
+                        env, e = env.push(key, s), e2
+                        break
+                    rule, t = "T-Let", d.conclusion.t
+                case FunctionEval():
+                    rule, t = "T-Fun", TFun(frame.t, d.conclusion.t)
+                case LetRec(key, FunctionEval(_, body), e2):
+                    if len(premises) == 1:
+                        unify(d.conclusion.t, frame.t.result, body)
+                        env, e = env.push(key, generalize(frame.t, level)), e2
+                        break
+                    rule, t = "T-LetRec", d.conclusion.t
+                case FunctionApply(_, arg):
+                    if len(premises) == 1:
+                        e = arg
+                        break
+                    d1, d2 = premises
+                    t = TVar(level, names)
+                    unify(d1.conclusion.t, TFun(d2.conclusion.t, t), e)
+                    rule = "T-App"
+            stack.pop()
+            d = Derivation(TypeJudgement(env, e, t), rule, premises)
+        else:
+            return d
@@ -0,0 +1,555 @@
+"""Streaming check of derivations in the text format ``pp`` writes.
+
+    result = verify(open("derivation.txt"))
+    if result.error is not None:
+        print(result.error)  # 12:7: E-Plus: ...
+
+The input is read in chunks and split at ``{``, ``}`` and ``;``, which
+never occur inside a judgement. Each judgement is read once, when its
+``{`` is reached, and a node is checked against the rule it names when
+its ``}`` is reached, from the conclusions of its direct premises alone.
+Only the judgements of the open nodes and of their premises are kept, so
+memory depends on the depth of the derivation and the length of a line,
+not on the size of the file, and time is linear in the size of the file.
+Nothing is evaluated: every check compares terms the file already gives.
+
+Expressions are kept as the text ``pp`` prints, with runs of whitespace
+squeezed, rather than parsed: printed expressions are not always
+unambiguous, ``1 < 2 < 3`` or a ``let`` as the right operand of ``+``,
+but a rule's conclusion must print as its premises put together, like
+``(e1 + e2)`` for ``E-Plus``. Environments and values are read into
+``Env`` and ``Closure`` and compared by structure.
+
+Booleans may be written ``true`` or ``True``, and bindings may have
+spaces around ``=`` and ``,``. The first node that fails is reported with
+the line and column where its judgement starts; a node is checked when it
+is closed, so a failing premise is found before its conclusion.
+
+From the command line::
+
+    python -m type_project.verifier FILE
+"""
+
+import argparse
+import operator
+import re
+import sys
+from dataclasses import dataclass
+from typing import Any, NamedTuple, TextIO
+
+from type_project.ast import Env, Error
+from type_project.memo import same
+
+CHUNK_SIZE = 1 << 16
+
+
+@dataclass
+class VerifyError:
+    line: int
+    column: int
+    message: str
+
+    def __str__(self):
+        return f"{self.line}:{self.column}: {self.message}"
+
+
+@dataclass
+class VerifyResult:
+    # nodes checked, up to and including the failing one
+    nodes: int = 0
+    error: VerifyError | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class Closure:
+    """A function value as printed: ``key`` is set for ``rec`` closures."""
+
+    env: Env
+    fun: str
+    key: str | None = None
+
+    def __str__(self):
+        if self.key is None:
+            return f"({self.env})[{self.fun}]"
+        return f"({self.env})[rec {self.key} = {self.fun}]"
+
+
+class Conclusion(NamedTuple):
+    env: Env
+    e: str
+    v: Any
+
+
+class Fact(NamedTuple):
+    """A side condition like ``3 plus 4 is 7``."""
+
+    left: int
+    op: str
+    right: int
+    result: Any
+
+
+class _Malformed(Exception):
+    pass
+
+
+# how each binary operation prints, its name in ``B-`` rules, and its meaning
+_INT2 = {
+    "Plus": ("({} + {})", "plus", operator.add),
+    "Minus": ("({} - {})", "minus", operator.sub),
+    "Times": ("({} * {})", "times", operator.mul),
+    "Lt": ("{} < {}", "less than", operator.lt),
+}
+_INT2_NAMES = {op: name for name, (_, op, _) in _INT2.items()}
+
+_SPACE = re.compile(r"\s*")
+_SPACES = re.compile(r"\s+")
+_PAREN_SPACE = re.compile(r"(?<=\() | (?=\))")
+_NAME = re.compile(r"[^\W_]+")
+_ATOM = re.compile(r"-?[0-9]+|true|false|error")
+_INT = re.compile(r"-?[0-9]+$")
+_RULE = re.compile(r"\s*by\s+([A-Za-z0-9-]+)\s*$")
+_FACT = re.compile(
+    r"\s*(-?[0-9]+)\s+(plus|minus|times|less\s+than)\s+(-?[0-9]+)\s+is\s+"
+    r"(-?[0-9]+|true|false)\s+by\s+(B-[A-Za-z]+)\s*$"
+)
+_FUN = re.compile(r"fun ([^\W_]+) -> (.+)$")
+_BOOLS = re.compile(r"\b(True|False)\b")
+_EVALTO = re.compile(r"\sevalto\s")
+_INT2_RULE = re.compile(r"E-(Plus|Minus|Times|Lt)(BoolL|BoolR|ErrorL|ErrorR|)$")
+
+
+def _squeeze(text: str) -> str:
+    return _PAREN_SPACE.sub("", _SPACES.sub(" ", text).strip())
+
+
+class _Reader:
+    """Recursive descent over the environment and value of one judgement."""
+
+    __slots__ = ("text", "pos")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+
+    def skip(self):
+        self.pos = _SPACE.match(self.text, self.pos).end()
+
+    def expect(self, s: str):
+        self.skip()
+        if not self.text.startswith(s, self.pos):
+            raise _Malformed(f"expected {s!r} at offset {self.pos} of the judgement")
+        self.pos += len(s)
+
+    def name(self) -> str:
+        self.skip()
+        m = _NAME.match(self.text, self.pos)
+        if m is None:
+            raise _Malformed(f"expected a name at offset {self.pos} of the judgement")
+        self.pos = m.end()
+        return m.group()
+
+    def env(self, end: str) -> Env:
+        env = Env([])
+        self.skip()
+        if self.text.startswith(end, self.pos):
+            return env
+        while True:
+            key = self.name()
+            self.expect("=")
+            env = env.push(key, self.value())
+            self.skip()
+            if not self.text.startswith(",", self.pos):
+                return env
+            self.pos += 1
+
+    def value(self) -> Any:
+        self.skip()
+        if self.text.startswith("(", self.pos):
+            return self.closure()
+        m = _ATOM.match(self.text, self.pos)
+        if m is None:
+            raise _Malformed(f"expected a value at offset {self.pos} of the judgement")
+        self.pos = m.end()
+        match m.group():
+            case "true":
+                return True
+            case "false":
+                return False
+            case "error":
+                return Error()
+            case n:
+                return int(n)
+
+    def closure(self) -> Closure:
+        self.expect("(")
+        env = self.env(")")
+        self.expect(")")
+        self.expect("[")
+        self.skip()
+        key = None
+        if self.text.startswith("rec", self.pos) and not _NAME.match(
+            self.text, self.pos + 3
+        ):
+            self.pos += 3
+            key = self.name()
+            self.expect("=")
+        # an expression holds no brackets, so the function ends at the next one
+        end = self.text.find("]", self.pos)
+        if end < 0:
+            raise _Malformed("expected ']' after the function")
+        fun = _squeeze(self.text[self.pos : end])
+        if not _FUN.match(fun):
+            raise _Malformed(f"a closure must hold a function, not {fun}")
+        self.pos = end + 1
+        return Closure(env, fun, key)
+
+
+def parse_node(text: str) -> tuple[Conclusion | Fact, str]:
+    """The conclusion and rule name of a node's text, up to its ``{``."""
+    text = _BOOLS.sub(lambda m: m.group().lower(), text)
+    m = _FACT.match(text)
+    if m is not None:
+        left, op, right, result, rule = m.groups()
+        result = int(result) if result[-1].isdigit() else result == "true"
+        return Fact(int(left), _squeeze(op), int(right), result), rule
+    r = _Reader(text)
+    env = r.env("|-")
+    r.expect("|-")
+    evalto = _EVALTO.search(text, r.pos)
+    if evalto is None:
+        raise _Malformed("expected 'evalto' in the judgement")
+    e = _squeeze(text[r.pos : evalto.start()])
+    if not e:
+        raise _Malformed(f"expected an expression at offset {r.pos} of the judgement")
+    r.pos = evalto.end()
+    v = r.value()
+    m = _RULE.match(text, r.pos)
+    if m is None:
+        raise _Malformed(f"expected 'by' and a rule at offset {r.pos} of the judgement")
+    return Conclusion(env, e, v), m.group(1)
+
+
+def _show(v: Any) -> str:
+    return str(v).replace("True", "true").replace("False", "false")
+
+
+def _about(p: Any, env: Env, what: str) -> str:
+    """Check that premise ``p`` is a judgement in ``env``, and return its
+    expression."""
+    if not isinstance(p, Conclusion):
+        raise _Malformed(f"{what} must be a judgement")
+    if not same(p.env, env):
+        raise _Malformed(f"{what} is not in the right environment")
+    return p.e
+
+
+def _count(premises: list, n: int):
+    if len(premises) != n:
+        raise _Malformed(f"expects {n} premises, got {len(premises)}")
+
+
+def _value(v: Any, expected: Any, what: str = "the value"):
+    if not same(v, expected):
+        raise _Malformed(f"{what} must be {_show(expected)}, not {_show(v)}")
+
+
+def _shape(e: str, prefix: str, suffix: str = ""):
+    """Check that ``e`` is ``prefix``, then something, then ``suffix``."""
+    if not (
+        len(e) > len(prefix) + len(suffix)
+        and e.startswith(prefix)
+        and e.endswith(suffix)
+    ):
+        raise _Malformed(f"{e} is not {prefix}...{suffix}")
+
+
+def _exactly(e: str, expected: str):
+    if e != expected:
+        raise _Malformed(f"the expression must be {expected}, not {e}")
+
+
+def check_rule(rule: str, c: Conclusion | Fact, premises: list) -> None:
+    """Raise ``_Malformed`` unless ``rule`` derives ``c`` from ``premises``,
+    the way ``evaluator.infer`` applies it."""
+    if isinstance(c, Fact):
+        name = _INT2_NAMES[c.op]
+        if rule != f"B-{name}":
+            raise _Malformed(f"'{c.op}' is derived by B-{name}")
+        _count(premises, 0)
+        v = _INT2[name][2](c.left, c.right)
+        _value(c.result, v, f"{c.left} {c.op} {c.right}")
+        return
+    env, e, v = c
+    match rule:
+        case "E-Int":
+            if not _INT.match(e):
+                raise _Malformed(f"{e} is not an integer")
+            _count(premises, 0)
+            _value(v, int(e))
+        case "E-Bool":
+            if e not in ("true", "false"):
+                raise _Malformed(f"{e} is not a boolean")
+            _count(premises, 0)
+            _value(v, e == "true")
+        case "E-Var1" | "E-Var2":
+            if not _NAME.fullmatch(e):
+                raise _Malformed(f"{e} is not a variable")
+            if env.pop() is env:
+                raise _Malformed(f"{e} is not bound")
+            top, bound = env.top()
+            if rule == "E-Var1":
+                if top != e:
+                    raise _Malformed(f"the last binding is {top}, not {e}")
+                _count(premises, 0)
+                _value(v, bound)
+            else:
+                if top == e:
+                    raise _Malformed(f"the last binding is {e}; use E-Var1")
+                _count(premises, 1)
+                _exactly(_about(premises[0], env.pop(), "the premise"), e)
+                _value(v, premises[0].v)
+        case "E-Fun":
+            if not _FUN.match(e):
+                raise _Malformed(f"{e} is not a function")
+            _count(premises, 0)
+            _value(v, Closure(env, e))
+        case "E-IfT" | "E-IfTError" | "E-IfF" | "E-IfFError":
+            _count(premises, 2)
+            taken = rule.startswith("E-IfT")
+            e1 = _about(premises[0], env, "the first premise")
+            _value(premises[0].v, taken, "the condition")
+            e2 = _about(premises[1], env, "the second premise")
+            if taken:
+                _shape(e, f"if {e1} then {e2} else ")
+            else:
+                _shape(e, f"if {e1} then ", f" else {e2}")
+            error = isinstance(premises[1].v, Error)
+            if error != rule.endswith("Error"):
+                raise _Malformed("E-IfTError and E-IfFError are for error branches")
+            _value(v, premises[1].v)
+        case "E-IfError" | "E-IfInt":
+            _count(premises, 1)
+            e1 = _about(premises[0], env, "the premise")
+            _shape(e, f"if {e1} then ")
+            if rule == "E-IfInt" and type(premises[0].v) is not int:
+                raise _Malformed("the condition must be an integer")
+            if rule == "E-IfError":
+                _value(premises[0].v, Error(), "the condition")
+            _value(v, Error())
+        case "E-Let":
+            _count(premises, 2)
+            e1 = _about(premises[0], env, "the first premise")
+            p = premises[1]
+            if not isinstance(p, Conclusion) or p.env.pop() is p.env:
+                raise _Malformed("the second premise must bind the name")
+            key = p.env.top()[0]
+            e2 = _about(p, env.push(key, premises[0].v), "the second premise")
+            _exactly(e, f"let {key} = {e1} in {e2}")
+            _value(v, p.v)
+        case "E-LetRec":
+            _count(premises, 1)
+            p = premises[0]
+            if not isinstance(p, Conclusion) or p.env.pop() is p.env:
+                raise _Malformed("the premise must bind the function")
+            key, closure = p.env.top()
+            if not (isinstance(closure, Closure) and closure.key == key):
+                raise _Malformed(f"{key} must be bound to a rec closure")
+            _value(closure, Closure(env, closure.fun, key), key)
+            e2 = _about(p, env.push(key, closure), "the premise")
+            _exactly(e, f"let rec {key} = {closure.fun} in {e2}")
+            _value(v, p.v)
+        case "E-App" | "E-AppRec":
+            _count(premises, 3)
+            e1 = _about(premises[0], env, "the first premise")
+            e2 = _about(premises[1], env, "the second premise")
+            _exactly(e, f"{e1} ({e2})")
+            closure = premises[0].v
+            if not isinstance(closure, Closure) or (
+                (closure.key is None) != (rule == "E-App")
+            ):
+                raise _Malformed(f"the function is {_show(closure)}")
+            inner = closure.env
+            if closure.key is not None:
+                inner = inner.push(closure.key, closure)
+            arg, body = _FUN.match(closure.fun).groups()
+            inner = inner.push(arg, premises[1].v)
+            _exactly(_about(premises[2], inner, "the third premise"), body)
+            _value(v, premises[2].v)
+        case _:
+            _check_int2(rule, c, premises)
+
+
+def _check_int2(rule: str, c: Conclusion, premises: list):
+    m = _INT2_RULE.match(rule)
+    if m is None:
+        raise _Malformed("no such rule")
+    name, variant = m.groups()
+    syntax, op, fn = _INT2[name]
+    before, middle, after = syntax.split("{}")
+    env, e, v = c
+    if not variant:
+        _count(premises, 3)
+        e1 = _about(premises[0], env, "the first premise")
+        e2 = _about(premises[1], env, "the second premise")
+        _exactly(e, syntax.format(e1, e2))
+        left, right, fact = premises[0].v, premises[1].v, premises[2]
+        if not (type(left) is int and type(right) is int):
+            raise _Malformed("both operands must be integers")
+        if not (
+            isinstance(fact, Fact)
+            and fact.op == op
+            and fact.left == left
+            and fact.right == right
+        ):
+            raise _Malformed(f"the third premise must be '{left} {op} {right} is ...'")
+        _value(v, fact.result)
+        return
+    _count(premises, 1)
+    operand = _about(premises[0], env, "the premise")
+    if variant.endswith("L"):
+        _shape(e, before + operand + middle, after)
+    else:
+        _shape(e, before, middle + operand + after)
+    if variant.startswith("Bool") and type(premises[0].v) is not bool:
+        raise _Malformed(f"the operand must be a boolean, not {_show(premises[0].v)}")
+    if variant.startswith("Error"):
+        _value(premises[0].v, Error(), "the operand")
+    _value(v, Error())
+
+
+class _Node:
+    __slots__ = ("conclusion", "rule", "line", "column", "premises")
+
+    def __init__(
+        self, conclusion: Conclusion | Fact, rule: str, line: int, column: int
+    ):
+        self.conclusion = conclusion
+        self.rule = rule
+        self.line = line
+        self.column = column
+        self.premises: list[Conclusion | Fact] = []
+
+
+_DELIMITER = re.compile(r"[{};]")
+
+
+def verify(stream: TextIO, chunk_size: int = CHUNK_SIZE) -> VerifyResult:
+    """Check the derivation ``stream`` holds, node by node."""
+    result = VerifyResult()
+    stack: list[_Node] = []
+    # text of the judgement being read, and where it starts
+    header: list[str] = []
+    start = (0, 0)
+    # after a node's ``}`` only its ``;`` may follow, and after the root's
+    # ``;`` nothing at all
+    closing = False
+    done = False
+    line, column = 1, 1
+
+    def fail(message: str, at: tuple[int, int]) -> VerifyResult:
+        result.error = VerifyError(at[0], at[1], message)
+        return result
+
+    def at(piece: str, i: int) -> tuple[int, int]:
+        newlines = piece.count("\n", 0, i)
+        if newlines:
+            return line + newlines, i - piece.rfind("\n", 0, i)
+        return line, column + i
+
+    def advance(piece: str):
+        nonlocal line, column
+        line, column = at(piece, len(piece))
+
+    def read(piece: str) -> VerifyResult | None:
+        # add the text before a delimiter to the judgement being read
+        nonlocal start
+        first = len(piece) - len(piece.lstrip())
+        if first < len(piece):
+            if closing or done:
+                what = "derivation" if done else "node"
+                message = f"unexpected text after the end of the {what}"
+                return fail(message, at(piece, first))
+            if not header:
+                start = at(piece, first)
+        if header or first < len(piece):
+            header.append(piece)
+        advance(piece)
+        return None
+
+    while chunk := stream.read(chunk_size):
+        pos = 0
+        for m in _DELIMITER.finditer(chunk):
+            if read(chunk[pos : m.start()]):
+                return result
+            here = (line, column)
+            column += 1
+            pos = m.end()
+            match m.group():
+                case "{":
+                    if not header:
+                        return fail("expected a judgement before '{'", here)
+                    try:
+                        conclusion, rule = parse_node("".join(header))
+                    except _Malformed as e:
+                        return fail(str(e), start)
+                    header.clear()
+                    stack.append(_Node(conclusion, rule, *start))
+                case "}":
+                    if header:
+                        return fail("expected '{' after the judgement", start)
+                    if not stack:
+                        return fail("unexpected '}'", here)
+                    node = stack.pop()
+                    result.nodes += 1
+                    try:
+                        check_rule(node.rule, node.conclusion, node.premises)
+                    except _Malformed as e:
+                        return fail(f"{node.rule}: {e}", (node.line, node.column))
+                    if stack:
+                        parent = stack[-1]
+                        if len(parent.premises) == 3:
+                            message = f"{parent.rule}: too many premises"
+                            return fail(message, (parent.line, parent.column))
+                        parent.premises.append(node.conclusion)
+                    closing = True
+                case ";":
+                    if header or not closing:
+                        return fail("unexpected ';'", here)
+                    closing = False
+                    done = not stack
+        if read(chunk[pos:]):
+            return result
+    if header:
+        return fail("expected '{' after the judgement", start)
+    if stack:
+        node = stack[-1]
+        return fail("the node is not closed", (node.line, node.column))
+    if closing:
+        return fail("expected ';'", (line, column))
+    if not done:
+        return fail("no derivation", (line, column))
+    return result
+
+
+def main(argv: list[str] | None = None) -> int:
+    argparser = argparse.ArgumentParser(
+        description="Check a derivation written in the format pp prints."
+    )
+    argparser.add_argument("file", type=argparse.FileType("r"))
+    args = argparser.parse_args(argv)
+
+    result = verify(args.file)
+    if result.error is not None:
+        print(f"{args.file.name}:{result.error}")
+        return 1
+    print(f"{args.file.name}: {result.nodes} nodes ok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))